@@ -0,0 +1,137 @@
+"""
+Benchmark request-path throughput on the in-memory storage engine
+Seeds products and shoppers into the in-memory store, then drives a
+shopping mix (listing, detail, search, add to cart, checkout, leaderboard)
+through the Flask app in-process. With no database round trips, the
+timings are the app's own CPU cost per request. Reports requests per
+second overall and the latency per route; --profile adds the functions
+with the most cumulative time.
+Usage: python bench_app_throughput.py [--products N] [--users N]
+       [--sessions N] [--profile]
+"""
+
+import argparse
+import contextlib
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+# Select the engine before config.db reads it
+os.environ['STORAGE_ENGINE'] = 'memory'
+os.environ['MEMORY_SEED'] = 'false'
+
+CATEGORIES = ['Electronics', 'Accessories', 'Home', 'Fashion', 'Sports']
+NOUNS = ['headphones', 'keyboard', 'mouse', 'watch', 'speaker', 'charger', 'lamp', 'backpack']
+QUERIES = ['wireless', 'watch', 'key', 'smart speaker', 'lamp']
+
+def seed(products, users):
+    """Insert products and shoppers; returns (product ids, auth headers)"""
+    from middleware.auth import generate_token
+    from models.product import Product
+    from models.user import User
+
+    start = datetime.utcnow() - timedelta(hours=1)
+    end = datetime.utcnow() + timedelta(days=1)
+    built = []
+    for i in range(products):
+        price = round(random.uniform(5, 500), 2)
+        built.append(Product.build({
+            'name': f"{random.choice(['wireless', 'smart', 'compact', 'pro'])} {random.choice(NOUNS)} {i}",
+            'description': 'Benchmark product',
+            'price': price,
+            'originalPrice': round(price * 1.5, 2),
+            'category': random.choice(CATEGORIES),
+            'image': 'https://via.placeholder.com/300',
+            'stock': 1000000,
+            'saleStartTime': start,
+            'saleEndTime': end
+        }))
+    Product.insert_many(built)
+
+    # One bcrypt hash for everyone; logins are not part of the mix
+    password = User.hash_password('password123')
+    User.get_collection().insert_many([{
+        'name': f"Shopper {i}",
+        'email': f"shopper{i}@example.com",
+        'password': password,
+        'totalPurchases': 0,
+        'fastestCheckout': None,
+        'createdAt': datetime.utcnow()
+    } for i in range(users)])
+
+    headers = [
+        {'Authorization': f"Bearer {generate_token(str(user['_id']))}"}
+        for user in User.get_collection().find({}, {'_id': 1})
+    ]
+    return [str(product['_id']) for product in built], headers
+
+def session(client, product_ids, headers, timings):
+    """One shopper: browse, search, add to cart, check out, look at the leaderboard"""
+    auth = random.choice(headers)
+    product_id = random.choice(product_ids)
+    requests = [
+        ('list', lambda: client.get('/api/products?limit=20')),
+        ('detail', lambda: client.get(f"/api/products/{product_id}")),
+        ('search', lambda: client.get(f"/api/products/search?q={random.choice(QUERIES)}")),
+        ('cart add', lambda: client.post('/api/cart/add', json={'productId': product_id, 'quantity': 1}, headers=auth)),
+        ('checkout', lambda: client.post('/api/orders', json={'checkoutStartTime': datetime.utcnow().isoformat()}, headers=auth)),
+        ('leaderboard', lambda: client.get('/api/leaderboard')),
+    ]
+    for name, send in requests:
+        started = time.perf_counter()
+        response = send()
+        timings[name].append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{name} failed: {response.status_code} {response.get_data(as_text=True)[:200]}")
+
+def percentile(samples, fraction):
+    return sorted(samples)[int(len(samples) * fraction)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--sessions', type=int, default=2000)
+    parser.add_argument('--profile', action='store_true', help='print the top functions by cumulative time')
+    args = parser.parse_args()
+
+    random.seed(42)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        from server import app
+        product_ids, headers = seed(args.products, args.users)
+    client = app.test_client()
+
+    timings = {name: [] for name in ['list', 'detail', 'search', 'cart add', 'checkout', 'leaderboard']}
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    # The app logs every order; keep that cost but not the output
+    started = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(args.sessions):
+            session(client, product_ids, headers, timings)
+    elapsed = time.perf_counter() - started
+
+    if profiler:
+        profiler.disable()
+
+    total = sum(len(samples) for samples in timings.values())
+    print(f"📊 {args.products} products, {args.users} users, {args.sessions} sessions on the in-memory engine")
+    print(f"   {total} requests in {elapsed:.2f}s: {total / elapsed:,.0f} req/s on one core\n")
+    print(f"{'route':<14}{'count':>8}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, samples in timings.items():
+        print(f"{name:<14}{len(samples):>8}{statistics.mean(samples) * 1000:>10.3f}"
+              f"{statistics.median(samples) * 1000:>10.3f}{percentile(samples, 0.99) * 1000:>10.3f}")
+
+    if profiler:
+        import pstats
+        print()
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(25)
+
+if __name__ == '__main__':
+    main()
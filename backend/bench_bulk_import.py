@@ -0,0 +1,69 @@
+"""
+Benchmark the bulk product endpoints
+Streams generated NDJSON rows to a running server: first a product import,
+then a stock update of every imported product. Reports rows per second
+and any failed rows.
+Requires the server running (python server.py) and: pip install requests
+Usage: python bench_bulk_import.py [--products N] [--url URL]
+"""
+
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+import requests
+
+CATEGORIES = ['Electronics', 'Accessories', 'Home', 'Fashion', 'Sports']
+
+def product_rows(count):
+    start = datetime.utcnow().isoformat() + 'Z'
+    end = (datetime.utcnow() + timedelta(days=1)).isoformat() + 'Z'
+    for i in range(count):
+        price = round(random.uniform(5, 500), 2)
+        yield json.dumps({
+            'name': f"Bulk item {i}",
+            'description': 'Generated by bench_bulk_import.py',
+            'price': price,
+            'originalPrice': round(price * 1.5, 2),
+            'category': random.choice(CATEGORIES),
+            'image': 'https://via.placeholder.com/300',
+            'stock': random.randint(0, 100),
+            'saleStartTime': start,
+            'saleEndTime': end
+        }).encode('utf-8') + b'\n'
+
+def stock_rows(product_ids):
+    for product_id in product_ids:
+        yield json.dumps({'productId': product_id, 'stock': random.randint(0, 100)}).encode('utf-8') + b'\n'
+
+def post_rows(url, rows):
+    """POST a chunked NDJSON body; returns (results, summary, seconds)"""
+    started = time.perf_counter()
+    response = requests.post(url, data=rows, headers={'Content-Type': 'application/x-ndjson'}, stream=True)
+    response.raise_for_status()
+    results = [json.loads(line) for line in response.iter_lines() if line]
+    return results[:-1], results[-1], time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--url', default='http://localhost:5000')
+    args = parser.parse_args()
+
+    results, summary, seconds = post_rows(f"{args.url}/api/products/bulk", product_rows(args.products))
+    print(f"📦 Imported {summary['summary']['succeeded']} products in {seconds:.2f}s "
+          f"({args.products / seconds:,.0f} rows/s), {summary['summary']['failed']} failed")
+
+    product_ids = [result['id'] for result in results if result.get('success')]
+    results, summary, seconds = post_rows(f"{args.url}/api/products/bulk/stock", stock_rows(product_ids))
+    print(f"🔁 Updated stock of {summary['summary']['succeeded']} products in {seconds:.2f}s "
+          f"({len(product_ids) / seconds:,.0f} rows/s), {summary['summary']['failed']} failed")
+
+    for result in results:
+        if not result.get('success'):
+            print(f"   ❌ {result}")
+            break
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark MongoDB throughput across connection pool sizes
+Runs a checkout-like mix (product read, then a counter update) from many
+concurrent workers against one MongoClient per pool size, and reports
+throughput with the pool metrics: average and max wait for a connection,
+peak connections in use and failed checkouts.
+Requires MongoDB running locally (MONGODB_URI), with products seeded.
+Usage: python bench_mongo_pool.py [--sizes 1,5,10,25,50,100] [--workers N]
+       [--seconds N] [--eventlet] [--wait-timeout MS]
+"""
+
+import argparse
+import sys
+
+# Green workers need cooperative sockets before pymongo is imported
+if '--eventlet' in sys.argv:
+    import eventlet
+    eventlet.monkey_patch()
+
+import os
+import random
+import threading
+import time
+from dotenv import load_dotenv
+from pymongo import MongoClient
+from config.db import PoolMetrics
+from config.metrics import metrics
+
+load_dotenv()
+
+MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/flash_sale')
+
+def worker(db, product_ids, deadline, counts, errors):
+    done = 0
+    while time.perf_counter() < deadline:
+        try:
+            db.products.find_one({'_id': random.choice(product_ids)}, {'stock': 1})
+            db.bench_pool.update_one({'_id': random.randrange(100)}, {'$inc': {'n': 1}}, upsert=True)
+            done += 1
+        except Exception as e:
+            errors.append(type(e).__name__)
+    counts.append(done)
+
+def run(size, workers, seconds, green, wait_timeout):
+    metrics.reset()
+    options = {'maxPoolSize': size, 'event_listeners': [PoolMetrics()]}
+    if wait_timeout:
+        options['waitQueueTimeoutMS'] = wait_timeout
+    client = MongoClient(MONGODB_URI, **options)
+    db = client.get_default_database('flash_sale')
+    product_ids = [p['_id'] for p in db.products.find({}, {'_id': 1}).limit(1000)]
+    if not product_ids:
+        raise SystemExit('❌ No products found; run python seed_data.py first')
+
+    counts, errors = [], []
+    deadline = time.perf_counter() + seconds
+    if green:
+        pool = eventlet.GreenPool(workers)
+        for _ in range(workers):
+            pool.spawn(worker, db, product_ids, deadline, counts, errors)
+        pool.waitall()
+    else:
+        threads = [threading.Thread(target=worker, args=(db, product_ids, deadline, counts, errors)) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    snapshot = metrics.snapshot()
+    client.close()
+    wait = snapshot['timings'].get('mongo_pool_wait', {})
+    in_use_max = max((v for k, v in snapshot['gauges'].items() if k.startswith('mongo_pool_in_use_max')), default=0)
+    return sum(counts) / seconds, wait.get('avgMs', 0), wait.get('maxMs', 0), in_use_max, len(errors)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='1,5,10,25,50,100')
+    parser.add_argument('--workers', type=int, default=200)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--eventlet', action='store_true', help='use green threads like the server')
+    parser.add_argument('--wait-timeout', type=int, default=0, help='waitQueueTimeoutMS')
+    args = parser.parse_args()
+
+    print(f"📊 {args.workers} {'green' if args.eventlet else 'OS'} threads, {args.seconds}s per pool size\n")
+    print(f"{'pool':>6}{'ops/s':>10}{'avg wait ms':>13}{'max wait ms':>13}{'in use':>8}{'errors':>8}")
+    for size in (int(s) for s in args.sizes.split(',')):
+        throughput, avg_wait, max_wait, in_use, errors = run(size, args.workers, args.seconds, args.eventlet, args.wait_timeout)
+        print(f"{size:>6}{throughput:>10.0f}{avg_wait:>13.2f}{max_wait:>13.2f}{in_use:>8}{errors:>8}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark the product search index
+Builds the in-memory search index over synthetic products and reports the
+build time, the memory footprint and the query latency for typical
+searches, including incremental re-indexing of changed products.
+Usage: python bench_search.py [--products N] [--queries N]
+"""
+
+import argparse
+import random
+import statistics
+import time
+from bson import ObjectId
+from models.product import SEARCH_FIELDS
+from utils.search_index import SearchIndex
+
+CATEGORIES = ['Electronics', 'Accessories', 'Home', 'Fashion', 'Sports', 'Toys', 'Books', 'Beauty']
+ADJECTIVES = ['wireless', 'premium', 'smart', 'portable', 'compact', 'ergonomic', 'classic', 'pro',
+              'ultra', 'mini', 'deluxe', 'vintage', 'rugged', 'silent', 'digital', 'organic']
+NOUNS = ['headphones', 'keyboard', 'mouse', 'watch', 'speaker', 'charger', 'lamp', 'backpack',
+         'bottle', 'jacket', 'sneakers', 'camera', 'blender', 'kettle', 'novel', 'serum',
+         'monitor', 'tablet', 'router', 'drone', 'helmet', 'mat', 'puzzle', 'candle']
+WORDS = ['battery', 'bluetooth', 'steel', 'cotton', 'fast', 'light', 'durable', 'waterproof',
+         'gift', 'travel', 'office', 'gaming', 'kitchen', 'outdoor', 'noise', 'cancelling']
+QUERIES = ['wireless', 'wire', 'smart watch', 'head', 'pro key', 'waterproof jacket',
+           'bluetooth speaker', 'gam', 'k', 'model 4217']
+
+def make_products(count):
+    random.seed(42)
+    for i in range(count):
+        yield {
+            '_id': ObjectId(),
+            'name': f"{random.choice(ADJECTIVES)} {random.choice(NOUNS)} model {i}",
+            'description': ' '.join(random.choices(WORDS, k=12)),
+            'category': random.choice(CATEGORIES)
+        }
+
+def percentile(samples, fraction):
+    return sorted(samples)[int(len(samples) * fraction)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=1000, help='runs of each query')
+    args = parser.parse_args()
+
+    products = list(make_products(args.products))
+    index = SearchIndex(SEARCH_FIELDS, 'category')
+
+    started = time.perf_counter()
+    for product in products:
+        index.add(product['_id'], product)
+    build_time = time.perf_counter() - started
+
+    stats = index.stats()
+    print(f"📊 {args.products} products: built in {build_time:.2f}s, "
+          f"{stats['terms']} terms, {stats['bytes'] / 1024 / 1024:.1f} MB\n")
+
+    print(f"{'query':<22}{'total':>8}{'uncached p50 µs':>17}{'p99 µs':>10}{'cached p50 µs':>15}")
+    for query in QUERIES:
+        uncached = []
+        cached = []
+        for _ in range(args.queries):
+            index._results.clear()
+            started = time.perf_counter()
+            _, _, total = index.search(query, 20)
+            uncached.append((time.perf_counter() - started) * 1e6)
+            started = time.perf_counter()
+            index.search(query, 20)
+            cached.append((time.perf_counter() - started) * 1e6)
+        print(f"{query:<22}{total:>8}{statistics.median(uncached):>17.1f}"
+              f"{percentile(uncached, 0.99):>10.1f}{statistics.median(cached):>15.1f}")
+
+    # Incremental updates: rename products in place
+    changed = random.sample(products, 1000)
+    started = time.perf_counter()
+    for product in changed:
+        product['name'] = f"restocked {product['name']}"
+        index.add(product['_id'], product)
+    print(f"\n🔁 Re-indexed {len(changed)} changed products in "
+          f"{(time.perf_counter() - started) / len(changed) * 1e6:.1f} µs each")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark Socket.IO payload encodings: JSON vs msgpack frames
+Encodes the broadcast events as full Socket.IO packets and reports the
+bytes on the wire and the encode time per broadcast.
+Usage: python bench_socket_encoding.py [--products N] [--updates N] [--rounds N]
+"""
+
+import argparse
+import random
+import time
+import msgpack
+from socketio import packet
+import config.socket as socket_config
+from config.socket import encode_stock_frame, product_categories
+
+def packet_bytes(event, payload):
+    """Encode an event the way the server puts it on the wire"""
+    encoded = packet.Packet(packet.EVENT, data=[event, payload], namespace='/').encode()
+    if isinstance(encoded, list):
+        # Binary packets are a text header followed by attachments
+        return sum(len(part) if isinstance(part, bytes) else len(part.encode('utf-8')) for part in encoded)
+    return len(encoded.encode('utf-8'))
+
+def make_events(products, updates):
+    random.seed(42)
+    product_ids = [f"{i:024x}" for i in range(products)]
+    product_categories.load({product_id: 'Electronics' for product_id in product_ids})
+
+    stock_updates = [
+        {'productId': product_id, 'stock': random.randint(0, 500), 'version': random.randint(1, 10 ** 6)}
+        for product_id in random.sample(product_ids, min(updates, products))
+    ]
+    order = {
+        'orderId': 'ORD-1700000000000-ABC123',
+        'total': 1299.97,
+        'items': [
+            {'productId': product_ids[i], 'name': 'Wireless Headphones', 'quantity': 1, 'price': 433.32}
+            for i in range(3)
+        ]
+    }
+    sold_out = {'productId': product_ids[0], 'productName': 'Wireless Headphones'}
+
+    return [
+        (
+            f'stockUpdates ({len(stock_updates)})',
+            lambda: packet_bytes('stockUpdates', {'updates': stock_updates}),
+            lambda: packet_bytes('stockUpdates', encode_stock_frame(stock_updates))
+        ),
+        (
+            'orderSuccess',
+            lambda: packet_bytes('orderSuccess', order),
+            lambda: packet_bytes('orderSuccess', msgpack.packb(order))
+        ),
+        (
+            'productSoldOut',
+            lambda: packet_bytes('productSoldOut', sold_out),
+            lambda: packet_bytes('productSoldOut', msgpack.packb([product_categories.index_of(product_ids[0])]))
+        )
+    ]
+
+def measure(encode, rounds):
+    size = encode()
+    started = time.perf_counter()
+    for _ in range(rounds):
+        encode()
+    return size, (time.perf_counter() - started) / rounds * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--products', type=int, default=500)
+    parser.add_argument('--updates', type=int, default=50, help='updates per stock frame')
+    parser.add_argument('--rounds', type=int, default=5000)
+    args = parser.parse_args()
+
+    # Keep the mapping table local; there is no server to announce it to
+    socket_config.socketio = None
+
+    print(f"📊 {args.products} products, {args.updates} updates per stock frame, {args.rounds} rounds\n")
+    print(f"{'event':<22}{'JSON B':>9}{'msgpack B':>11}{'saved':>8}{'JSON µs':>10}{'msgpack µs':>12}")
+
+    for name, encode_json, encode_msgpack in make_events(args.products, args.updates):
+        json_size, json_time = measure(encode_json, args.rounds)
+        msgpack_size, msgpack_time = measure(encode_msgpack, args.rounds)
+        saved = 1 - msgpack_size / json_size
+        print(f"{name:<22}{json_size:>9}{msgpack_size:>11}{saved:>8.0%}{json_time:>10.1f}{msgpack_time:>12.1f}")
+
+if __name__ == '__main__':
+    main()
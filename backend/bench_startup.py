@@ -0,0 +1,104 @@
+"""
+Benchmark server startup under each MONGO_INDEX_BUILD mode
+Starts the app in fresh processes (import server, as a WSGI runner would)
+and times how long it takes to be ready to serve, and separately how long
+until its indexes are built. On MongoDB the benchmark uses its own
+database, optionally filled with --products documents, and drops its
+indexes before every start so each one has a build to do.
+Usage: python bench_startup.py [--runs N] [--products N] [--memory]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
+DATABASE = 'flash_sale_startup_bench'
+MODES = ['sync', 'background', 'off']
+
+# Runs in the child: time the import, then wait for the index build
+CHILD = """
+import json, time
+started = time.perf_counter()
+import server
+from config.indexes import index_manager
+ready = time.perf_counter() - started
+while index_manager.status == 'building':
+    time.sleep(0.005)
+indexed = time.perf_counter() - started
+print(json.dumps({'ready': ready, 'indexed': indexed, 'status': index_manager.status}))
+"""
+
+def fill(database, products):
+    """Insert benchmark products so index builds have data to scan"""
+    database.products.drop()
+    start = datetime.utcnow() - timedelta(hours=1)
+    for offset in range(0, products, 10000):
+        database.products.insert_many([{
+            'name': f"Startup product {i}",
+            'price': round(random.uniform(5, 500), 2),
+            'category': random.choice(['Electronics', 'Accessories', 'Home']),
+            'stock': random.randint(0, 100),
+            'sold': random.randint(0, 100),
+            'isActive': True,
+            'saleStartTime': start,
+            'saleEndTime': start + timedelta(days=1),
+            'createdAt': start
+        } for i in range(offset, min(offset + 10000, products))])
+
+def start_once(env):
+    """One server start in a child process; returns its timings"""
+    result = subprocess.run([sys.executable, '-c', CHILD], env=env, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        raise RuntimeError(f"Server failed to start:\n{result.stdout[-2000:]}{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--products', type=int, default=0, help='products to insert before timing (MongoDB only)')
+    parser.add_argument('--memory', action='store_true', help='start on the in-memory engine')
+    args = parser.parse_args()
+
+    env = dict(os.environ, MEMORY_SEED='false')
+    database = None
+    if args.memory:
+        env['STORAGE_ENGINE'] = 'memory'
+    else:
+        from dotenv import load_dotenv
+        from pymongo import MongoClient
+        load_dotenv()
+        uri = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/flash_sale')
+        client = MongoClient(uri)
+        database = client[DATABASE]
+        env['STORAGE_ENGINE'] = 'mongo'
+        env['MONGODB_URI'] = f"{uri.split('://')[0]}://{uri.split('://')[1].split('/')[0]}/{DATABASE}"
+        if args.products:
+            print(f"🌱 Inserting {args.products} products...")
+            fill(database, args.products)
+
+    from config.indexes import INDEXES
+    engine = 'in-memory engine' if args.memory else f"MongoDB ({args.products} products)"
+    print(f"📊 {args.runs} starts per mode on the {engine}\n")
+    print(f"{'mode':<12}{'ready ms':>10}{'indexed ms':>12}  status")
+    try:
+        for mode in MODES:
+            samples = []
+            for _ in range(args.runs):
+                if database is not None:
+                    for collection in INDEXES:
+                        database[collection].drop_indexes()
+                samples.append(start_once(dict(env, MONGO_INDEX_BUILD=mode)))
+            print(f"{mode:<12}{statistics.median(s['ready'] for s in samples) * 1000:>10.0f}"
+                  f"{statistics.median(s['indexed'] for s in samples) * 1000:>12.0f}  {samples[-1]['status']}")
+    finally:
+        if database is not None:
+            database.client.drop_database(DATABASE)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark stock broadcasts: one emit per change vs coalesced ticks
+Simulates a sale burst against a fleet of connected clients without a
+database or network; each client "receives" the encoded frame.
+Usage: python bench_stock_broadcast.py [--clients N] [--updates N] [--products N]
+"""
+
+import argparse
+import json
+import random
+import time
+import config.socket as socket_config
+from config.socket import StockBroadcaster, product_categories
+
+class SimulatedFleet:
+    """Stands in for SocketIO.emit: encodes each frame and fans it out
+
+    Every client is subscribed to the all-products room only.
+    """
+
+    def __init__(self, clients):
+        self.clients = clients
+        self.frames = 0
+        self.bytes_sent = 0
+
+    def emit(self, event, data, namespace=None, room=None, to=None, **kwargs):
+        rooms = to or room
+        if rooms is not None and socket_config.ALL_PRODUCTS_ROOM not in rooms:
+            return
+        packet = json.dumps([event, data]).encode('utf-8')
+        for _ in range(self.clients):
+            # Per-client write: copy into the client's outbound buffer
+            buffer = bytearray(packet)
+            self.bytes_sent += len(buffer)
+            self.frames += 1
+
+def make_workload(updates, products):
+    random.seed(42)
+    product_ids = [f"{i:024x}" for i in range(products)]
+    product_categories.load({product_id: 'Electronics' for product_id in product_ids})
+    stock = {product_id: 10000 for product_id in product_ids}
+    workload = []
+    for _ in range(updates):
+        product_id = random.choice(product_ids)
+        stock[product_id] -= 1
+        workload.append((product_id, stock[product_id]))
+    return workload
+
+def run_legacy(workload, clients):
+    """Previous behaviour: one stockUpdate emit per change"""
+    fleet = SimulatedFleet(clients)
+    started = time.process_time()
+    for product_id, stock in workload:
+        fleet.emit('stockUpdate', {'productId': product_id, 'stock': stock}, namespace='/')
+    return fleet, time.process_time() - started
+
+def run_coalesced(workload, clients, duration, tick):
+    """Batched stockUpdates frames, flushed once per tick of simulated time"""
+    fleet = SimulatedFleet(clients)
+    socket_config.socketio = fleet
+    # Every simulated client takes JSON frames
+    socket_config.msgpack = None
+    broadcaster = StockBroadcaster(tick)
+
+    updates_per_tick = max(1, int(len(workload) * tick / duration))
+    started = time.process_time()
+    for index, (product_id, stock) in enumerate(workload, 1):
+        broadcaster.mark(product_id, stock)
+        if index % updates_per_tick == 0:
+            broadcaster.flush()
+    broadcaster.flush()
+    elapsed = time.process_time() - started
+
+    socket_config.socketio = None
+    return fleet, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--updates', type=int, default=2000, help='stock changes during the burst')
+    parser.add_argument('--products', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=1.0, help='simulated burst length in seconds')
+    parser.add_argument('--tick-ms', type=float, default=100)
+    args = parser.parse_args()
+
+    workload = make_workload(args.updates, args.products)
+
+    print(f"📊 {args.updates} stock changes over {args.products} products in {args.duration}s, "
+          f"{args.clients} clients, tick {args.tick_ms:g} ms\n")
+    print(f"{'mode':<12}{'frames/s':>14}{'MB/s':>10}{'CPU s':>10}")
+
+    for name, (fleet, cpu) in (
+        ('per-change', run_legacy(workload, args.clients)),
+        ('coalesced', run_coalesced(workload, args.clients, args.duration, args.tick_ms / 1000))
+    ):
+        frames_per_second = fleet.frames / args.duration
+        megabytes_per_second = fleet.bytes_sent / args.duration / 1e6
+        print(f"{name:<12}{frames_per_second:>14,.0f}{megabytes_per_second:>10.1f}{cpu:>10.3f}")
+
+if __name__ == '__main__':
+    main()
@@ -1,70 +1,254 @@
-from pymongo import MongoClient, ASCENDING, DESCENDING
+from collections import defaultdict
+from pymongo import MongoClient, monitoring
 from pymongo.errors import ConnectionFailure
+from pymongo.read_preferences import Primary, PrimaryPreferred, Secondary, SecondaryPreferred, Nearest
+from pymongo.write_concern import WriteConcern
+from config.metrics import metrics
+from config.indexes import index_manager
+import threading
+import time
 import os
 from dotenv import load_dotenv
 
+try:
+    # Eventlet's green threads are greenlets; the current one identifies
+    # the task waiting for a connection
+    from greenlet import getcurrent as current_task
+except ImportError:
+    current_task = threading.get_ident
+
 load_dotenv()
 
+# Storage engine behind the models: 'mongo', or 'memory' for an in-process
+# store that needs no database (one worker; data is lost on exit)
+STORAGE_ENGINE = os.getenv('STORAGE_ENGINE', 'mongo')
+
+# MongoClient pool and timeout options, read from the environment; unset
+# options keep pymongo's defaults (maxPoolSize 100, minPoolSize 0, no
+# wait queue or socket timeout)
+POOL_SETTINGS = {
+    'maxPoolSize': 'MONGO_MAX_POOL_SIZE',
+    'minPoolSize': 'MONGO_MIN_POOL_SIZE',
+    'maxIdleTimeMS': 'MONGO_MAX_IDLE_TIME_MS',
+    'maxConnecting': 'MONGO_MAX_CONNECTING',
+    'waitQueueTimeoutMS': 'MONGO_WAIT_QUEUE_TIMEOUT_MS',
+    'connectTimeoutMS': 'MONGO_CONNECT_TIMEOUT_MS',
+    'socketTimeoutMS': 'MONGO_SOCKET_TIMEOUT_MS',
+    'serverSelectionTimeoutMS': 'MONGO_SERVER_SELECTION_TIMEOUT_MS'
+}
+
+def pool_options():
+    """MongoClient keyword arguments for the configured pool settings"""
+    options = {'serverSelectionTimeoutMS': 5000}
+    for option, env in POOL_SETTINGS.items():
+        value = os.getenv(env)
+        if value:
+            options[option] = int(value)
+    return options
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Reports MongoDB connection pool activity through metrics.
+
+    Per server: open and checked-out connections and waiting checkouts as
+    gauges (mongo_pool_open, mongo_pool_in_use, mongo_pool_in_use_max,
+    mongo_pool_waiting), the time spent waiting for a connection as the
+    mongo_pool_wait timing, and failed checkouts by reason.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._gauges = defaultdict(int)
+        # Checkout start times by (task, server): a started event carries no
+        # connection id, and under eventlet many greenlets wait in one thread
+        self._starts = {}
+
+    def _add(self, gauge, address, delta):
+        """Move a per-server gauge by delta and publish it; returns the new value"""
+        server = f"{address[0]}:{address[1]}"
+        with self._lock:
+            self._gauges[gauge, server] += delta
+            value = self._gauges[gauge, server]
+            if gauge == 'mongo_pool_in_use' and value > self._gauges['mongo_pool_in_use_max', server]:
+                self._gauges['mongo_pool_in_use_max', server] = value
+                metrics.set_gauge('mongo_pool_in_use_max', value, server=server)
+        metrics.set_gauge(gauge, value, server=server)
+        return value
+
+    def _observe_wait(self, address):
+        self._add('mongo_pool_waiting', address, -1)
+        with self._lock:
+            started = self._starts.pop((current_task(), address), None)
+        if started is not None:
+            metrics.observe('mongo_pool_wait', time.perf_counter() - started)
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self._starts[current_task(), event.address] = time.perf_counter()
+        self._add('mongo_pool_waiting', event.address, 1)
+
+    def connection_checked_out(self, event):
+        self._observe_wait(event.address)
+        self._add('mongo_pool_in_use', event.address, 1)
+        metrics.increment('mongo_pool_checkouts')
+
+    def connection_check_out_failed(self, event):
+        self._observe_wait(event.address)
+        metrics.increment('mongo_pool_checkout_failures', reason=event.reason)
+
+    def connection_checked_in(self, event):
+        self._add('mongo_pool_in_use', event.address, -1)
+
+    def connection_created(self, event):
+        self._add('mongo_pool_open', event.address, 1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._add('mongo_pool_open', event.address, -1)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        metrics.increment('mongo_pool_cleared', server=f"{event.address[0]}:{event.address[1]}")
+
+    def pool_closed(self, event):
+        pass
+
+# Singleton instance
+pool_metrics = PoolMetrics()
+
+# Read preference and write concern per operation class. Models pass the
+# class to get_collection; operations without one use the client defaults
+# from MONGODB_URI. Override a class per deployment with
+# MONGO_POLICY_<CLASS>, e.g. MONGO_POLICY_ANALYTICS=readPreference=primary
+# or MONGO_POLICY_CHECKOUT=w=majority,wtimeout=5000,j=true
+OPERATION_POLICIES = {
+    # Orders, stock decrements and purchase totals must survive a failover
+    'checkout': {'w': 'majority'},
+    # Carts are cheap to rebuild; acknowledge on the primary alone
+    'cart': {'w': 1},
+    # Reports and rankings tolerate lag; 90s is the smallest staleness Mongo accepts
+    'analytics': {'readPreference': 'secondaryPreferred', 'maxStalenessSeconds': 90},
+    'leaderboard': {'readPreference': 'secondaryPreferred', 'maxStalenessSeconds': 90}
+}
+
+READ_MODES = {
+    'primary': Primary,
+    'primaryPreferred': PrimaryPreferred,
+    'secondary': Secondary,
+    'secondaryPreferred': SecondaryPreferred,
+    'nearest': Nearest
+}
+
+POLICY_OPTIONS = ('readPreference', 'maxStalenessSeconds', 'w', 'wtimeout', 'j')
+
+def parse_policy(text):
+    """Policy dict from 'option=value,...' text"""
+    policy = {}
+    for pair in text.split(','):
+        if not pair.strip():
+            continue
+        option, _, value = (part.strip() for part in pair.partition('='))
+        if option not in POLICY_OPTIONS:
+            raise ValueError(f"Unknown policy option: {option}")
+        if value.lstrip('-').isdigit():
+            value = int(value)
+        elif value.lower() in ('true', 'false'):
+            value = value.lower() == 'true'
+        policy[option] = value
+    return policy
+
+def operation_policies():
+    """Policies of every operation class with environment overrides applied"""
+    policies = {}
+    for operation, policy in OPERATION_POLICIES.items():
+        override = os.getenv(f"MONGO_POLICY_{operation.upper()}")
+        policies[operation] = parse_policy(override) if override is not None else dict(policy)
+    return policies
+
+def policy_options(policy):
+    """Collection.with_options keyword arguments for a policy"""
+    options = {}
+    mode = policy.get('readPreference')
+    if mode:
+        if mode not in READ_MODES:
+            raise ValueError(f"Unknown read preference: {mode}")
+        if mode == 'primary':
+            options['read_preference'] = Primary()
+        else:
+            options['read_preference'] = READ_MODES[mode](max_staleness=policy.get('maxStalenessSeconds', -1))
+    write_concern = {option: policy[option] for option in ('w', 'wtimeout', 'j') if option in policy}
+    if write_concern:
+        options['write_concern'] = WriteConcern(**write_concern)
+    return options
+
 class Database:
     _instance = None
     _client = None
     _db = None
+    _policies = None
+    _collections = {}
 
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(Database, cls).__new__(cls)
         return cls._instance
 
+    @staticmethod
+    def database_name(mongodb_uri):
+        """Extract database name from URI or use default"""
+        if '/' in mongodb_uri.split('://')[-1]:
+            return mongodb_uri.split('/')[-1].split('?')[0]
+        return 'flash_sale'
+
     def connect(self):
-        """Connect to MongoDB"""
+        """Connect to MongoDB, or open the in-memory store"""
+        if STORAGE_ENGINE == 'memory':
+            return self.connect_memory()
+        if STORAGE_ENGINE != 'mongo':
+            raise ValueError(f"Unknown STORAGE_ENGINE: {STORAGE_ENGINE}")
+
         try:
             mongodb_uri = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/flash_sale')
-            self._client = MongoClient(mongodb_uri, serverSelectionTimeoutMS=5000)
-
-            # Extract database name from URI or use default
-            if '/' in mongodb_uri.split('://')[-1]:
-                db_name = mongodb_uri.split('/')[-1].split('?')[0]
-            else:
-                db_name = 'flash_sale'
+            options = pool_options()
+            self._client = MongoClient(mongodb_uri, event_listeners=[pool_metrics], **options)
 
+            db_name = self.database_name(mongodb_uri)
             self._db = self._client[db_name]
+            self._policies = operation_policies()
+            self._collections = {}
 
             # Test connection
             self._client.admin.command('ping')
-            print(f"✅ Connected to MongoDB: {db_name}")
-
-            # Create indexes
-            self.create_indexes()
+            print(f"✅ Connected to MongoDB: {db_name} (pool {options.get('minPoolSize', 0)}-{options.get('maxPoolSize', 100)})")
+            for operation, policy in self._policies.items():
+                print(f"   {operation}: {', '.join(f'{k}={v}' for k, v in policy.items()) or 'client defaults'}")
 
+            # Indexes are built by config.indexes: in the background once the
+            # server is up, or through python manage.py migrate-indexes
             return self._db
         except ConnectionFailure as e:
             print(f"❌ Failed to connect to MongoDB: {e}")
             raise
 
-    def create_indexes(self):
-        """Create database indexes for better performance"""
-        try:
-            # User indexes
-            self._db.users.create_index([("email", ASCENDING)], unique=True)
-            self._db.users.create_index([("totalPurchases", DESCENDING)])
-
-            # Product indexes
-            self._db.products.create_index([("category", ASCENDING)])
-            self._db.products.create_index([("stock", ASCENDING)])
-            self._db.products.create_index([("sold", DESCENDING)])
-            self._db.products.create_index([("saleEndTime", ASCENDING)])
-
-            # Order indexes
-            self._db.orders.create_index([("user", ASCENDING), ("createdAt", DESCENDING)])
-            self._db.orders.create_index([("orderId", ASCENDING)], unique=True)
-            self._db.orders.create_index([("checkoutTime", ASCENDING)])
-
-            # Cart indexes
-            self._db.carts.create_index([("user", ASCENDING)], unique=True)
-
-            print("✅ Database indexes created successfully")
-        except Exception as e:
-            print(f"⚠️  Warning: Could not create indexes: {e}")
+    def connect_memory(self):
+        """Open the in-memory store; connecting again keeps its data"""
+        from utils.memory_store import MemoryDatabase
+        if not isinstance(self._db, MemoryDatabase):
+            db_name = self.database_name(os.getenv('MONGODB_URI', 'mongodb://localhost:27017/flash_sale'))
+            self._db = MemoryDatabase(db_name)
+            self._policies = operation_policies()
+            self._collections = {}
+            print(f"✅ Using in-memory storage: {db_name}")
+            # Nothing to wait for in memory, and unique indexes must exist
+            # before the first write
+            index_manager.ensure(self._db)
+        return self._db
 
     def get_db(self):
         """Get database instance"""
@@ -72,6 +256,32 @@ class Database:
             self.connect()
         return self._db
 
+    def get_collection(self, name, operation=None):
+        """Get a collection with the read preference and write concern of an operation class"""
+        db = self.get_db()
+        if operation is None:
+            return db[name]
+        if operation not in self._policies:
+            raise ValueError(f"Unknown operation class: {operation}")
+
+        key = (name, operation)
+        collection = self._collections.get(key)
+        if collection is None:
+            collection = db[name].with_options(**policy_options(self._policies[operation]))
+            self._collections[key] = collection
+        return collection
+
+    def start_session(self):
+        """A causally consistent session, or None on the in-memory engine
+
+        Reads in the session see at least what earlier reads in it saw,
+        even when a read preference sends them to different members.
+        """
+        self.get_db()
+        if self._client is None:
+            return None
+        return self._client.start_session(causal_consistency=True)
+
     def close(self):
         """Close database connection"""
         if self._client:
@@ -84,3 +294,11 @@ db = Database()
 def get_database():
     """Helper function to get database instance"""
     return db.get_db()
+
+def get_collection(name, operation=None):
+    """Helper function to get a collection under an operation class policy"""
+    return db.get_collection(name, operation)
+
+def start_session():
+    """Helper function to start a causally consistent session"""
+    return db.start_session()
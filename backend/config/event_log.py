@@ -0,0 +1,116 @@
+from collections import deque
+from dotenv import load_dotenv
+import json
+import threading
+import uuid
+import os
+
+try:
+    import redis
+except ImportError:  # the redis event log is optional
+    redis = None
+
+load_dotenv()
+
+# Broadcast events kept for replay to reconnecting clients
+SOCKET_REPLAY_BUFFER = int(os.getenv('SOCKET_REPLAY_BUFFER', 1000))
+
+# memory keeps a per-process buffer; redis shares one buffer between
+# workers and keeps it across restarts. Defaults to redis when the
+# Socket.IO message queue is redis.
+SOCKET_REPLAY_BACKEND = os.getenv(
+    'SOCKET_REPLAY_BACKEND',
+    'redis' if (os.getenv('SOCKETIO_MESSAGE_QUEUE') or '').startswith('redis') else 'memory'
+)
+SOCKET_REPLAY_REDIS_URL = os.getenv('SOCKET_REPLAY_REDIS_URL', os.getenv('SOCKETIO_MESSAGE_QUEUE', 'redis://localhost:6379/0'))
+
+class MemoryEventLog:
+    """Bounded ring buffer of broadcast events for this process.
+
+    Every event is stamped with the next sequence number. The epoch is
+    unique to the process, so clients that resume against a restarted
+    server are told to resync.
+    """
+
+    def __init__(self, size=SOCKET_REPLAY_BUFFER):
+        self.epoch = uuid.uuid4().hex
+        self.seq = 0
+        self._events = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def append(self, event, room, payload):
+        """Record an event and return its payload stamped with seq"""
+        with self._lock:
+            self.seq += 1
+            payload = dict(payload, seq=self.seq)
+            self._events.append((self.seq, event, room, payload))
+        return payload
+
+    def current(self):
+        return self.seq
+
+    def since(self, seq):
+        """Events after seq as (seq, event, room, payload), or None when
+        the buffer no longer reaches back that far"""
+        with self._lock:
+            if seq > self.seq:
+                return None
+            oldest = self._events[0][0] if self._events else self.seq + 1
+            if seq < oldest - 1:
+                return None
+            return [entry for entry in self._events if entry[0] > seq]
+
+class RedisEventLog:
+    """Ring buffer of broadcast events shared by all workers through Redis
+
+    Sequence numbers come from one INCR counter, so every worker stamps
+    from the same sequence and a client can resume on any of them.
+    """
+
+    def __init__(self, url=SOCKET_REPLAY_REDIS_URL, size=SOCKET_REPLAY_BUFFER, namespace='flash_sale:events:'):
+        if redis is None:
+            raise RuntimeError('redis package is required for SOCKET_REPLAY_BACKEND=redis')
+        self.client = redis.Redis.from_url(url)
+        self.size = size
+        self.namespace = namespace
+        self.client.set(namespace + 'epoch', uuid.uuid4().hex, nx=True)
+        self.epoch = self.client.get(namespace + 'epoch').decode('utf-8')
+
+    def append(self, event, room, payload):
+        """Record an event and return its payload stamped with seq"""
+        seq = self.client.incr(self.namespace + 'seq')
+        payload = dict(payload, seq=seq)
+        pipeline = self.client.pipeline()
+        pipeline.rpush(self.namespace + 'buffer', json.dumps([seq, event, room, payload]))
+        pipeline.ltrim(self.namespace + 'buffer', -self.size, -1)
+        pipeline.execute()
+        return payload
+
+    def current(self):
+        return int(self.client.get(self.namespace + 'seq') or 0)
+
+    def since(self, seq):
+        """Events after seq as (seq, event, room, payload), or None when
+        the buffer no longer reaches back that far"""
+        current = self.current()
+        events = sorted(
+            tuple(json.loads(raw)) for raw in self.client.lrange(self.namespace + 'buffer', 0, -1)
+        )
+        if seq > current:
+            return None
+        oldest = events[0][0] if events else current + 1
+        if seq < oldest - 1:
+            return None
+        return [entry for entry in events if entry[0] > seq]
+
+_event_log = None
+
+def get_event_log():
+    """Get the configured event log, creating it on first use"""
+    global _event_log
+    if _event_log is None:
+        if SOCKET_REPLAY_BACKEND == 'redis':
+            _event_log = RedisEventLog()
+        else:
+            _event_log = MemoryEventLog()
+    return _event_log
@@ -0,0 +1,172 @@
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from config.metrics import metrics
+import threading
+import time
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# When missing indexes are built: 'background' (default) builds unique and
+# TTL indexes before the server serves and the rest once it is serving,
+# 'sync' all before it serves, 'off' only through
+# python manage.py migrate-indexes
+INDEX_BUILD = os.getenv('MONGO_INDEX_BUILD', 'background')
+
+# Sort orders of the product listing (see models/product.py SORT_FIELDS)
+PRODUCT_LISTING_SORTS = [
+    ("createdAt", DESCENDING),
+    ("price", ASCENDING),
+    ("sold", DESCENDING),
+    ("stock", DESCENDING)
+]
+
+# Every index the app relies on, by collection
+INDEXES = {
+    'users': [
+        IndexModel([("email", ASCENDING)], unique=True),
+        IndexModel([("totalPurchases", DESCENDING)])
+    ],
+    'products': [
+        IndexModel([("saleEndTime", ASCENDING)]),
+        IndexModel([("isActive", ASCENDING), ("saleEndTime", ASCENDING)]),
+        # Product listing: one per sort, with and without a category,
+        # ending in _id for stable cursor pages
+        *[IndexModel([(field, direction), ("_id", direction)]) for field, direction in PRODUCT_LISTING_SORTS],
+        *[IndexModel([("category", ASCENDING), (field, direction), ("_id", direction)]) for field, direction in PRODUCT_LISTING_SORTS],
+        IndexModel([("revenue", DESCENDING)]),
+        IndexModel([("catalogVersion", ASCENDING)])
+    ],
+    'orders': [
+        IndexModel([("user", ASCENDING), ("createdAt", DESCENDING)]),
+        IndexModel([("orderId", ASCENDING)], unique=True),
+        IndexModel([("checkoutTime", ASCENDING)])
+    ],
+    'order_rollups': [
+        IndexModel([("hour", ASCENDING), ("product", ASCENDING)], unique=True)
+    ],
+    'traffic_windows': [
+        IndexModel([("granularity", ASCENDING), ("window", ASCENDING), ("worker", ASCENDING)], unique=True),
+        IndexModel([("expiresAt", ASCENDING)], expireAfterSeconds=0)
+    ],
+    'carts': [
+        IndexModel([("user", ASCENDING)], unique=True)
+    ]
+}
+
+def index_spec(document):
+    """Comparable (key, options) of an IndexModel document or a list_indexes entry"""
+    key = tuple((field, int(direction) if isinstance(direction, float) else direction)
+                for field, direction in document['key'].items())
+    expire = document.get('expireAfterSeconds')
+    return key, (bool(document.get('unique', False)), None if expire is None else int(expire))
+
+def is_constraint(index):
+    """Unique and TTL indexes change what writes do, so they cannot wait"""
+    return bool(index.document.get('unique')) or 'expireAfterSeconds' in index.document
+
+def plan(db):
+    """Compare INDEXES with the database, one list_indexes call per collection
+
+    Returns {collection: {'missing': [IndexModel], 'conflicts': [message],
+    'extra': [index name]}}. A conflict is a declared key that exists with
+    other options; extra indexes exist but are not declared. Neither is
+    changed automatically.
+    """
+    changes = {}
+    for collection, declared in INDEXES.items():
+        existing = {}
+        for index in db[collection].list_indexes():
+            key, options = index_spec(index)
+            existing[key] = (options, index['name'])
+
+        change = {'missing': [], 'conflicts': [], 'extra': []}
+        declared_keys = set()
+        for model in declared:
+            key, options = index_spec(model.document)
+            declared_keys.add(key)
+            if key not in existing:
+                change['missing'].append(model)
+            elif existing[key][0] != options:
+                change['conflicts'].append(
+                    f"{model.document['name']} exists as {existing[key][1]} with different options"
+                )
+        change['extra'] = [name for key, (_, name) in existing.items() if key not in declared_keys and name != '_id_']
+        changes[collection] = change
+    return changes
+
+class IndexManager:
+    """Brings the database's indexes in line with INDEXES.
+
+    Compares with plan() and creates what is missing, one create_indexes
+    call per collection. Conflicting and extra indexes are reported, never
+    dropped.
+    """
+
+    def __init__(self):
+        self.status = 'pending'
+        self._lock = threading.Lock()
+
+    def ensure(self, db, constraints=None):
+        """Create missing indexes; returns the plan
+
+        constraints=True creates only unique and TTL indexes, False only
+        the others, None all of them.
+        """
+        with self._lock:
+            started = time.perf_counter()
+            changes = plan(db)
+            created = 0
+            remaining = False
+            for collection, change in changes.items():
+                for conflict in change['conflicts']:
+                    print(f"⚠️  Index conflict on {collection}: {conflict}")
+                missing = [index for index in change['missing']
+                           if constraints is None or is_constraint(index) == constraints]
+                remaining = remaining or len(missing) < len(change['missing'])
+                if missing:
+                    db[collection].create_indexes(missing)
+                    created += len(missing)
+                    print(f"   🔨 {collection}: {', '.join(index.document['name'] for index in missing)}")
+
+            if any(change['conflicts'] for change in changes.values()):
+                self.status = 'conflicts'
+            else:
+                self.status = 'building' if remaining else 'ready'
+            elapsed = time.perf_counter() - started
+            metrics.observe('index_build', elapsed)
+            metrics.increment('indexes_created', created)
+            print(f"✅ Database indexes checked: {created} created in {elapsed * 1000:.0f} ms")
+            return changes
+
+    def _run(self, db, constraints=None):
+        try:
+            self.ensure(db, constraints)
+        except Exception as e:
+            self.status = 'failed'
+            print(f"⚠️  Warning: Could not create indexes: {e}")
+
+    def start(self, db):
+        """Ensure indexes as INDEX_BUILD says: now, as a background task, or not at all"""
+        if self.status == 'ready':
+            return
+        if INDEX_BUILD == 'off':
+            self.status = 'skipped'
+            print("⏭️  Index build skipped; run python manage.py migrate-indexes")
+        elif INDEX_BUILD == 'sync':
+            self._run(db)
+        else:
+            # Unique and TTL indexes first, before any request can write a
+            # duplicate; they are cheap on the new collections they are
+            # usually missing from
+            self._run(db, constraints=True)
+            if self.status != 'building':
+                return
+            # The rest in a real thread, not a Socket.IO background task:
+            # pymongo's sockets are not green unless eventlet is
+            # monkey-patched, and a long createIndexes would otherwise stall
+            # the event loop
+            threading.Thread(target=self._run, args=(db, False), daemon=True, name='index-build').start()
+
+# Singleton instance
+index_manager = IndexManager()
@@ -0,0 +1,71 @@
+import threading
+import time
+
+class Metrics:
+    """Process-local counters, gauges and timings exported at /metrics"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._timings = {}
+        self._started_at = time.time()
+
+    def reset(self):
+        """Drop all recorded metrics"""
+        with self._lock:
+            self._counters = {}
+            self._gauges = {}
+            self._timings = {}
+
+    @staticmethod
+    def _key(name, labels):
+        if not labels:
+            return name
+        label_str = ','.join(f"{k}={v}" for k, v in sorted(labels.items()))
+        return f"{name}{{{label_str}}}"
+
+    def increment(self, name, value=1, **labels):
+        """Increment a counter"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        """Set a gauge to its current value"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(self, name, seconds, **labels):
+        """Record a duration in seconds"""
+        key = self._key(name, labels)
+        with self._lock:
+            timing = self._timings.get(key)
+            if timing is None:
+                timing = self._timings[key] = {'count': 0, 'total': 0.0, 'max': 0.0}
+            timing['count'] += 1
+            timing['total'] += seconds
+            timing['max'] = max(timing['max'], seconds)
+
+    def snapshot(self):
+        """Get a JSON-serializable copy of all metrics"""
+        with self._lock:
+            timings = {
+                key: {
+                    'count': timing['count'],
+                    'totalMs': round(timing['total'] * 1000, 3),
+                    'avgMs': round(timing['total'] * 1000 / timing['count'], 3) if timing['count'] else 0,
+                    'maxMs': round(timing['max'] * 1000, 3)
+                }
+                for key, timing in self._timings.items()
+            }
+            return {
+                'uptime': round(time.time() - self._started_at, 1),
+                'counters': dict(self._counters),
+                'gauges': dict(self._gauges),
+                'timings': timings
+            }
+
+# Singleton instance
+metrics = Metrics()
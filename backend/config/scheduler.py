@@ -0,0 +1,166 @@
+from datetime import datetime
+from dotenv import load_dotenv
+from config.metrics import metrics
+from middleware.cache import response_cache
+from models.cart import Cart
+from models.lease import Lease
+from models.product import Product
+from utils.timer_wheel import TimerWheel
+import config.socket as socket_config
+import socket
+import threading
+import time
+import os
+
+load_dotenv()
+
+SALE_SCHEDULER_TICK = float(os.getenv('SALE_SCHEDULER_TICK_MS', 1000)) / 1000
+SALE_LEASE_TTL = float(os.getenv('SALE_LEASE_TTL', 15))
+SALE_LEASE_NAME = 'sale_scheduler'
+
+EPOCH = datetime(1970, 1, 1)
+
+def epoch_seconds(moment):
+    """Seconds since the epoch for a naive UTC datetime"""
+    return (moment - EPOCH).total_seconds()
+
+class SaleScheduler:
+    """Flips isActive when product sales start and end.
+
+    Every worker keeps a timer wheel holding one timer per upcoming sale
+    start and end. The wheel is loaded from the saleEndTime index at
+    startup and updated when products change. The leader also picks up,
+    each tick, the sale windows of products changed since its last check
+    by catalog version, so it holds boundaries written on any worker.
+    When a timer fires, the
+    worker holding the leader lease finds the products that crossed a
+    boundary and flips them with one bulk update per direction. It also
+    removes ended products from carts and emits saleStarted and saleEnded.
+    A worker that takes the lease over catches up on any boundary missed
+    while no worker was leading.
+    """
+
+    def __init__(self, tick=SALE_SCHEDULER_TICK, lease_ttl=SALE_LEASE_TTL):
+        self.tick = tick
+        self.lease_ttl = lease_ttl
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+        self.wheel = TimerWheel(tick, now=time.time())
+        self.is_leader = False
+        self._lease_checked = 0
+        # Catalog version at the last sync
+        self._version = None
+        self._lock = threading.Lock()
+        self._running = False
+
+    def schedule(self, product, now=None):
+        """Set or replace a product's sale start and end timers"""
+        now = time.time() if now is None else now
+        product_id = str(product['_id'])
+        with self._lock:
+            for boundary in ('saleStartTime', 'saleEndTime'):
+                key = (product_id, boundary)
+                moment = product.get(boundary)
+                if isinstance(moment, datetime) and epoch_seconds(moment) > now:
+                    self.wheel.schedule(key, epoch_seconds(moment))
+                else:
+                    self.wheel.cancel(key)
+
+    def load(self):
+        """Schedule every sale that has not ended yet"""
+        now = time.time()
+        version = Product.current_version()
+        for product in Product.find_sale_schedule(datetime.utcnow()):
+            self.schedule(product, now)
+        self._version = version
+        print(f"⏰ Sale scheduler loaded {len(self.wheel)} timers")
+
+    def sync(self):
+        """Schedule the sale windows of products changed since the last sync"""
+        if self._version is None:
+            self.load()
+            return
+        version = Product.current_version()
+        now = time.time()
+        # From a settled version, since writes land after their version
+        changed = Product.find_sale_schedule(datetime.utcnow(), changed_since=Product.settled_version(self._version))
+        for product in changed:
+            self.schedule(product, now)
+        self._version = version
+        metrics.increment('sale_schedule_synced', len(changed))
+
+    def renew_lease(self, now):
+        """Take or renew the leader lease; returns True when just gained"""
+        if now - self._lease_checked < self.lease_ttl / 3:
+            return False
+        self._lease_checked = now
+
+        was_leader = self.is_leader
+        self.is_leader = Lease.acquire(SALE_LEASE_NAME, self.worker, self.lease_ttl)
+        if self.is_leader != was_leader:
+            print(f"⏰ Sale scheduler {'is now' if self.is_leader else 'is no longer'} the leader")
+        return self.is_leader and not was_leader
+
+    def advance(self, now=None):
+        """Fire due timers; returns the product ids started and ended"""
+        now = time.time() if now is None else now
+        gained = self.renew_lease(now)
+        if self.is_leader:
+            # Boundaries written on other workers never reached this wheel
+            self.sync()
+        with self._lock:
+            fired = self.wheel.advance(now)
+
+        if not self.is_leader or not (fired or gained):
+            return [], []
+        return self.apply()
+
+    def apply(self):
+        """Flip every product that crossed a sale boundary"""
+        starting, ending = Product.find_sale_transitions(datetime.utcnow())
+        if not starting and not ending:
+            return [], []
+
+        Product.set_active(starting, True)
+        Product.set_active(ending, False)
+        released = Cart.release_products(ending)
+        response_cache.invalidate('/api/products')
+
+        if starting:
+            # Clients add the products from the event instead of refetching
+            socket_config.emit_sale_started(starting, [Product.to_dict(p) for p in Product.find_by_ids(starting)])
+        if ending:
+            socket_config.emit_sale_ended(ending)
+
+        metrics.increment('sales_started', len(starting))
+        metrics.increment('sales_ended', len(ending))
+        print(f"⏰ Sales started: {len(starting)}, ended: {len(ending)}, carts released: {released}")
+        return starting, ending
+
+    def run(self):
+        while self._running:
+            socket_config.socketio.sleep(self.tick)
+            try:
+                self.advance()
+            except Exception as e:
+                print(f"⚠️  Sale scheduler tick failed: {e}")
+
+    def start(self):
+        """Load timers and start the tick loop as a Socket.IO background task"""
+        if self._running or not socket_config.socketio:
+            return
+        try:
+            self.load()
+        except Exception as e:
+            print(f"⚠️  Failed to load sale schedule: {e}")
+        self._running = True
+        socket_config.socketio.start_background_task(self.run)
+
+    def stop(self):
+        """Stop ticking and hand the lease to another worker"""
+        self._running = False
+        if self.is_leader:
+            Lease.release(SALE_LEASE_NAME, self.worker)
+            self.is_leader = False
+
+# Singleton instance
+sale_scheduler = SaleScheduler()
@@ -1,39 +1,547 @@
-from flask_socketio import SocketIO, emit, join_room, leave_room
+from flask_socketio import SocketIO, emit, join_room, leave_room, rooms
 from flask import request
+from dotenv import load_dotenv
+from bson import ObjectId
+from collections import defaultdict
+from config.metrics import metrics
+from config.event_log import get_event_log
+from middleware.auth import verify_token
+import threading
+import hashlib
+import time
+import os
+
+try:
+    import msgpack
+except ImportError:  # binary frames are optional
+    msgpack = None
+
+load_dotenv()
+
+STOCK_BROADCAST_INTERVAL = float(os.getenv('STOCK_BROADCAST_INTERVAL_MS', 100)) / 1000
+
+# Packets a connection may have waiting before stock frames are held back,
+# and how long it may stay that far behind before it is disconnected
+SOCKET_MAX_QUEUE = int(os.getenv('SOCKET_MAX_QUEUE', 64))
+SOCKET_MAX_BEHIND = float(os.getenv('SOCKET_MAX_BEHIND_SECONDS', 10))
+
+# How long an id missing from the products collection is not looked up again
+PRODUCT_MISS_TTL = float(os.getenv('PRODUCT_MISS_TTL_SECONDS', 5))
+
+# e.g. redis://localhost:6379/0 to fan events out across worker processes
+SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE')
+
+# Room for clients that want every product's stock events
+ALL_PRODUCTS_ROOM = 'products_all'
+
+# Clients connecting with ?encoding=msgpack get binary broadcast frames
+MSGPACK_ENCODING = 'msgpack'
+MSGPACK_CLIENTS_ROOM = 'encoding_msgpack'
 
 socketio = None
 
-def init_socketio(app):
-    """Initialize Socket.IO with Flask app"""
+# sid -> negotiated encoding, for clients that asked for msgpack
+client_encodings = {}
+
+def product_room(product_id):
+    return f"product_{product_id}"
+
+def user_room(user_id):
+    return f"user_{user_id}"
+
+def category_room(category):
+    return f"category_{category}"
+
+def encoded_room(room):
+    """Twin of a room for clients receiving msgpack frames"""
+    return f"{room}:{MSGPACK_ENCODING}"
+
+def room_members(room):
+    """Local clients in a room, as sid -> engine.io sid"""
+    try:
+        return socketio.server.manager.rooms.get('/', {}).get(room) or {}
+    except AttributeError:
+        return {}
+
+def room_has_members(room):
+    """Check whether any local client is in a room
+
+    With a message queue, members may be connected to other workers, so
+    every room is assumed to have members.
+    """
+    if SOCKETIO_MESSAGE_QUEUE:
+        return True
+    try:
+        return bool(socketio.server.manager.rooms.get('/', {}).get(room))
+    except AttributeError:
+        return True
+
+class ProductCategories:
+    """Process-local product -> category map used to route stock events
+
+    Also numbers products by ObjectId order, so binary frames can carry a
+    small index instead of the 24-char id. Every worker derives the same
+    table from the same products. The generation is a digest of the
+    table, so workers agree on it: a frame packed on one worker decodes
+    against a table sent by another only when the two are the same.
+    """
+
+    def __init__(self):
+        self._categories = {}
+        self._ids = []
+        self._indices = {}
+        self._misses = {}
+        self.generation = 0
+        self._lock = threading.Lock()
+
+    def _lookup(self, product_id):
+        """Fetch one product missing from the map; unknown ids are remembered
+        for PRODUCT_MISS_TTL so the broadcast tick does not query them again"""
+        now = time.time()
+        if self._misses.get(product_id, 0) > now:
+            return None
+        from models.product import Product
+        try:
+            product = Product.get_collection().find_one({'_id': ObjectId(product_id)}, {'category': 1})
+        except Exception:
+            product = None
+        if product is None:
+            if len(self._misses) >= 1000:
+                self._misses = {key: expires for key, expires in self._misses.items() if expires > now}
+            self._misses[product_id] = now + PRODUCT_MISS_TTL
+        return product
+
+    def get(self, product_id):
+        product_id = str(product_id)
+        if product_id not in self._categories:
+            product = self._lookup(product_id)
+            if product is not None:
+                self.set(product_id, product.get('category'))
+        return self._categories.get(product_id)
+
+    def index_of(self, product_id):
+        """Get the product's index in the mapping table"""
+        product_id = str(product_id)
+        index = self._indices.get(product_id)
+        if index is None and self._lookup(product_id) is not None:
+            # A new product changes the table for every client
+            self.reload()
+            index = self._indices.get(product_id)
+        return index
+
+    @staticmethod
+    def table_generation(ids):
+        """Generation of a table: 0 when empty, else a digest of its ids"""
+        if not ids:
+            return 0
+        digest = hashlib.blake2b(','.join(ids).encode(), digest_size=4).digest()
+        return int.from_bytes(digest, 'big') or 1
+
+    def table(self):
+        """Mapping table sent to msgpack clients: index -> product id"""
+        return {'generation': self.generation, 'products': list(self._ids)}
+
+    def reload(self):
+        """Load all product categories in one query"""
+        from models.product import Product
+        categories = {
+            str(product['_id']): product.get('category')
+            for product in Product.get_collection().find({}, {'category': 1}).sort('_id', 1)
+        }
+        self.load(categories)
+
+    def load(self, categories):
+        """Replace the category map, given product ids in ObjectId order"""
+        ids = list(categories)
+        with self._lock:
+            self._categories = categories
+            changed = ids != self._ids
+            if changed:
+                self._ids = ids
+                self._indices = {product_id: index for index, product_id in enumerate(ids)}
+                self.generation = self.table_generation(ids)
+
+        if changed and socketio and msgpack:
+            socketio.emit('productIndex', self.table(), room=MSGPACK_CLIENTS_ROOM, namespace='/')
+
+    def set(self, product_id, category):
+        with self._lock:
+            self._categories[str(product_id)] = category
+
+# Singleton instance
+product_categories = ProductCategories()
+
+def encode_stock_frame(updates, seq=None):
+    """Pack stock updates as msgpack [generation, [[index, stock, version], ...], seq]"""
+    rows = []
+    for update in updates:
+        index = product_categories.index_of(update['productId'])
+        if index is not None:
+            rows.append([index, update['stock'], update.get('version', 0)])
+    return msgpack.packb([product_categories.generation, rows, seq])
+
+# Events with a msgpack form, for clients that negotiated it
+FRAME_ENCODERS = {
+    'stockUpdates': lambda payload: encode_stock_frame(payload['updates'], payload.get('seq')),
+    'productSoldOut': lambda payload: msgpack.packb([
+        product_categories.index_of(payload['productId']), payload.get('seq')
+    ])
+}
+
+def encode_for_client(sid, event, payload):
+    """Payload as a client should receive it, given its encoding"""
+    encoder = FRAME_ENCODERS.get(event)
+    if encoder and msgpack and client_encodings.get(sid) == MSGPACK_ENCODING:
+        return encoder(payload)
+    return payload
+
+def emit_to_room(event, room, payload, skip_sid=None):
+    """Emit a broadcast event to a room, a list of rooms or None for everyone
+
+    The event is stamped with a sequence number and kept in the replay
+    log once, even when no local client is in the rooms, since clients
+    that are reconnecting are in no room yet. A list of rooms is one
+    emit, so a client in several of them gets the event once. Events with
+    a msgpack form go to the rooms' msgpack twins encoded.
+    """
+    payload = get_event_log().append(event, room, payload)
+    if room is None:
+        socketio.emit(event, payload, skip_sid=skip_sid, namespace='/')
+        return payload
+
+    rooms = [room] if isinstance(room, str) else room
+    targets = [r for r in rooms if room_has_members(r)]
+    if targets:
+        socketio.emit(event, payload, to=targets, skip_sid=skip_sid, namespace='/')
+    encoder = FRAME_ENCODERS.get(event)
+    encoded_targets = [encoded_room(r) for r in rooms if room_has_members(encoded_room(r))]
+    if msgpack and encoder and encoded_targets:
+        socketio.emit(event, encoder(payload), to=encoded_targets, skip_sid=skip_sid, namespace='/')
+    return payload
+
+def logged_for(room, joined):
+    """Whether a logged event's room (or rooms) includes one of the joined rooms"""
+    rooms = [room] if isinstance(room, str) else room
+    return any(r in joined or encoded_room(r) in joined for r in rooms)
+
+class SlowConsumers:
+    """Per-connection outbound queue limits for stock frames.
+
+    Once per tick the engine.io queue of every local connection is
+    measured. Connections with more than max_queue packets waiting are
+    skipped by room emits. The updates they miss go into a backlog that
+    keeps only the newest update per product, and the backlog is sent as
+    one frame once the queue drains. A connection still behind after
+    max_behind seconds gets a resync hint and is disconnected.
+    """
+
+    def __init__(self, max_queue=SOCKET_MAX_QUEUE, max_behind=SOCKET_MAX_BEHIND):
+        self.max_queue = max_queue
+        self.max_behind = max_behind
+        self.slow = {}
+        self.backlogs = {}
+        self.backlog_seqs = {}
+
+    def queue_depth(self, eio_sid):
+        """Packets waiting in a connection's engine.io queue"""
+        try:
+            return socketio.server.eio.sockets[eio_sid].queue.qsize()
+        except (AttributeError, KeyError):
+            return 0
+
+    def check(self, now=None):
+        """Measure queues, release drained backlogs and drop stuck clients
+
+        Returns the sids to leave out of this tick's room emits.
+        """
+        now = time.time() if now is None else now
+        clients = dict(room_members(None))
+        depths = []
+
+        for sid, eio_sid in clients.items():
+            depth = self.queue_depth(eio_sid)
+            depths.append(depth)
+            if depth > self.max_queue:
+                behind_since = self.slow.setdefault(sid, now)
+                if now - behind_since >= self.max_behind:
+                    self.drop(sid)
+            elif sid in self.slow:
+                del self.slow[sid]
+                self.send_backlog(sid)
+
+        # Forget connections that closed while behind
+        for sid in [sid for sid in self.slow if sid not in clients]:
+            self.forget(sid)
+
+        metrics.set_gauge('socket_clients', len(depths))
+        metrics.set_gauge('socket_queue_depth_max', max(depths, default=0))
+        metrics.set_gauge('socket_queue_depth_total', sum(depths))
+        metrics.set_gauge('socket_slow_clients', len(self.slow))
+        return list(self.slow)
+
+    def hold(self, rooms, updates, seq=None):
+        """Keep updates sent to rooms, logged as seq, for their members that are behind"""
+        members = set()
+        for room in rooms:
+            members.update(room_members(room), room_members(encoded_room(room)))
+        for sid in members.intersection(self.slow):
+            if seq is not None:
+                self.backlog_seqs[sid] = max(seq, self.backlog_seqs.get(sid, 0))
+            backlog = self.backlogs.setdefault(sid, {})
+            for update in updates:
+                if update['productId'] in backlog:
+                    metrics.increment('socket_stale_updates_dropped')
+                backlog[update['productId']] = update
+
+    def send_backlog(self, sid):
+        """Send the held updates to a connection that caught up"""
+        backlog = self.backlogs.pop(sid, None)
+        # Stamped with the newest logged frame it stands in for, so a client
+        # resuming from its last seq orders it against replayed frames
+        seq = self.backlog_seqs.pop(sid, None)
+        if not backlog:
+            return
+        updates = list(backlog.values())
+        if client_encodings.get(sid) == MSGPACK_ENCODING:
+            payload = encode_stock_frame(updates, seq)
+        else:
+            payload = {'updates': updates, 'seq': seq}
+        socketio.emit('stockUpdates', payload, to=sid, namespace='/')
+        metrics.increment('socket_backlogs_sent')
+
+    def drop(self, sid):
+        """Disconnect a client that stayed behind, telling it to resync"""
+        self.forget(sid)
+        metrics.increment('socket_slow_disconnects')
+        try:
+            socketio.emit('resync', {'reason': 'slow_consumer'}, to=sid, namespace='/')
+            socketio.server.disconnect(sid, namespace='/')
+            print(f"🐢 Disconnected slow client {sid}")
+        except Exception as e:
+            print(f"⚠️  Failed to disconnect slow client {sid}: {e}")
+
+    def forget(self, sid):
+        self.slow.pop(sid, None)
+        self.backlogs.pop(sid, None)
+        self.backlog_seqs.pop(sid, None)
+
+# Singleton instance
+slow_consumers = SlowConsumers()
+
+def interested_rooms(product_id):
+    """Rooms that receive events for a product"""
+    rooms = [product_room(product_id), ALL_PRODUCTS_ROOM]
+    category = product_categories.get(product_id)
+    if category:
+        rooms.append(category_room(category))
+    return rooms
+
+def category_frames(product_ids):
+    """Group products by category, as {category or None: [product_id, ...]}"""
+    frames = defaultdict(list)
+    for product_id in product_ids:
+        frames[product_categories.get(product_id)].append(product_id)
+    return frames
+
+class StockBroadcaster:
+    """Coalesces stock changes into stockUpdates frames once per tick.
+
+    Write paths mark a product dirty with its latest stock and catalog
+    version; only the newest value per product within a tick is sent,
+    and nothing is re-read from Mongo to build the frames. There is one
+    frame per category, emitted once to the all-products room, the
+    category room and the rooms of its products, so a client in several
+    of them gets each update once; product subscribers may also see
+    other products of the same category. Frames are logged for replay
+    even when no local client is in their rooms. Connections that are
+    behind get the updates later, coalesced (see SlowConsumers).
+    """
+
+    def __init__(self, interval=STOCK_BROADCAST_INTERVAL):
+        self.interval = interval
+        self._dirty = {}
+        self._lock = threading.Lock()
+        self._running = False
+
+    def mark(self, product_id, stock, version=None):
+        """Record the latest stock for a product"""
+        product_id = str(product_id)
+        with self._lock:
+            current = self._dirty.get(product_id)
+            if current and version is not None and current[1] is not None and current[1] > version:
+                # A newer write already marked this product
+                return
+            self._dirty[product_id] = (stock, version)
+        metrics.increment('stock_updates_marked')
+
+    def flush(self):
+        """Emit dirty stock levels to interested rooms; returns frames sent"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+
+        if not socketio or not (dirty or slow_consumers.slow):
+            return 0
+
+        slow = slow_consumers.check()
+        if not dirty:
+            return 0
+
+        frames = 0
+        for category, product_ids in category_frames(dirty).items():
+            updates = []
+            for product_id in product_ids:
+                stock, version = dirty[product_id]
+                update = {'productId': product_id, 'stock': stock}
+                if version is not None:
+                    update['version'] = version
+                updates.append(update)
+            rooms = [ALL_PRODUCTS_ROOM] + ([category_room(category)] if category else [])
+            rooms += [product_room(product_id) for product_id in product_ids]
+            payload = emit_to_room('stockUpdates', rooms, {'updates': updates}, skip_sid=slow or None)
+            if slow:
+                slow_consumers.hold(rooms, updates, payload.get('seq'))
+            if any(room_has_members(r) or room_has_members(encoded_room(r)) for r in rooms):
+                frames += 1
+
+        metrics.increment('stock_frames_emitted', frames)
+        metrics.increment('stock_updates_emitted', len(dirty))
+        return frames
+
+    def run(self):
+        while self._running:
+            socketio.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️  Failed to emit stock updates: {e}")
+
+    def start(self):
+        """Start the tick loop as a Socket.IO background task"""
+        if not self._running and socketio:
+            self._running = True
+            socketio.start_background_task(self.run)
+
+    def stop(self):
+        self._running = False
+
+# Singleton instance
+stock_broadcaster = StockBroadcaster()
+
+def init_socketio(app, message_queue=SOCKETIO_MESSAGE_QUEUE):
+    """Initialize Socket.IO with Flask app
+
+    When message_queue is set, every emit is published through it and
+    delivered by whichever worker holds the target clients, so several
+    server processes can run behind a sticky-session load balancer.
+    """
     global socketio
-    socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet')
+    socketio = SocketIO(
+        app,
+        cors_allowed_origins="*",
+        async_mode='eventlet',
+        message_queue=message_queue,
+        channel='flash_sale'
+    )
 
     @socketio.on('connect')
-    def handle_connect():
+    def handle_connect(auth=None):
         print(f"🔌 Client connected: {request.sid}")
-        emit('connected', {'message': 'Connected to Flash Sale server'})
+        # A token in the connect payload joins the user's room right away
+        user_id = verify_token((auth or {}).get('token') or '') if isinstance(auth, dict) else None
+        if user_id:
+            join_room(user_room(user_id))
+        encoding = 'json'
+        if request.args.get('encoding') == MSGPACK_ENCODING and not msgpack:
+            metrics.increment('socket_msgpack_unavailable')
+            print(f"⚠️  Client {request.sid} asked for msgpack but it is not installed; sending JSON")
+        elif request.args.get('encoding') == MSGPACK_ENCODING:
+            encoding = MSGPACK_ENCODING
+            if not product_categories.generation:
+                product_categories.reload()
+            client_encodings[request.sid] = encoding
+            join_room(MSGPACK_CLIENTS_ROOM)
+        event_log = get_event_log()
+        emit('connected', {
+            'message': 'Connected to Flash Sale server',
+            'encoding': encoding,
+            'epoch': event_log.epoch,
+            'seq': event_log.current()
+        })
+        if encoding == MSGPACK_ENCODING:
+            emit('productIndex', product_categories.table())
 
     @socketio.on('disconnect')
     def handle_disconnect():
+        client_encodings.pop(request.sid, None)
+        slow_consumers.forget(request.sid)
         print(f"🔌 Client disconnected: {request.sid}")
 
     @socketio.on('join')
     def handle_join(data):
-        """Join user-specific room"""
-        user_id = data.get('userId')
-        if user_id:
-            join_room(f"user_{user_id}")
-            print(f"👤 User {user_id} joined their room")
-            emit('joined', {'userId': user_id, 'room': f"user_{user_id}"})
+        """Join user-specific room, authenticated with the user's JWT"""
+        data = data or {}
+        user_id = verify_token(data.get('token') or '')
+        if not user_id or data.get('userId') not in (None, user_id):
+            emit('joinError', {'error': 'Invalid or expired token'})
+            return
+        join_room(user_room(user_id))
+        print(f"👤 User {user_id} joined their room")
+        emit('joined', {'userId': user_id, 'room': user_room(user_id)})
 
     @socketio.on('leave')
     def handle_leave(data):
         """Leave user-specific room"""
-        user_id = data.get('userId')
+        user_id = (data or {}).get('userId')
         if user_id:
-            leave_room(f"user_{user_id}")
+            leave_room(user_room(user_id))
             print(f"👤 User {user_id} left their room")
 
+    @socketio.on('subscribe')
+    def handle_subscribe(data):
+        """Join product, category or all-products rooms for stock events"""
+        rooms = subscription_rooms(data or {})
+        for room in rooms:
+            join_room(client_room(room))
+        emit('subscribed', {'rooms': rooms})
+
+    @socketio.on('unsubscribe')
+    def handle_unsubscribe(data):
+        """Leave product, category or all-products rooms"""
+        rooms = subscription_rooms(data or {})
+        for room in rooms:
+            leave_room(client_room(room))
+        emit('unsubscribed', {'rooms': rooms})
+
+    @socketio.on('resume')
+    def handle_resume(data):
+        """Replay broadcasts missed since the client's last sequence number
+
+        Clients rejoin their rooms first, then send {epoch, lastSeq} from
+        the last event they saw. Clients the log cannot serve are told to
+        resync over REST.
+        """
+        data = data or {}
+        event_log = get_event_log()
+        last_seq = data.get('lastSeq')
+        missed = None
+        if data.get('epoch') == event_log.epoch and isinstance(last_seq, int):
+            missed = event_log.since(last_seq)
+
+        if missed is None:
+            metrics.increment('socket_resume_resyncs')
+            emit('resync', {'reason': 'replay_gap', 'epoch': event_log.epoch, 'seq': event_log.current()})
+            return
+
+        joined = set(rooms())
+        replayed = 0
+        for seq, event, room, payload in missed:
+            if room is None or logged_for(room, joined):
+                emit(event, encode_for_client(request.sid, event, payload))
+                replayed += 1
+
+        metrics.increment('socket_events_replayed', replayed)
+        emit('resumed', {'epoch': event_log.epoch, 'seq': missed[-1][0] if missed else last_seq, 'replayed': replayed})
+
     @socketio.on('trackCheckout')
     def handle_track_checkout(data):
         """Track checkout start time"""
@@ -41,39 +549,71 @@ def init_socketio(app):
         print(f"⏱️  Tracking checkout for user: {user_id}")
         emit('checkoutTracked', {'userId': user_id, 'timestamp': data.get('timestamp')})
 
-    print("✅ Socket.IO initialized")
+    stock_broadcaster.start()
+
+    if message_queue:
+        print(f"✅ Socket.IO initialized (message queue: {message_queue})")
+    else:
+        print("✅ Socket.IO initialized")
     return socketio
 
+def subscription_rooms(data):
+    """Rooms named by a subscribe/unsubscribe payload"""
+    rooms = []
+    if data.get('all'):
+        rooms.append(ALL_PRODUCTS_ROOM)
+    for product_id in data.get('productIds') or []:
+        if ObjectId.is_valid(product_id):
+            rooms.append(product_room(product_id))
+    for category in data.get('categories') or []:
+        if isinstance(category, str) and category:
+            rooms.append(category_room(category))
+    return rooms
+
+def client_room(room):
+    """Room the current client joins for a subscription, given its encoding"""
+    if client_encodings.get(request.sid) == MSGPACK_ENCODING:
+        return encoded_room(room)
+    return room
+
 def get_socketio():
     """Get Socket.IO instance"""
     return socketio
 
-def emit_stock_update(product_id, stock):
-    """Emit stock update to all connected clients"""
+def emit_stock_update(product_id, stock, version=None):
+    """Queue a stock update for the next batched stockUpdates frame"""
     if socketio:
-        try:
-            socketio.emit('stockUpdate', {
-                'productId': str(product_id),
-                'stock': stock
-            }, namespace='/')
-            print(f"📢 Stock update emitted for product {product_id}: {stock}")
-        except Exception as e:
-            print(f"⚠️  Failed to emit stock update: {e}")
+        stock_broadcaster.mark(product_id, stock, version)
+
+def emit_stock_updates(updates):
+    """Send many (product_id, stock, version) changes now, as one frame per room"""
+    if socketio:
+        for product_id, stock, version in updates:
+            stock_broadcaster.mark(product_id, stock, version)
+        stock_broadcaster.flush()
 
 def emit_order_success(user_id, order_data):
     """Emit order success to specific user"""
     if socketio:
         try:
-            socketio.emit('orderSuccess', order_data, room=f"user_{user_id}", namespace='/')
+            emit_to_room('orderSuccess', user_room(user_id), order_data)
             print(f"📢 Order success emitted to user {user_id}")
         except Exception as e:
             print(f"⚠️  Failed to emit order success: {e}")
 
+def emit_cart_update(user_id, cart):
+    """Push the user's rendered cart to their room"""
+    if socketio:
+        try:
+            emit_to_room('cartUpdated', user_room(user_id), {'cart': cart})
+        except Exception as e:
+            print(f"⚠️  Failed to emit cart update: {e}")
+
 def emit_leaderboard_update():
     """Emit leaderboard update to all clients"""
     if socketio:
         try:
-            socketio.emit('leaderboardUpdate', {}, namespace='/')
+            emit_to_room('leaderboardUpdate', None, {})
             print(f"📢 Leaderboard update emitted")
         except Exception as e:
             print(f"⚠️  Failed to emit leaderboard update: {e}")
@@ -82,19 +622,40 @@ def emit_product_sold_out(product_id, product_name):
     """Emit product sold out notification"""
     if socketio:
         try:
-            socketio.emit('productSoldOut', {
+            payload = {
                 'productId': str(product_id),
                 'productName': product_name
-            }, namespace='/')
+            }
+            emit_to_room('productSoldOut', interested_rooms(product_id), payload)
             print(f"📢 Product sold out emitted: {product_name}")
         except Exception as e:
             print(f"⚠️  Failed to emit product sold out: {e}")
 
-def emit_sale_ended():
+def emit_products_changed(products):
+    """Push new or changed products (as Product.to_dict) to catalog clients"""
+    if socketio and products:
+        try:
+            emit_to_room('productsChanged', ALL_PRODUCTS_ROOM, {'products': products})
+        except Exception as e:
+            print(f"⚠️  Failed to emit product changes: {e}")
+
+def emit_sale_started(product_ids, products=None):
+    """Emit sale started notification, with the products when given"""
+    if socketio:
+        try:
+            payload = {'productIds': [str(p) for p in product_ids]}
+            if products is not None:
+                payload['products'] = products
+            emit_to_room('saleStarted', None, payload)
+            print(f"📢 Sale started emitted for {len(product_ids)} products")
+        except Exception as e:
+            print(f"⚠️  Failed to emit sale started: {e}")
+
+def emit_sale_ended(product_ids):
     """Emit sale ended notification"""
     if socketio:
         try:
-            socketio.emit('saleEnded', {}, namespace='/')
-            print(f"📢 Sale ended emitted")
+            emit_to_room('saleEnded', None, {'productIds': [str(p) for p in product_ids]})
+            print(f"📢 Sale ended emitted for {len(product_ids)} products")
         except Exception as e:
             print(f"⚠️  Failed to emit sale ended: {e}")
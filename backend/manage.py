@@ -0,0 +1,108 @@
+"""
+Maintenance commands for the Flash Sale backend
+Usage: python manage.py <command> [options]
+"""
+
+import argparse
+from datetime import datetime
+from config.db import db
+from config.indexes import index_manager, plan
+from models.rollup import OrderRollup
+from models.order import Order
+from models.product import Product
+from models.order_snapshot import OrderSnapshot
+
+def parse_date(value):
+    """Parse an ISO date argument"""
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+def rebuild_rollups(args):
+    """Rebuild hourly sales rollups from raw orders"""
+    print("🔁 Rebuilding hourly sales rollups...")
+    written = OrderRollup.rebuild(args.start, args.end)
+    print(f"✅ Wrote {written} rollup documents")
+
+def check_rollups(args):
+    """Compare hourly sales rollups against raw orders"""
+    print("🔍 Checking hourly sales rollups against orders...")
+    mismatches = OrderRollup.check_consistency(args.start, args.end)
+
+    if not mismatches:
+        print("✅ Rollups are consistent with orders")
+        return 0
+
+    print(f"❌ Found {len(mismatches)} mismatches:")
+    for mismatch in mismatches[:50]:
+        print(f"  {mismatch['hour']} product={mismatch['product']} {mismatch['field']}: "
+              f"expected {mismatch['expected']}, found {mismatch['actual']}")
+    return 1
+
+def backfill_product_counters(args):
+    """Populate product revenue and orderCount counters from raw orders"""
+    print("🔁 Backfilling product sales counters from orders...")
+    totals = Order.aggregate_product_sales()
+    updated = Product.set_sales_counters(totals)
+    print(f"✅ Updated counters on {updated} products")
+
+def refresh_order_snapshot(args):
+    """Append new orders to the columnar analytics snapshot"""
+    print("🔁 Refreshing columnar order snapshot...")
+    snapshot = OrderSnapshot()
+    added = snapshot.refresh()
+    print(f"✅ Added {added} orders ({len(snapshot.orders['total'])} total, watermark {snapshot.watermark})")
+
+def migrate_indexes(args):
+    """Create the declared indexes that are missing"""
+    database = db.get_db()
+    if args.dry_run:
+        print("🔍 Comparing declared indexes with the database...")
+        changes = plan(database)
+        for collection, change in changes.items():
+            for index in change['missing']:
+                print(f"  + {collection}.{index.document['name']}")
+            for conflict in change['conflicts']:
+                print(f"  ! {collection}: {conflict}")
+            for name in change['extra']:
+                print(f"  ? {collection}.{name} is not declared")
+        missing = sum(len(change['missing']) for change in changes.values())
+        print(f"✅ {missing} indexes to create")
+        return 0
+
+    print("🔨 Creating missing indexes...")
+    index_manager.ensure(database)
+    return 0 if index_manager.status == 'ready' else 1
+
+def main():
+    parser = argparse.ArgumentParser(description='Flash Sale maintenance commands')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    rebuild_parser = subparsers.add_parser('rebuild-rollups', help=rebuild_rollups.__doc__)
+    rebuild_parser.set_defaults(handler=rebuild_rollups)
+
+    check_parser = subparsers.add_parser('check-rollups', help=check_rollups.__doc__)
+    check_parser.set_defaults(handler=check_rollups)
+
+    backfill_parser = subparsers.add_parser('backfill-product-counters', help=backfill_product_counters.__doc__)
+    backfill_parser.set_defaults(handler=backfill_product_counters)
+
+    snapshot_parser = subparsers.add_parser('refresh-order-snapshot', help=refresh_order_snapshot.__doc__)
+    snapshot_parser.set_defaults(handler=refresh_order_snapshot)
+
+    indexes_parser = subparsers.add_parser('migrate-indexes', help=migrate_indexes.__doc__)
+    indexes_parser.add_argument('--dry-run', action='store_true', help='only list the changes')
+    indexes_parser.set_defaults(handler=migrate_indexes)
+
+    for subparser in (rebuild_parser, check_parser):
+        subparser.add_argument('--start', type=parse_date, help='ISO start date (inclusive)')
+        subparser.add_argument('--end', type=parse_date, help='ISO end date (inclusive)')
+
+    args = parser.parse_args()
+
+    db.connect()
+    try:
+        return args.handler(args) or 0
+    finally:
+        db.close()
+
+if __name__ == '__main__':
+    exit(main())
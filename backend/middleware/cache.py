@@ -0,0 +1,299 @@
+from functools import wraps
+from collections import OrderedDict
+from flask import request, make_response, Response, g
+import threading
+import time
+import os
+from dotenv import load_dotenv
+from config.metrics import metrics
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+load_dotenv()
+
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memory')
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 1024))
+CACHE_MAX_BYTES = int(os.getenv('CACHE_MAX_BYTES', 32 * 1024 * 1024))
+
+class CacheEntry:
+    """Rendered response plus its freshness window"""
+    __slots__ = ('body', 'status', 'content_type', 'fresh_until', 'stale_until')
+
+    def __init__(self, body, status, content_type, fresh_until, stale_until):
+        self.body = body
+        self.status = status
+        self.content_type = content_type
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+
+class MemoryCacheBackend:
+    """In-process LRU cache bounded by entry count and total body size"""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.stale_until <= time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._size += len(entry.body)
+
+            while self._entries and (len(self._entries) > self.max_entries or self._size > self.max_bytes):
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                metrics.increment('cache_evictions')
+
+            metrics.set_gauge('cache_entries', len(self._entries))
+            metrics.set_gauge('cache_bytes', self._size)
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                self._remove(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._size -= len(entry.body)
+
+class RedisCacheBackend:
+    """Cache stored in Redis; eviction is left to Redis' maxmemory policy"""
+
+    def __init__(self, url=CACHE_REDIS_URL, namespace='flash_sale:cache:'):
+        if redis is None:
+            raise RuntimeError('redis package is required for CACHE_BACKEND=redis')
+        self.client = redis.Redis.from_url(url)
+        self.namespace = namespace
+
+    def get(self, key):
+        data = self.client.hgetall(self.namespace + key)
+        if not data:
+            return None
+        return CacheEntry(
+            data[b'body'],
+            int(data[b'status']),
+            data[b'contentType'].decode('utf-8'),
+            float(data[b'freshUntil']),
+            float(data[b'staleUntil'])
+        )
+
+    def set(self, key, entry):
+        redis_key = self.namespace + key
+        pipeline = self.client.pipeline()
+        pipeline.hset(redis_key, mapping={
+            'body': entry.body,
+            'status': entry.status,
+            'contentType': entry.content_type,
+            'freshUntil': entry.fresh_until,
+            'staleUntil': entry.stale_until
+        })
+        pipeline.pexpireat(redis_key, int(entry.stale_until * 1000))
+        pipeline.execute()
+
+    def delete_prefix(self, prefix):
+        keys = list(self.client.scan_iter(match=self.namespace + prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+class ResponseCache:
+    """Response cache with per-key recompute locks and stale-while-revalidate.
+
+    On a miss only the request holding the key's lock runs the view; the
+    others wait for it and are served its result. Once an entry is past
+    its TTL but still inside the stale window, one request recomputes
+    while concurrent requests are served the stale body.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def get_backend(self):
+        if self.backend is None:
+            if CACHE_BACKEND == 'redis':
+                self.backend = RedisCacheBackend()
+            else:
+                self.backend = MemoryCacheBackend()
+        return self.backend
+
+    def _lock_for(self, key):
+        """Get the key's lock, registering the caller as a user of it"""
+        with self._locks_guard:
+            holder = self._locks.get(key)
+            if holder is None:
+                holder = self._locks[key] = [threading.Lock(), 0]
+            holder[1] += 1
+            return holder[0]
+
+    def _done_with(self, key):
+        """Unregister a caller, dropping the lock once nobody uses it"""
+        with self._locks_guard:
+            holder = self._locks.get(key)
+            if holder is not None:
+                holder[1] -= 1
+                if holder[1] <= 0:
+                    del self._locks[key]
+
+    def invalidate(self, prefix):
+        """Drop all cached responses whose key starts with prefix"""
+        try:
+            self.get_backend().delete_prefix(prefix)
+        except Exception as e:
+            print(f"⚠️  Failed to invalidate cache for {prefix}: {e}")
+
+    def fetch(self, key, route, compute, ttl, stale_ttl):
+        """Get a cached response for key, computing it at most once at a time"""
+        backend = self.get_backend()
+        entry = backend.get(key)
+        now = time.time()
+
+        if entry is not None and entry.fresh_until > now:
+            metrics.increment('cache_hits', route=route)
+            return self._to_response(entry, 'HIT')
+
+        lock = self._lock_for(key)
+
+        if entry is not None:
+            # Stale: one request revalidates, the rest get the stale body
+            if not lock.acquire(blocking=False):
+                self._done_with(key)
+                metrics.increment('cache_stale_hits', route=route)
+                return self._to_response(entry, 'STALE')
+        else:
+            lock.acquire()
+            # Another request may have filled the entry while we waited
+            entry = backend.get(key)
+            if entry is not None and entry.fresh_until > time.time():
+                lock.release()
+                self._done_with(key)
+                metrics.increment('cache_hits', route=route)
+                return self._to_response(entry, 'HIT')
+
+        try:
+            metrics.increment('cache_misses', route=route)
+            started = time.perf_counter()
+            response = make_response(compute())
+            metrics.observe('cache_recompute', time.perf_counter() - started, route=route)
+
+            if response.status_code == 200 and not response.direct_passthrough:
+                now = time.time()
+                backend.set(key, CacheEntry(
+                    response.get_data(),
+                    response.status_code,
+                    response.content_type,
+                    now + ttl,
+                    now + ttl + stale_ttl
+                ))
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        finally:
+            lock.release()
+            self._done_with(key)
+
+    @staticmethod
+    def _to_response(entry, status):
+        response = Response(entry.body, status=entry.status, content_type=entry.content_type)
+        response.headers['X-Cache'] = status
+        return response
+
+# Singleton instance
+response_cache = ResponseCache()
+
+def build_cache_key(vary_on_user=False):
+    """Build a cache key from the route, query args and optionally the user"""
+    args = '&'.join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+    key = f"{request.path}?{args}"
+    if vary_on_user:
+        key += f"#user={getattr(request, 'user_id', '')}"
+    if g.get('etag'):
+        # Keep cached bodies in step with the tag they are served under
+        key += f"#etag={g.etag}"
+    return key
+
+def cached(ttl=5, stale_ttl=30, vary_on_user=False, key_func=None):
+    """Decorator to cache successful GET responses of a route.
+
+    Place it below auth decorators so ``request.user_id`` is available when
+    ``vary_on_user`` is set. ``key_func`` overrides the default key built
+    from the route and query args.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method != 'GET':
+                return f(*args, **kwargs)
+
+            key = key_func() if key_func else build_cache_key(vary_on_user)
+            return response_cache.fetch(
+                key,
+                request.endpoint,
+                lambda: f(*args, **kwargs),
+                ttl,
+                stale_ttl
+            )
+
+        return decorated_function
+
+    return decorator
+
+def conditional(etag_func=None):
+    """Decorator adding a strong ETag to GET responses and answering
+    If-None-Match with 304 Not Modified.
+
+    ``etag_func`` is called with the view arguments and returns a tag
+    derived from data versions, so an unchanged resource is answered
+    before the view runs. When it is missing or returns None, the view's
+    own ETag header is used, or else a hash of the body. Place it above
+    ``cached`` so the tag is part of the cache key.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method != 'GET':
+                return f(*args, **kwargs)
+
+            etag = etag_func(*args, **kwargs) if etag_func else None
+            if etag is not None:
+                if request.if_none_match.contains(etag):
+                    metrics.increment('etag_not_modified', route=request.endpoint)
+                    response = Response(status=304)
+                    response.set_etag(etag)
+                    return response
+                g.etag = etag
+
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != 200 or response.direct_passthrough:
+                return response
+
+            if etag is not None:
+                response.set_etag(etag)
+            else:
+                response.add_etag()
+            response.make_conditional(request)
+            if response.status_code == 304:
+                metrics.increment('etag_not_modified', route=request.endpoint)
+            return response
+
+        return decorated_function
+
+    return decorator
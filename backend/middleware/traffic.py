@@ -0,0 +1,126 @@
+from flask import request
+from collections import defaultdict
+from datetime import datetime
+import socket
+import threading
+import time
+import os
+from dotenv import load_dotenv
+from models.traffic import TrafficWindow
+from utils.hyperloglog import HyperLogLog
+
+load_dotenv()
+
+TRAFFIC_FLUSH_INTERVAL = float(os.getenv('TRAFFIC_FLUSH_INTERVAL', 10))
+TRAFFIC_SKETCH_PRECISION = int(os.getenv('TRAFFIC_SKETCH_PRECISION', 12))
+
+# Paths that are not visitor traffic
+EXCLUDED_PATHS = ('/health', '/metrics', '/socket.io')
+
+class TrafficTracker:
+    """Per-process request counts and unique-visitor sketches.
+
+    Requests are folded into the open minute and hour windows. Every
+    TRAFFIC_FLUSH_INTERVAL seconds the windows are written to Mongo; closed
+    minutes add their unique-visitor count to the hour's visitor-minutes,
+    which is what average session duration is estimated from.
+    """
+
+    def __init__(self, flush_interval=TRAFFIC_FLUSH_INTERVAL, precision=TRAFFIC_SKETCH_PRECISION):
+        self.flush_interval = flush_interval
+        self.precision = precision
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+        self._windows = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.time()
+
+    def _new_window(self):
+        return {
+            'requests': 0,
+            'endpoints': defaultdict(int),
+            'sketch': HyperLogLog(self.precision),
+            'visitorMinutes': 0
+        }
+
+    def record(self, visitor, endpoint, now=None):
+        """Count a request from visitor to endpoint"""
+        now = now or datetime.utcnow()
+        minute = now.replace(second=0, microsecond=0)
+        hour = minute.replace(minute=0)
+
+        with self._lock:
+            for key in (('minute', minute), ('hour', hour)):
+                window = self._windows.get(key)
+                if window is None:
+                    window = self._windows[key] = self._new_window()
+                window['requests'] += 1
+                window['endpoints'][endpoint] += 1
+                window['sketch'].add(visitor)
+
+            flush_due = time.time() - self._last_flush >= self.flush_interval
+
+        if flush_due:
+            self.flush()
+
+    def flush(self, now=None):
+        """Write all open windows to Mongo and drop the closed ones"""
+        now = now or datetime.utcnow()
+        current = {
+            'minute': now.replace(second=0, microsecond=0),
+            'hour': now.replace(minute=0, second=0, microsecond=0)
+        }
+
+        with self._lock:
+            self._last_flush = time.time()
+
+            # Close finished minutes first so their hour is still open
+            closed = []
+            for (granularity, window), state in sorted(self._windows.items(), key=lambda item: item[0][0] != 'minute'):
+                if window >= current[granularity]:
+                    continue
+                closed.append((granularity, window))
+                if granularity == 'minute':
+                    hour_state = self._windows.get(('hour', window.replace(minute=0)))
+                    if hour_state is not None:
+                        hour_state['visitorMinutes'] += state['sketch'].count()
+
+            snapshot = [
+                (granularity, window, state['requests'], dict(state['endpoints']),
+                 HyperLogLog(self.precision, state['sketch'].registers), state['visitorMinutes'])
+                for (granularity, window), state in self._windows.items()
+            ]
+
+            for key in closed:
+                del self._windows[key]
+
+        for granularity, window, requests, endpoints, sketch, visitor_minutes in snapshot:
+            try:
+                TrafficWindow.save(granularity, window, self.worker, requests, endpoints, sketch, visitor_minutes)
+            except Exception as e:
+                print(f"⚠️  Failed to flush traffic window {granularity} {window}: {e}")
+
+# Singleton instance
+traffic_tracker = TrafficTracker()
+
+def get_visitor_id():
+    """Identify the visitor by auth token, or by client address and user agent"""
+    auth_header = request.headers.get('Authorization')
+    if auth_header:
+        return auth_header
+    address = request.access_route[0] if request.access_route else request.remote_addr
+    return f"{address}|{request.headers.get('User-Agent', '')}"
+
+def register_traffic_tracking(app):
+    """Register the request hook that feeds the traffic tracker"""
+
+    @app.before_request
+    def track_request():
+        if request.method == 'OPTIONS' or request.path.startswith(EXCLUDED_PATHS):
+            return None
+
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        try:
+            traffic_tracker.record(get_visitor_id(), endpoint)
+        except Exception as e:
+            print(f"⚠️  Failed to record traffic: {e}")
+        return None
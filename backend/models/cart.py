@@ -1,13 +1,16 @@
 from datetime import datetime
 from bson import ObjectId
-from config.db import get_database
+from pymongo import UpdateOne
+from config.db import get_database, get_collection
 from models.product import Product
 
 class Cart:
     collection = None
 
     @classmethod
-    def get_collection(cls):
+    def get_collection(cls, operation=None):
+        if operation is not None:
+            return get_collection('carts', operation)
         if cls.collection is None:
             db = get_database()
             cls.collection = db.carts
@@ -17,7 +20,7 @@ class Cart:
     def create_or_get(cls, user_id):
         """Create or get cart for user"""
         try:
-            collection = cls.get_collection()
+            collection = cls.get_collection('cart')
             if isinstance(user_id, str):
                 user_id = ObjectId(user_id)
 
@@ -101,7 +104,7 @@ class Cart:
     def add_item(cls, user_id, product_id, quantity=1):
         """Add item to cart"""
         try:
-            collection = cls.get_collection()
+            collection = cls.get_collection('cart')
             if isinstance(user_id, str):
                 user_id = ObjectId(user_id)
             if isinstance(product_id, str):
@@ -180,7 +183,7 @@ class Cart:
     def update_item(cls, user_id, product_id, quantity):
         """Update item quantity in cart"""
         try:
-            collection = cls.get_collection()
+            collection = cls.get_collection('cart')
             if isinstance(user_id, str):
                 user_id = ObjectId(user_id)
             if isinstance(product_id, str):
@@ -243,7 +246,7 @@ class Cart:
     def remove_item(cls, user_id, product_id):
         """Remove item from cart"""
         try:
-            collection = cls.get_collection()
+            collection = cls.get_collection('cart')
             if isinstance(user_id, str):
                 user_id = ObjectId(user_id)
             if isinstance(product_id, str):
@@ -292,7 +295,7 @@ class Cart:
     def clear(cls, user_id):
         """Clear cart"""
         try:
-            collection = cls.get_collection()
+            collection = cls.get_collection('cart')
             if isinstance(user_id, str):
                 user_id = ObjectId(user_id)
 
@@ -318,6 +321,30 @@ class Cart:
             traceback.print_exc()
             raise
 
+    @classmethod
+    def release_products(cls, product_ids):
+        """Remove products from every cart holding them; returns carts changed"""
+        if not product_ids:
+            return 0
+        collection = cls.get_collection('cart')
+        released = set(product_ids)
+        operations = []
+
+        for cart in collection.find({'items.product': {'$in': product_ids}}, {'items': 1}):
+            items = [item for item in cart['items'] if item['product'] not in released]
+            operations.append(UpdateOne(
+                {'_id': cart['_id']},
+                {'$set': {
+                    'items': items,
+                    'total': sum(item['price'] * item['quantity'] for item in items),
+                    'updatedAt': datetime.utcnow()
+                }}
+            ))
+
+        if not operations:
+            return 0
+        return collection.bulk_write(operations, ordered=False).modified_count
+
     @classmethod
     def to_dict(cls, cart):
         """Convert cart document to dictionary"""
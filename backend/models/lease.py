@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
+from config.db import get_database
+
+class Lease:
+    """Named leases that let one worker process act as leader.
+
+    A lease is held until expiresAt; its holder renews it by acquiring it
+    again, and any worker may take it over once it has expired.
+    """
+    collection = None
+
+    @classmethod
+    def get_collection(cls):
+        if cls.collection is None:
+            db = get_database()
+            cls.collection = db.leases
+        return cls.collection
+
+    @classmethod
+    def acquire(cls, name, holder, ttl):
+        """Take or renew a lease for ttl seconds; returns True when held"""
+        collection = cls.get_collection()
+        now = datetime.utcnow()
+        try:
+            collection.update_one(
+                {'_id': name, '$or': [{'holder': holder}, {'expiresAt': {'$lte': now}}]},
+                {'$set': {'holder': holder, 'expiresAt': now + timedelta(seconds=ttl)}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            # Held by another worker
+            return False
+
+    @classmethod
+    def release(cls, name, holder):
+        """Give up a lease if still held"""
+        collection = cls.get_collection()
+        collection.delete_one({'_id': name, 'holder': holder})
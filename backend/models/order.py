@@ -1,15 +1,20 @@
 from datetime import datetime, timezone
 from bson import ObjectId
+import hashlib
+import json
 import time
-from config.db import get_database
+from config.db import get_database, get_collection
 from models.user import User
 from models.product import Product
+from models.rollup import OrderRollup
 
 class Order:
     collection = None
 
     @classmethod
-    def get_collection(cls):
+    def get_collection(cls, operation=None):
+        if operation is not None:
+            return get_collection('orders', operation)
         if cls.collection is None:
             db = get_database()
             cls.collection = db.orders
@@ -24,7 +29,7 @@ class Order:
     @classmethod
     def create(cls, user_id, cart_items, payment_data, checkout_start_time):
         """Create a new order"""
-        collection = cls.get_collection()
+        collection = cls.get_collection('checkout')
         if isinstance(user_id, str):
             user_id = ObjectId(user_id)
 
@@ -89,15 +94,31 @@ class Order:
         order['_id'] = result.inserted_id
         print(f"DEBUG Order: Order created with ID: {order['_id']}")
 
+        # Fold order into hourly sales rollups
+        try:
+            OrderRollup.record_order(order)
+        except Exception as e:
+            print(f"ERROR Order: Failed to update sales rollups: {e}")
+
         # Update user purchases
         print(f"DEBUG Order: Updating user purchases")
         User.update_purchases(user_id, total, checkout_time)
 
-        # Update product stock
+        # Update product stock, keeping the resulting levels for broadcasts.
+        # All items share one catalog version.
         print(f"DEBUG Order: Updating product stocks")
+        order['stockLevels'] = {}
+        order['catalogVersion'] = Product.next_version()
         for item in order_items:
             try:
-                new_stock = Product.update_stock(item['product'], item['quantity'], 'decrease')
+                new_stock = Product.update_stock(
+                    item['product'],
+                    item['quantity'],
+                    'decrease',
+                    revenue=item['price'] * item['quantity'],
+                    version=order['catalogVersion']
+                )
+                order['stockLevels'][item['product']] = new_stock
                 print(f"DEBUG Order: Updated stock for {item['name']} - New stock: {new_stock}")
             except ValueError as e:
                 print(f"ERROR Order: Failed to update stock for {item['name']}: {e}")
@@ -161,16 +182,54 @@ class Order:
         return list(cursor)
 
     @classmethod
-    def get_total_count(cls, user_id=None):
-        """Get total order count"""
+    def aggregate_product_sales(cls):
+        """Sum revenue and order lines per product across all orders"""
         collection = cls.get_collection()
+        pipeline = [
+            {'$unwind': '$items'},
+            {'$group': {
+                '_id': '$items.product',
+                'revenue': {'$sum': {'$multiply': ['$items.price', '$items.quantity']}},
+                'orderCount': {'$sum': 1}
+            }}
+        ]
+        return {totals['_id']: totals for totals in collection.aggregate(pipeline, allowDiskUse=True)}
+
+    @classmethod
+    def get_total_count(cls, user_id=None, operation=None, session=None):
+        """Get total order count"""
+        collection = cls.get_collection(operation)
         query = {}
         if user_id:
             if isinstance(user_id, str):
                 user_id = ObjectId(user_id)
             query['user'] = user_id
 
-        return collection.count_documents(query)
+        return collection.count_documents(query, session=session)
+
+    @classmethod
+    def find_version(cls, order_id):
+        """The fields an order's ETag and ownership check need, without loading the order"""
+        return cls.get_collection().find_one(
+            {'orderId': order_id},
+            {'_id': 1, 'paymentStatus': 1, 'user': 1, 'items.product': 1}
+        )
+
+    @classmethod
+    def etag(cls, order):
+        """Strong ETag for an order as find_by_order_id populates it
+
+        The order itself only changes through paymentStatus; the populated
+        details change with the user's profile and the products' catalog
+        versions, which come from cheap lookups (products from the catalog
+        cache).
+        """
+        details = [User.to_dict(User.find_by_id(order['user']))]
+        for item in order.get('items', []):
+            product = Product.find_by_id(item['product'])
+            details.append(product.get('catalogVersion', 0) if product else None)
+        digest = hashlib.blake2b(json.dumps(details).encode('utf-8'), digest_size=8).hexdigest()
+        return f"order-{order['_id']}-{order.get('paymentStatus', 'pending')}-{digest}"
 
     @classmethod
     def to_dict(cls, order):
@@ -0,0 +1,408 @@
+from datetime import datetime, timedelta
+from bson import ObjectId
+import numpy as np
+import threading
+import fcntl
+import json
+import time
+import os
+from dotenv import load_dotenv
+from config.db import get_database, get_collection
+from utils.histogram import LatencyHistogram
+
+load_dotenv()
+
+ANALYTICS_SNAPSHOT_DIR = os.getenv('ANALYTICS_SNAPSHOT_DIR', 'snapshots')
+ANALYTICS_SNAPSHOT_REFRESH = float(os.getenv('ANALYTICS_SNAPSHOT_REFRESH', 5))
+
+EPOCH = datetime(1970, 1, 1)
+HOUR_MS = 3600 * 1000
+
+ORDER_COLUMNS = {
+    'created_at': np.int64,      # ms since epoch (UTC)
+    'total': np.float64,
+    'subtotal': np.float64,
+    'checkout_time': np.float64,
+    'item_count': np.int32
+}
+ITEM_COLUMNS = {
+    'order': np.int64,           # row in the order columns
+    'product': np.int32,         # index into the product table
+    'quantity': np.int32,
+    'price': np.float64
+}
+
+def to_millis(timestamp):
+    """Convert a naive UTC datetime (or aware one) to ms since epoch"""
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.replace(tzinfo=None) - timestamp.utcoffset()
+    return (timestamp - EPOCH) // timedelta(milliseconds=1)
+
+class OrderSnapshot:
+    """Columnar snapshot of orders for vectorized analytics.
+
+    Orders are pulled in ``_id`` order with a projection and appended as
+    immutable segments of ``.npy`` column files under
+    ANALYTICS_SNAPSHOT_DIR, which are memory-mapped on load. ``meta.json``
+    holds the ``_id`` watermark and the product table that item columns
+    index into, so a refresh only reads orders newer than the watermark.
+    Refreshes take a file lock, so workers can share one directory; loads
+    take it shared, so compaction never removes segments between reading
+    meta.json and mapping them. Mapped segments stay readable after they
+    are removed.
+    """
+
+    BATCH_SIZE = 5000
+    MAX_SEGMENTS = 16
+
+    # Orders from concurrent workers can be inserted slightly out of _id
+    # order, so the watermark never advances past this far behind now
+    WATERMARK_LAG = timedelta(seconds=5)
+
+    _instance = None
+    _instance_lock = threading.Lock()
+    _refreshing = False
+
+    def __init__(self, directory=ANALYTICS_SNAPSHOT_DIR):
+        self.directory = directory
+        self.watermark = None
+        self.product_ids = []
+        self.segments = []
+        self.orders = {}
+        self.items = {}
+        self.refreshed_at = 0
+        self._meta_mtime = None
+        self._lock = threading.Lock()
+        self._load()
+
+    @classmethod
+    def get(cls, max_age=ANALYTICS_SNAPSHOT_REFRESH):
+        """Get the process-wide snapshot without waiting for a refresh
+
+        The first call refreshes it inline, so callers never see a snapshot
+        that has not caught up with the orders yet. After that, when it is
+        older than max_age, a refreshed copy is built in the background and
+        replaces it; requests keep reading the last one.
+        """
+        with cls._instance_lock:
+            if cls._instance is None:
+                snapshot = cls()
+                snapshot.refresh()
+                cls._instance = snapshot
+            snapshot = cls._instance
+            if time.time() - snapshot.refreshed_at < max_age or cls._refreshing:
+                return snapshot
+            cls._refreshing = True
+        # A real thread: the refresh is a Mongo scan plus file writes
+        threading.Thread(target=cls._refresh_instance, daemon=True, name='order-snapshot').start()
+        return snapshot
+
+    @classmethod
+    def _refresh_instance(cls):
+        """Refresh a new snapshot from the stored segments and swap it in, so
+        readers of the current one never see columns change under them"""
+        try:
+            snapshot = cls()
+            snapshot.refresh()
+            with cls._instance_lock:
+                cls._instance = snapshot
+        except Exception as e:
+            print(f"⚠️  Failed to refresh order snapshot: {e}")
+        finally:
+            cls._refreshing = False
+
+    # Storage
+
+    def _meta_path(self):
+        return os.path.join(self.directory, 'meta.json')
+
+    def _lock_path(self):
+        return os.path.join(self.directory, '.lock')
+
+    def _load(self):
+        """Memory-map all stored segments, holding the file lock shared"""
+        if not os.path.exists(self._meta_path()):
+            self._set_columns([])
+            return
+        with open(self._lock_path(), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_SH)
+            self._read_stored()
+
+    def _read_stored(self):
+        """Memory-map the segments in meta.json; the caller holds the file lock"""
+        self._meta_mtime = os.path.getmtime(self._meta_path())
+        with open(self._meta_path()) as f:
+            meta = json.load(f)
+
+        self.watermark = ObjectId(meta['watermark']) if meta.get('watermark') else None
+        self.product_ids = [ObjectId(product_id) for product_id in meta.get('products', [])]
+        self.segments = meta.get('segments', [])
+        self._set_columns(self.segments)
+
+    def _set_columns(self, segments):
+        def load_column(prefix, name, dtype):
+            parts = [
+                np.load(os.path.join(self.directory, segment, f"{prefix}_{name}.npy"), mmap_mode='r')
+                for segment in segments
+            ]
+            if not parts:
+                return np.empty(0, dtype=dtype)
+            return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+        self.orders = {name: load_column('order', name, dtype) for name, dtype in ORDER_COLUMNS.items()}
+        self.items = {name: load_column('item', name, dtype) for name, dtype in ITEM_COLUMNS.items()}
+
+    def _write_meta(self):
+        meta = {
+            'watermark': str(self.watermark) if self.watermark else None,
+            'products': [str(product_id) for product_id in self.product_ids],
+            'segments': self.segments,
+            'orderCount': int(len(self.orders['total'])),
+            'itemCount': int(len(self.items['order'])),
+            'updatedAt': datetime.utcnow().isoformat()
+        }
+        temp_path = self._meta_path() + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(temp_path, self._meta_path())
+        self._meta_mtime = os.path.getmtime(self._meta_path())
+
+    def _write_segment(self, order_columns, item_columns):
+        name = f"segment_{int(time.time() * 1000)}_{len(self.segments)}"
+        path = os.path.join(self.directory, name)
+        os.makedirs(path, exist_ok=True)
+        for column, values in order_columns.items():
+            np.save(os.path.join(path, f"order_{column}.npy"), values)
+        for column, values in item_columns.items():
+            np.save(os.path.join(path, f"item_{column}.npy"), values)
+        return name
+
+    # Refresh
+
+    def refresh(self):
+        """Append orders newer than the watermark as a new segment"""
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock, open(self._lock_path(), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            # Pick up segments another worker wrote since our last load
+            if os.path.exists(self._meta_path()) and os.path.getmtime(self._meta_path()) != self._meta_mtime:
+                self._read_stored()
+
+            # Primary reads: a lagging secondary could let the watermark skip orders
+            collection = get_database().orders
+            id_filter = {'$lt': ObjectId.from_datetime(datetime.utcnow() - self.WATERMARK_LAG)}
+            if self.watermark:
+                id_filter['$gt'] = self.watermark
+            query = {'_id': id_filter}
+            projection = {'createdAt': 1, 'total': 1, 'subtotal': 1, 'checkoutTime': 1, 'items': 1}
+
+            product_index = {product_id: index for index, product_id in enumerate(self.product_ids)}
+            order_offset = len(self.orders['total'])
+            order_rows = {name: [] for name in ORDER_COLUMNS}
+            item_rows = {name: [] for name in ITEM_COLUMNS}
+            watermark = self.watermark
+
+            cursor = collection.find(query, projection).sort('_id', 1).batch_size(self.BATCH_SIZE)
+            for row, order in enumerate(cursor, order_offset):
+                items = order.get('items', [])
+                order_rows['created_at'].append(to_millis(order['createdAt']))
+                order_rows['total'].append(order.get('total', 0))
+                order_rows['subtotal'].append(order.get('subtotal', 0))
+                order_rows['checkout_time'].append(order.get('checkoutTime', 0))
+                order_rows['item_count'].append(len(items))
+
+                for item in items:
+                    index = product_index.get(item['product'])
+                    if index is None:
+                        index = product_index[item['product']] = len(self.product_ids)
+                        self.product_ids.append(item['product'])
+                    item_rows['order'].append(row)
+                    item_rows['product'].append(index)
+                    item_rows['quantity'].append(item['quantity'])
+                    item_rows['price'].append(item['price'])
+
+                watermark = order['_id']
+
+            if order_rows['total']:
+                order_columns = {name: np.asarray(order_rows[name], dtype=dtype) for name, dtype in ORDER_COLUMNS.items()}
+                item_columns = {name: np.asarray(item_rows[name], dtype=dtype) for name, dtype in ITEM_COLUMNS.items()}
+                self.segments.append(self._write_segment(order_columns, item_columns))
+                self.watermark = watermark
+                self._set_columns(self.segments)
+
+                if len(self.segments) > self.MAX_SEGMENTS:
+                    self._compact()
+                self._write_meta()
+
+            self.refreshed_at = time.time()
+            return len(order_rows['total'])
+
+    def _compact(self):
+        """Merge all segments into one; the caller holds the file lock"""
+        old_segments = self.segments
+        order_columns = {name: np.ascontiguousarray(values) for name, values in self.orders.items()}
+        item_columns = {name: np.ascontiguousarray(values) for name, values in self.items.items()}
+        self.segments = [self._write_segment(order_columns, item_columns)]
+        self._set_columns(self.segments)
+        self._write_meta()
+
+        for segment in old_segments:
+            path = os.path.join(self.directory, segment)
+            for filename in os.listdir(path):
+                os.remove(os.path.join(path, filename))
+            os.rmdir(path)
+
+    # Vectorized queries
+
+    def _order_mask(self, start=None, end=None):
+        """Orders in the range, widened to whole hours like the rollups"""
+        created_at = self.orders['created_at']
+        mask = np.ones(len(created_at), dtype=bool)
+        if start:
+            mask &= created_at >= to_millis(start) // HOUR_MS * HOUR_MS
+        if end:
+            mask &= created_at < (to_millis(end) // HOUR_MS + 1) * HOUR_MS
+        return mask
+
+    def _product_attributes(self):
+        """Get category index and original price per product-table entry"""
+        products = {
+            product['_id']: product
+            for product in get_collection('products', 'analytics').find(
+                {'_id': {'$in': self.product_ids}},
+                {'category': 1, 'originalPrice': 1}
+            )
+        }
+        categories = []
+        category_index = {}
+        product_category = np.empty(len(self.product_ids), dtype=np.int32)
+        original_price = np.zeros(len(self.product_ids), dtype=np.float64)
+        for index, product_id in enumerate(self.product_ids):
+            product = products.get(product_id, {})
+            category = product.get('category', 'Unknown')
+            if category not in category_index:
+                category_index[category] = len(categories)
+                categories.append(category)
+            product_category[index] = category_index[category]
+            original_price[index] = product.get('originalPrice', 0)
+        return categories, product_category, original_price
+
+    def find_hourly_totals(self, start=None, end=None):
+        """Order totals per hour, shaped like OrderRollup.find_hourly_totals"""
+        mask = self._order_mask(start, end)
+        hours = self.orders['created_at'][mask] // HOUR_MS
+        if len(hours) == 0:
+            return []
+
+        unique_hours, inverse = np.unique(hours, return_inverse=True)
+        orders = np.bincount(inverse, minlength=len(unique_hours))
+        sales = np.bincount(inverse, weights=self.orders['total'][mask], minlength=len(unique_hours))
+        checkout_times = self.orders['checkout_time'][mask]
+        checkout_totals = np.bincount(inverse, weights=checkout_times, minlength=len(unique_hours))
+
+        # Bucket checkout times the same way the rollup histograms do
+        histogram = LatencyHistogram()
+        buckets = np.ceil(np.log(np.maximum(checkout_times, histogram.MIN_VALUE)) / histogram.log_gamma).astype(np.int64)
+        pairs, counts = np.unique(np.stack([inverse, buckets]), axis=1, return_counts=True)
+        histograms = [{} for _ in unique_hours]
+        for (hour_index, bucket), count in zip(pairs.T, counts):
+            histograms[hour_index][str(bucket)] = int(count)
+
+        return [
+            {
+                'hour': EPOCH + timedelta(hours=int(hour)),
+                'product': None,
+                'orders': int(orders[i]),
+                'sales': float(sales[i]),
+                'checkoutTimeTotal': float(checkout_totals[i]),
+                'checkoutHistogram': histograms[i]
+            }
+            for i, hour in enumerate(unique_hours)
+        ]
+
+    def _item_mask(self, start=None, end=None):
+        return self._order_mask(start, end)[self.items['order']]
+
+    def find_product_totals(self, start=None, end=None, limit=None):
+        """Per-product totals, shaped like OrderRollup.find_product_totals"""
+        mask = self._item_mask(start, end)
+        size = len(self.product_ids)
+        products = self.items['product'][mask]
+        quantities = self.items['quantity'][mask]
+        revenue = quantities * self.items['price'][mask]
+
+        units = np.bincount(products, weights=quantities, minlength=size)
+        revenues = np.bincount(products, weights=revenue, minlength=size)
+        order_counts = np.bincount(products, minlength=size)
+
+        ranked = [index for index in np.argsort(-revenues, kind='stable') if order_counts[index] > 0]
+        if limit:
+            ranked = ranked[:limit]
+
+        return [
+            {
+                '_id': self.product_ids[index],
+                'units': int(units[index]),
+                'revenue': float(revenues[index]),
+                'orderCount': int(order_counts[index])
+            }
+            for index in ranked
+        ]
+
+    def revenue_by_category(self, start=None, end=None):
+        """Revenue and units per product category"""
+        categories, product_category, _ = self._product_attributes()
+        mask = self._item_mask(start, end)
+        category = product_category[self.items['product'][mask]]
+        quantities = self.items['quantity'][mask]
+        revenue = quantities * self.items['price'][mask]
+
+        revenues = np.bincount(category, weights=revenue, minlength=len(categories))
+        units = np.bincount(category, weights=quantities, minlength=len(categories))
+        return [
+            {'category': name, 'revenue': round(float(revenues[i]), 2), 'units': int(units[i])}
+            for i, name in sorted(enumerate(categories), key=lambda x: -revenues[x[0]])
+        ]
+
+    def discount_elasticity(self, start=None, end=None, bucket_percent=5):
+        """Units sold and revenue per discount band (price vs original price)"""
+        _, _, original_price = self._product_attributes()
+        mask = self._item_mask(start, end)
+        products = self.items['product'][mask]
+        prices = self.items['price'][mask]
+        quantities = self.items['quantity'][mask]
+        originals = original_price[products]
+
+        valid = originals > 0
+        discount = np.zeros(len(prices))
+        discount[valid] = (1 - prices[valid] / originals[valid]) * 100
+        bands = (np.clip(discount, 0, 100) // bucket_percent).astype(np.int64)
+
+        units = np.bincount(bands, weights=quantities)
+        revenue = np.bincount(bands, weights=quantities * prices)
+        lines = np.bincount(bands)
+        return [
+            {
+                'discountFrom': int(band * bucket_percent),
+                'discountTo': int((band + 1) * bucket_percent),
+                'orderLines': int(lines[band]),
+                'units': int(units[band]),
+                'unitsPerLine': round(float(units[band] / lines[band]), 2),
+                'revenue': round(float(revenue[band]), 2)
+            }
+            for band in np.flatnonzero(lines)
+        ]
+
+    def basket_size_distribution(self, start=None, end=None):
+        """Number of orders by total units in the basket"""
+        order_mask = self._order_mask(start, end)
+        units_per_order = np.bincount(
+            self.items['order'],
+            weights=self.items['quantity'],
+            minlength=len(order_mask)
+        ).astype(np.int64)[order_mask]
+        if len(units_per_order) == 0:
+            return []
+        counts = np.bincount(units_per_order)
+        return [{'units': int(size), 'orders': int(counts[size])} for size in np.flatnonzero(counts)]
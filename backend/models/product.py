@@ -1,12 +1,52 @@
-from datetime import datetime
+from datetime import datetime, timezone
 from bson import ObjectId
-from config.db import get_database
+from dotenv import load_dotenv
+from pymongo import InsertOne, UpdateOne, ReturnDocument
+from pymongo.errors import BulkWriteError
+from config.db import get_database, get_collection
+from config.metrics import metrics
+from utils.search_index import SearchIndex
+import threading
+import hashlib
+import base64
+import bisect
+import json
+import time
+import os
+
+load_dotenv()
+
+# Serve find_by_id/find_all from the process-local catalog, at most this stale
+CATALOG_CACHE = os.getenv('CATALOG_CACHE', 'true').lower() == 'true'
+CATALOG_CACHE_STALENESS = float(os.getenv('CATALOG_CACHE_STALENESS_MS', 1000)) / 1000
+
+SORT_FIELDS = {
+    'price': ('price', 1),
+    'sold': ('sold', -1),
+    'stock': ('stock', -1)
+}
+DEFAULT_SORT = ('createdAt', -1)
+
+# How long a claimed catalog version may take to land on its product; also
+# the most the clocks of two workers may disagree by
+CATALOG_VERSION_SETTLE = float(os.getenv('CATALOG_VERSION_SETTLE_MS', 2000)) / 1000
+
+# Largest page served for ?limit=
+PRODUCTS_PAGE_MAX = int(os.getenv('PRODUCTS_PAGE_MAX', 100))
+
+# Fields required to create a product
+PRODUCT_FIELDS = ('name', 'description', 'price', 'originalPrice', 'category', 'image', 'saleStartTime', 'saleEndTime')
+
+# Searched product text fields, name first; category is searched as the facet
+SEARCH_FIELDS = ('name', 'description')
 
 class Product:
     collection = None
 
     @classmethod
-    def get_collection(cls):
+    def get_collection(cls, operation=None):
+        if operation is not None:
+            return get_collection('products', operation)
         if cls.collection is None:
             db = get_database()
             cls.collection = db.products
@@ -17,87 +57,353 @@ class Product:
         """Create a new product"""
         collection = cls.get_collection()
 
-        product = {
-            'name': product_data['name'],
-            'description': product_data['description'],
-            'price': float(product_data['price']),
-            'originalPrice': float(product_data['originalPrice']),
-            'category': product_data['category'],
-            'image': product_data['image'],
-            'stock': int(product_data.get('stock', 0)),
-            'sold': 0,
-            'isActive': product_data.get('isActive', True),
-            'saleStartTime': product_data['saleStartTime'],
-            'saleEndTime': product_data['saleEndTime'],
-            'createdAt': datetime.utcnow()
-        }
+        product = cls.build(product_data)
+        product['catalogVersion'] = cls.next_version()
 
         result = collection.insert_one(product)
         product['_id'] = result.inserted_id
+        catalog.invalidate()
+
+        from config.scheduler import sale_scheduler
+        sale_scheduler.schedule(product)
 
         return product
 
+    @staticmethod
+    def parse_time(value):
+        """Naive UTC datetime from a datetime or an ISO 8601 string"""
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        if not isinstance(value, datetime):
+            raise ValueError('must be an ISO 8601 date')
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
     @classmethod
-    def find_all(cls, filters=None, sort_by=None):
-        """Find all products with optional filters"""
+    def build(cls, product_data):
+        """Build a new product document; raises ValueError when data is invalid"""
+        missing = [field for field in PRODUCT_FIELDS if product_data.get(field) is None]
+        if missing:
+            raise ValueError(f"Missing fields: {', '.join(missing)}")
+
+        try:
+            product = {
+                'name': str(product_data['name']),
+                'description': str(product_data['description']),
+                'price': float(product_data['price']),
+                'originalPrice': float(product_data['originalPrice']),
+                'category': str(product_data['category']),
+                'image': str(product_data['image']),
+                'stock': int(product_data.get('stock', 0)),
+                'sold': 0,
+                'revenue': 0,
+                'orderCount': 0,
+                'isActive': product_data.get('isActive', True),
+                'saleStartTime': cls.parse_time(product_data['saleStartTime']),
+                'saleEndTime': cls.parse_time(product_data['saleEndTime']),
+                'createdAt': datetime.utcnow()
+            }
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Invalid product: {e}")
+
+        if product['price'] < 0 or product['originalPrice'] < 0 or product['stock'] < 0:
+            raise ValueError('price, originalPrice and stock must not be negative')
+        return product
+
+    @classmethod
+    def insert_many(cls, products):
+        """Insert built products with one unordered bulk write
+
+        Each product gets an _id and its own catalog version, claimed as
+        one block. Returns {position: error message} for failed inserts.
+        """
         collection = cls.get_collection()
-        query = filters or {}
-
-        # Build sort criteria
-        sort_criteria = []
-        if sort_by == 'price':
-            sort_criteria.append(('price', 1))
-        elif sort_by == 'sold':
-            sort_criteria.append(('sold', -1))
-        elif sort_by == 'stock':
-            sort_criteria.append(('stock', -1))
-        else:
-            sort_criteria.append(('createdAt', -1))
+        last_version = cls.next_version(len(products))
+        first_version = last_version - len(products) + 1
+        for offset, product in enumerate(products):
+            product['_id'] = ObjectId()
+            product['catalogVersion'] = first_version + offset
 
-        cursor = collection.find(query)
-        if sort_criteria:
-            cursor = cursor.sort(sort_criteria)
+        errors = {}
+        try:
+            collection.bulk_write([InsertOne(product) for product in products], ordered=False)
+        except BulkWriteError as e:
+            errors = {error['index']: error['errmsg'] for error in e.details.get('writeErrors', [])}
+        catalog.invalidate()
 
+        from config.scheduler import sale_scheduler
+        for position, product in enumerate(products):
+            if position not in errors:
+                sale_scheduler.schedule(product)
+
+        return errors
+
+    @classmethod
+    def set_stocks(cls, stocks):
+        """Set the stock of many products with one bulk write
+
+        stocks maps product ObjectIds to stock levels. All writes share one
+        catalog version. Returns (ids of products that exist, version).
+        """
+        collection = cls.get_collection()
+        existing = {p['_id'] for p in collection.find({'_id': {'$in': list(stocks)}}, {'_id': 1})}
+        if not existing:
+            return existing, None
+
+        version = cls.next_version()
+        collection.bulk_write([
+            UpdateOne(
+                {'_id': product_id},
+                {'$set': {'stock': stocks[product_id]}, '$max': {'catalogVersion': version}}
+            )
+            for product_id in existing
+        ], ordered=False)
+
+        for product_id in existing:
+            catalog.overlay({'_id': product_id, 'stock': stocks[product_id], 'catalogVersion': version})
+        return existing, version
+
+    @classmethod
+    def find_all(cls, filters=None, sort_by=None, limit=None, after=None):
+        """Find all products with optional filters
+
+        With limit, returns at most limit products that sort after the
+        cursor position after (see decode_cursor).
+        """
+        if CATALOG_CACHE and catalog.supports(filters):
+            return catalog.find_all(filters, sort_by, limit, after)
+        return cls.query_all(filters, sort_by, limit, after)
+
+    @classmethod
+    def query_all(cls, filters=None, sort_by=None, limit=None, after=None):
+        """Find all products with optional filters, reading from Mongo"""
+        collection = cls.get_collection()
+        query, sort_criteria = cls.listing_query(filters, sort_by, after)
+
+        cursor = collection.find(query).sort(sort_criteria)
+        if limit:
+            cursor = cursor.limit(limit)
         return list(cursor)
 
+    @classmethod
+    def listing_query(cls, filters=None, sort_by=None, after=None):
+        """Query and sort for a listing, starting after a cursor position.
+
+        Ties on the sort field are broken by _id, so pages are stable and
+        each shape is served by one of the compound indexes.
+        """
+        field, direction = SORT_FIELDS.get(sort_by, DEFAULT_SORT)
+        query = dict(filters or {})
+        if after is not None:
+            value, last_id = after
+            op = '$gt' if direction > 0 else '$lt'
+            query['$or'] = [
+                {field: {op: value}},
+                {field: value, '_id': {op: last_id}}
+            ]
+        return query, [(field, direction), ('_id', direction)]
+
+    @classmethod
+    def encode_cursor(cls, product, sort_by=None):
+        """Opaque cursor for the listing position of product"""
+        field, _ = SORT_FIELDS.get(sort_by, DEFAULT_SORT)
+        value = product.get(field)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        raw = json.dumps([value, str(product['_id'])], separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+    @classmethod
+    def decode_cursor(cls, cursor, sort_by=None):
+        """Listing position (sort value, _id) from a cursor; raises ValueError"""
+        field, _ = SORT_FIELDS.get(sort_by, DEFAULT_SORT)
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            value, last_id = json.loads(raw)
+            if field == 'createdAt':
+                value = datetime.fromisoformat(value)
+            elif not isinstance(value, (int, float)) or isinstance(value, bool):
+                raise ValueError(field)
+            return value, ObjectId(last_id)
+        except Exception:
+            raise ValueError('Invalid cursor')
+
+    @classmethod
+    def next_version(cls, count=1):
+        """Claim the next count catalog versions; returns the last"""
+        return version_clock.claim(count)
+
+    @classmethod
+    def current_version(cls):
+        """Get the latest catalog version this worker can have claimed"""
+        return version_clock.now()
+
+    @classmethod
+    def settled_version(cls, version):
+        """Newest version whose writes have landed, given the current version"""
+        return max(0, version - int(CATALOG_VERSION_SETTLE * 1000000))
+
+    @classmethod
+    def find_changed_since(cls, version, limit):
+        """Find products changed after a catalog version, oldest change first
+
+        Returns at most limit + 1 products so callers can tell when the
+        delta is larger than limit.
+        """
+        collection = cls.get_collection()
+        cursor = collection.find({'catalogVersion': {'$gt': version}})
+        return list(cursor.sort('catalogVersion', 1).limit(limit + 1))
+
     @classmethod
     def find_by_id(cls, product_id):
         """Find product by ID"""
-        collection = cls.get_collection()
         if isinstance(product_id, str):
             product_id = ObjectId(product_id)
-        return collection.find_one({'_id': product_id})
+        if CATALOG_CACHE:
+            return catalog.get(product_id)
+        return cls.get_collection().find_one({'_id': product_id})
 
     @classmethod
-    def update_stock(cls, product_id, quantity, operation='decrease'):
-        """Update product stock"""
-        collection = cls.get_collection()
+    def find_by_ids(cls, product_ids):
+        """Find several products in one query"""
+        return list(cls.get_collection().find({'_id': {'$in': [ObjectId(p) for p in product_ids]}}))
+
+    @classmethod
+    def update_stock(cls, product_id, quantity, operation='decrease', revenue=None, version=None):
+        """Update product stock and return the new stock level
+
+        The stock check and update are a single conditional write, and the
+        stock returned is the value Mongo holds afterwards. When revenue is
+        given for a decrease, the sale is also counted in the product's
+        revenue and orderCount counters in the same write. The product is
+        stamped with the given catalog version, or a newly claimed one.
+        """
+        collection = cls.get_collection('checkout')
         if isinstance(product_id, str):
             product_id = ObjectId(product_id)
+        if version is None:
+            version = cls.next_version()
 
-        product = cls.find_by_id(product_id)
-        if not product:
-            raise ValueError('Product not found')
-
+        query = {'_id': product_id}
         if operation == 'decrease':
-            if product['stock'] < quantity:
-                raise ValueError('Insufficient stock')
-            new_stock = product['stock'] - quantity
+            query['stock'] = {'$gte': quantity}
             update = {
                 '$inc': {
                     'stock': -quantity,
                     'sold': quantity
                 }
             }
+            if revenue is not None:
+                update['$inc']['revenue'] = revenue
+                update['$inc']['orderCount'] = 1
         else:  # increase
-            new_stock = product['stock'] + quantity
             update = {
                 '$inc': {'stock': quantity}
             }
+        update['$max'] = {'catalogVersion': version}
 
-        result = collection.update_one({'_id': product_id}, update)
+        product = collection.find_one_and_update(
+            query,
+            update,
+            projection={'stock': 1, 'sold': 1, 'catalogVersion': 1},
+            return_document=ReturnDocument.AFTER
+        )
+
+        if not product:
+            if not collection.find_one({'_id': product_id}, {'_id': 1}):
+                raise ValueError('Product not found')
+            raise ValueError('Insufficient stock')
+
+        catalog.overlay(product)
+        return product['stock']
+
+    @classmethod
+    def find_performance(cls):
+        """Find products with their sales counters, highest revenue first"""
+        collection = cls.get_collection('analytics')
+        projection = {'name': 1, 'sold': 1, 'revenue': 1, 'orderCount': 1}
+        return list(collection.find({}, projection).sort('revenue', -1))
+
+    @classmethod
+    def set_sales_counters(cls, totals, batch_size=1000):
+        """Overwrite revenue and orderCount counters from per-product totals
+
+        Products missing from totals are reset to zero.
+        """
+        collection = cls.get_collection()
+        operations = []
+        updated = 0
 
-        return new_stock if result.modified_count > 0 else product['stock']
+        for product in collection.find({}, {'_id': 1}):
+            product_totals = totals.get(product['_id'], {})
+            operations.append(UpdateOne(
+                {'_id': product['_id']},
+                {'$set': {
+                    'revenue': product_totals.get('revenue', 0),
+                    'orderCount': product_totals.get('orderCount', 0)
+                }}
+            ))
+
+            if len(operations) >= batch_size:
+                updated += collection.bulk_write(operations, ordered=False).matched_count
+                operations = []
+
+        if operations:
+            updated += collection.bulk_write(operations, ordered=False).matched_count
+
+        return updated
+
+    @classmethod
+    def find_sale_schedule(cls, now, changed_since=None):
+        """Find the sale window of every product whose sale has not ended,
+        or only of those changed after the catalog version changed_since"""
+        collection = cls.get_collection()
+        projection = {'saleStartTime': 1, 'saleEndTime': 1}
+        query = {'saleEndTime': {'$gt': now}}
+        if changed_since is not None:
+            query['catalogVersion'] = {'$gt': changed_since}
+        return list(collection.find(query, projection))
+
+    @classmethod
+    def find_sale_transitions(cls, now):
+        """Find products whose isActive disagrees with their sale window
+
+        Returns the ids of products to activate and to deactivate. Only
+        products the scheduler deactivated are activated again; one set
+        inactive by hand stays inactive.
+        """
+        collection = cls.get_collection()
+        starting = collection.find({
+            'isActive': False,
+            'deactivatedBy': 'schedule',
+            'saleStartTime': {'$lte': now},
+            'saleEndTime': {'$gt': now}
+        }, {'_id': 1})
+        ending = collection.find({
+            'isActive': {'$ne': False},
+            'saleEndTime': {'$lte': now}
+        }, {'_id': 1})
+        return [p['_id'] for p in starting], [p['_id'] for p in ending]
+
+    @classmethod
+    def set_active(cls, product_ids, active):
+        """Flip isActive for many products in one write, as the sale
+        scheduler; returns modified count"""
+        if not product_ids:
+            return 0
+        collection = cls.get_collection()
+        update = {'$set': {'isActive': active}, '$max': {'catalogVersion': cls.next_version()}}
+        if active:
+            update['$unset'] = {'deactivatedBy': ''}
+        else:
+            update['$set']['deactivatedBy'] = 'schedule'
+        result = collection.update_many(
+            {'_id': {'$in': product_ids}, 'isActive': {'$ne': active}},
+            update
+        )
+        catalog.invalidate()
+        return result.modified_count
 
     @classmethod
     def update(cls, product_id, update_data):
@@ -106,10 +412,18 @@ class Product:
         if isinstance(product_id, str):
             product_id = ObjectId(product_id)
 
-        result = collection.update_one(
-            {'_id': product_id},
-            {'$set': update_data}
-        )
+        update = {'$set': update_data, '$max': {'catalogVersion': cls.next_version()}}
+        if 'isActive' in update_data:
+            # Set by hand: the scheduler no longer owns the flag
+            update['$unset'] = {'deactivatedBy': ''}
+        result = collection.update_one({'_id': product_id}, update)
+
+        catalog.invalidate()
+
+        if 'saleStartTime' in update_data or 'saleEndTime' in update_data:
+            from config.scheduler import sale_scheduler
+            sale_scheduler.schedule(cls.find_by_id(product_id))
+
         return result.modified_count > 0
 
     @classmethod
@@ -134,7 +448,8 @@ class Product:
             'isActive': product.get('isActive', True),
             'saleStartTime': product['saleStartTime'].isoformat() if isinstance(product['saleStartTime'], datetime) else product['saleStartTime'],
             'saleEndTime': product['saleEndTime'].isoformat() if isinstance(product['saleEndTime'], datetime) else product['saleEndTime'],
-            'createdAt': product.get('createdAt', datetime.utcnow()).isoformat()
+            'createdAt': product.get('createdAt', datetime.utcnow()).isoformat(),
+            'version': product.get('catalogVersion', 0)
         }
 
     @classmethod
@@ -151,3 +466,377 @@ class Product:
             return False, f"Only {product['stock']} items available"
 
         return True, 'Available'
+
+class Descending:
+    """Sort key wrapper that orders its value in reverse"""
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+class ProductCatalog:
+    """Process-local copy of the product catalog.
+
+    Product.find_by_id and find_all are served from memory. Stock and sold
+    come straight from this process's stock writes. Other changes, and
+    writes made by other workers, are picked up by a check run at most
+    max_staleness seconds after the last one. It loads only the products
+    whose catalog version is newer than the last check's settled version,
+    so a write that claimed its version before the last check but landed
+    after it is still picked up.
+    """
+
+    OPERATORS = ('$gt', '$ne')
+
+    # Sort fields whose order changes with stock writes
+    LIVE_FIELDS = ('stock', 'sold')
+
+    def __init__(self, max_staleness=CATALOG_CACHE_STALENESS):
+        self.max_staleness = max_staleness
+        self._products = None
+        self._version = 0
+        self._checked_at = 0
+        self._lock = threading.Lock()
+        # Bumped on any change, and on changes to more than stock and sold
+        self.revision = 0
+        self.static_revision = 0
+        self._orderings = {}
+        self._categories = (None, frozenset())
+        self._listings = {}
+        self._rendered_products = {}
+        self._rendered_lists = {}
+        self.search_index = SearchIndex(SEARCH_FIELDS, 'category')
+
+    def _changed(self, static=True):
+        self.revision += 1
+        if static:
+            self.static_revision += 1
+
+    def _load(self):
+        version = Product.current_version()
+        self._products = {p['_id']: p for p in Product.get_collection().find({})}
+        self._version = version
+        self._rendered_products = {}
+        self.search_index.clear()
+        for product in self._products.values():
+            self._index(product)
+        self._changed()
+        metrics.increment('catalog_cache_reloads')
+        self._report_index()
+
+    def _check(self):
+        version = Product.current_version()
+        # Writes may land up to CATALOG_VERSION_SETTLE after their version,
+        # so products are re-read from a settled version; unchanged ones
+        # are skipped
+        collection = Product.get_collection()
+        found = collection.find({'catalogVersion': {'$gt': Product.settled_version(self._version)}})
+        products = dict(self._products)
+        changed = [product for product in found if products.get(product['_id']) != product]
+        for product in changed:
+            self._index(product, products.get(product['_id']))
+            products[product['_id']] = product
+        self._products = products
+        self._version = version
+        if changed:
+            self._changed()
+            metrics.increment('catalog_cache_products_refreshed', len(changed))
+            if collection.estimated_document_count() != len(products):
+                # Products were removed
+                self._load()
+
+    def _index(self, product, previous=None):
+        """Update the search index for a loaded product; ended sales are not searchable"""
+        fields = SEARCH_FIELDS + ('category', 'isActive')
+        if previous is not None and all(product.get(f) == previous.get(f) for f in fields):
+            return
+        if product.get('isActive') is False:
+            self.search_index.remove(product['_id'])
+        else:
+            self.search_index.add(product['_id'], product)
+
+    def _report_index(self):
+        stats = self.search_index.stats()
+        metrics.set_gauge('search_index_documents', stats['documents'])
+        metrics.set_gauge('search_index_terms', stats['terms'])
+        metrics.set_gauge('search_index_bytes', stats['bytes'])
+
+    def refresh(self):
+        """Make sure the catalog is no older than max_staleness"""
+        if self._products is not None and time.time() - self._checked_at < self.max_staleness:
+            return
+        with self._lock:
+            if self._products is not None and time.time() - self._checked_at < self.max_staleness:
+                return
+            if self._products is None:
+                self._load()
+            else:
+                self._check()
+            self._checked_at = time.time()
+        metrics.increment('catalog_cache_checks')
+
+    def invalidate(self):
+        """Run the version check on the next read"""
+        self._checked_at = 0
+
+    def overlay(self, fields):
+        """Apply fields from a write (with _id and catalogVersion) to the cached product"""
+        with self._lock:
+            if self._products is None:
+                return
+            product = self._products.get(fields['_id'])
+            if product and fields.get('catalogVersion', 0) >= product.get('catalogVersion', 0):
+                self._products[fields['_id']] = dict(product, **fields)
+                self._changed(static=False)
+
+    def get(self, product_id):
+        """Get a product by ObjectId"""
+        self.refresh()
+        product = self._products.get(product_id)
+        if product is None:
+            # Created since the last check, possibly by another worker
+            product = Product.get_collection().find_one({'_id': product_id})
+            if product is None:
+                return None
+            with self._lock:
+                self._products = {**self._products, product_id: product}
+                self._index(product)
+                self._changed()
+        metrics.increment('catalog_cache_hits')
+        return dict(product)
+
+    def supports(self, filters):
+        """Check whether find_all filters can be evaluated in memory"""
+        for condition in (filters or {}).values():
+            if isinstance(condition, dict) and any(op not in self.OPERATORS for op in condition):
+                return False
+        return True
+
+    @staticmethod
+    def _matches(product, filters):
+        for field, condition in filters.items():
+            value = product.get(field)
+            if isinstance(condition, dict):
+                if '$gt' in condition and (value is None or not value > condition['$gt']):
+                    return False
+                if '$ne' in condition and value == condition['$ne']:
+                    return False
+            elif value != condition:
+                return False
+        return True
+
+    @staticmethod
+    def _sort_key(sort_by):
+        field, direction = SORT_FIELDS.get(sort_by, DEFAULT_SORT)
+        if direction > 0:
+            return lambda p: (p.get(field, 0), p['_id'])
+        return lambda p: Descending((p.get(field, 0), p['_id']))
+
+    def ordering(self, sort_by):
+        """Product ids in sort_by order, re-sorted only when the order can change"""
+        field, _ = SORT_FIELDS.get(sort_by, DEFAULT_SORT)
+        revision = self.revision if field in self.LIVE_FIELDS else self.static_revision
+        cached = self._orderings.get(field)
+        if cached and cached[0] == revision:
+            return cached[1]
+
+        products = sorted(self._products.values(), key=self._sort_key(sort_by))
+        ids = [p['_id'] for p in products]
+        self._orderings[field] = (revision, ids)
+        return ids
+
+    def _ordered(self, filters, sort_by):
+        products = self._products
+        return [
+            products[product_id] for product_id in self.ordering(sort_by)
+            if product_id in products and self._matches(products[product_id], filters)
+        ]
+
+    def categories(self):
+        """Categories of the cached products"""
+        revision, categories = self._categories
+        if revision != self.static_revision:
+            categories = frozenset(p.get('category') for p in self._products.values())
+            self._categories = (self.static_revision, categories)
+        return categories
+
+    def _listing(self, filters, sort_by):
+        """Matching products in order, kept until the catalog changes
+
+        Listings are keyed by filters and sort, which come from the query
+        string; unknown categories and sorts share one entry so requests
+        cannot grow the cache.
+        """
+        if sort_by not in SORT_FIELDS:
+            sort_by = None
+        category = filters.get('category')
+        if isinstance(category, str) and category not in self.categories():
+            return ('unknown category', None), []
+
+        key = (json.dumps(filters, sort_keys=True, default=str), sort_by)
+        listing = self._listings.get(key)
+        if listing and listing[0] == self.revision:
+            return key, listing[1]
+
+        revision = self.revision
+        products = self._ordered(filters, sort_by)
+        self._listings[key] = (revision, products)
+        return key, products
+
+    def _page(self, products, sort_by, limit, after):
+        """Up to limit + 1 products following the cursor position after"""
+        start = 0
+        if after is not None:
+            _, direction = SORT_FIELDS.get(sort_by, DEFAULT_SORT)
+            position = after if direction > 0 else Descending(after)
+            start = bisect.bisect_right(products, position, key=self._sort_key(sort_by))
+        return products[start:start + limit + 1]
+
+    def find_all(self, filters=None, sort_by=None, limit=None, after=None):
+        """Filter, sort and page the catalog like Product.query_all"""
+        self.refresh()
+        metrics.increment('catalog_cache_hits')
+        _, products = self._listing(filters or {}, sort_by)
+        if limit:
+            products = self._page(products, sort_by, limit, after)[:limit]
+        return [dict(p) for p in products]
+
+    @property
+    def version(self):
+        """Catalog version every cached product is at least as new as"""
+        return Product.settled_version(self._version)
+
+    @staticmethod
+    def _etag(body):
+        return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+    def _render(self, product):
+        signature = (product.get('catalogVersion', 0), product['stock'], product.get('sold', 0))
+        rendered = self._rendered_products.get(product['_id'])
+        if rendered and rendered[0] == signature:
+            return rendered
+
+        body = json.dumps(Product.to_dict(product), separators=(',', ':')).encode('utf-8')
+        rendered = (signature, body, self._etag(body))
+        self._rendered_products[product['_id']] = rendered
+        metrics.increment('catalog_renders')
+        return rendered
+
+    def render(self, product):
+        """Product.to_dict as JSON bytes, re-rendered only when the product changes"""
+        return self._render(product)[1]
+
+    def _render_list(self, filters, sort_by):
+        self.refresh()
+        key, products = self._listing(filters, sort_by)
+        rendered = self._rendered_lists.get(key)
+        if rendered and rendered[0] == self.revision:
+            return rendered
+
+        revision = self.revision
+        body = b''.join([
+            b'{"success":true,"version":', str(self.version).encode(),
+            b',"count":', str(len(products)).encode(),
+            b',"products":[', b','.join(self.render(p) for p in products), b']}'
+        ])
+        rendered = (revision, body, self._etag(body))
+        self._rendered_lists[key] = rendered
+        return rendered
+
+    def render_list(self, filters, sort_by, limit=None, after=None):
+        """JSON bytes of the products list response
+
+        With limit, renders one page after the cursor position after, with
+        nextCursor set when more products follow.
+        """
+        if not limit:
+            return self._render_list(filters, sort_by)[1]
+
+        self.refresh()
+        _, products = self._listing(filters, sort_by)
+        page = self._page(products, sort_by, limit, after)
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            next_cursor = Product.encode_cursor(page[-1], sort_by)
+        return b''.join([
+            b'{"success":true,"version":', str(self.version).encode(),
+            b',"count":', str(len(page)).encode(),
+            b',"products":[', b','.join(self.render(p) for p in page),
+            b'],"nextCursor":', json.dumps(next_cursor).encode(), b'}'
+        ])
+
+    def list_etag(self, filters, sort_by):
+        """ETag of the products list response; free while the catalog is unchanged"""
+        return self._render_list(filters, sort_by)[2]
+
+    def search(self, query, category=None, limit=20):
+        """Search active products; returns (products best first, category counts, total)"""
+        self.refresh()
+        ids, facets, total = self.search_index.search(query, limit, category)
+        products = self._products
+        return [products[product_id] for product_id in ids if product_id in products], facets, total
+
+    def render_search(self, query, category=None, limit=20):
+        """JSON bytes of the search response"""
+        started = time.perf_counter()
+        products, facets, total = self.search(query, category, limit)
+        body = b''.join([
+            b'{"success":true,"query":', json.dumps(query).encode('utf-8'),
+            b',"total":', str(total).encode(),
+            b',"count":', str(len(products)).encode(),
+            b',"products":[', b','.join(self.render(p) for p in products),
+            b'],"facets":{"category":', json.dumps(facets, separators=(',', ':')).encode('utf-8'), b'}}'
+        ])
+        metrics.observe('catalog_search', time.perf_counter() - started)
+        return body
+
+    def render_product(self, product_id):
+        """JSON bytes of the product detail response, or None"""
+        product = self.get(product_id)
+        if product is None:
+            return None
+        return b'{"success":true,"product":' + self.render(product) + b'}'
+
+    def product_etag(self, product_id):
+        """ETag of the product detail response, or None"""
+        product = self.get(product_id)
+        if product is None:
+            return None
+        return self._render(product)[2]
+
+class VersionClock:
+    """Catalog versions from this worker's clock, in microseconds.
+
+    Versions only need to grow, so they are read off the clock instead of
+    a shared counter that every stock write would have to update. Each
+    claim is at least one more than the last one here; workers whose
+    clocks disagree by less than CATALOG_VERSION_SETTLE still give every
+    reader the writes it missed (see Product.settled_version).
+    """
+
+    def __init__(self):
+        self._last = 0
+        self._lock = threading.Lock()
+
+    def now(self):
+        """Newest version claimed or claimable here"""
+        with self._lock:
+            return max(time.time_ns() // 1000, self._last)
+
+    def claim(self, count=1):
+        """Claim count consecutive versions; returns the last"""
+        with self._lock:
+            first = max(time.time_ns() // 1000, self._last + 1)
+            self._last = first + count - 1
+            return self._last
+
+# Singleton instances
+catalog = ProductCatalog()
+version_clock = VersionClock()
@@ -0,0 +1,264 @@
+from datetime import datetime, timedelta
+from collections import defaultdict
+from pymongo import UpdateOne
+from config.db import get_database, get_collection
+from utils.histogram import LatencyHistogram
+
+class OrderRollup:
+    """Hourly sales rollups keyed by (hour, product).
+
+    Each product line of an order is folded into the document for its hour
+    and product. Order-level figures (order count, order totals including
+    tax, checkout time) live in the document for the hour with
+    ``product: None``, so a dashboard query reads one document per hour
+    instead of every order in the range.
+
+    Every document also carries a ``checkoutHistogram`` of bucket counts
+    (see ``LatencyHistogram``) for the checkout times of its orders, so
+    checkout percentiles per hour or per product are summed from rollups.
+    """
+    collection = None
+
+    HISTOGRAM_FIELD = 'checkoutHistogram'
+    histogram = LatencyHistogram()
+
+    @classmethod
+    def get_collection(cls, operation=None):
+        if operation is not None:
+            return get_collection('order_rollups', operation)
+        if cls.collection is None:
+            db = get_database()
+            cls.collection = db.order_rollups
+        return cls.collection
+
+    @staticmethod
+    def hour_bucket(timestamp):
+        """Truncate a datetime to the start of its hour"""
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+
+    @classmethod
+    def _order_updates(cls, order):
+        """Build the ($inc, $set) pairs for an order, keyed by (hour, product)"""
+        hour = cls.hour_bucket(order['createdAt'])
+        checkout_time = order.get('checkoutTime', 0)
+        histogram_key = f"{cls.HISTOGRAM_FIELD}.{cls.histogram.bucket_index(checkout_time)}"
+
+        updates = {
+            (hour, None): ({
+                'orders': 1,
+                'sales': order['total'],
+                'checkoutTimeTotal': checkout_time,
+                histogram_key: 1
+            }, {})
+        }
+
+        for item in order.get('items', []):
+            key = (hour, item['product'])
+            inc, fields = updates.setdefault(key, ({'units': 0, 'revenue': 0, 'orderCount': 0, histogram_key: 0}, {}))
+            inc[histogram_key] += 1
+            inc['units'] += item['quantity']
+            inc['revenue'] += item['price'] * item['quantity']
+            inc['orderCount'] += 1
+            if item.get('name'):
+                fields['name'] = item['name']
+
+        return updates
+
+    @classmethod
+    def record_order(cls, order):
+        """Fold a newly created order into its hourly rollups"""
+        collection = cls.get_collection()
+        now = datetime.utcnow()
+
+        operations = []
+        for (hour, product_id), (inc, fields) in cls._order_updates(order).items():
+            operations.append(UpdateOne(
+                {'hour': hour, 'product': product_id},
+                {'$inc': inc, '$set': dict(fields, updatedAt=now)},
+                upsert=True
+            ))
+
+        if operations:
+            collection.bulk_write(operations, ordered=False)
+
+    @classmethod
+    def _hour_query(cls, start=None, end=None):
+        """Build a filter on the hour bucket for an optional date range"""
+        hour_filter = {}
+        if start:
+            hour_filter['$gte'] = cls.hour_bucket(start)
+        if end:
+            hour_filter['$lte'] = end
+        return {'hour': hour_filter} if hour_filter else {}
+
+    @classmethod
+    def find_hourly_totals(cls, start=None, end=None):
+        """Get the order-level rollup for each hour in the range"""
+        collection = cls.get_collection('analytics')
+        query = cls._hour_query(start, end)
+        query['product'] = None
+        return list(collection.find(query).sort('hour', 1))
+
+    @classmethod
+    def find_product_totals(cls, start=None, end=None, limit=None):
+        """Sum per-product rollups over the range, highest revenue first"""
+        collection = cls.get_collection('analytics')
+        query = cls._hour_query(start, end)
+        query['product'] = {'$ne': None}
+
+        pipeline = [
+            {'$match': query},
+            {'$group': {
+                '_id': '$product',
+                'name': {'$last': '$name'},
+                'units': {'$sum': '$units'},
+                'revenue': {'$sum': '$revenue'},
+                'orderCount': {'$sum': '$orderCount'}
+            }},
+            {'$sort': {'revenue': -1}}
+        ]
+        if limit:
+            pipeline.append({'$limit': limit})
+
+        return list(collection.aggregate(pipeline))
+
+    @classmethod
+    def merge_histograms(cls, rollups):
+        """Merge the checkout-time histograms of rollup documents"""
+        histogram = LatencyHistogram()
+        for rollup in rollups:
+            histogram.merge(LatencyHistogram.from_dict(rollup.get(cls.HISTOGRAM_FIELD, {})))
+        return histogram
+
+    @classmethod
+    def find_product_histograms(cls, start=None, end=None):
+        """Merge per-product checkout-time histograms over the range"""
+        collection = cls.get_collection('analytics')
+        query = cls._hour_query(start, end)
+        query['product'] = {'$ne': None}
+        projection = {'product': 1, 'name': 1, cls.HISTOGRAM_FIELD: 1}
+
+        histograms = {}
+        names = {}
+        for rollup in collection.find(query, projection):
+            product_id = rollup['product']
+            histogram = histograms.setdefault(product_id, LatencyHistogram())
+            histogram.merge(LatencyHistogram.from_dict(rollup.get(cls.HISTOGRAM_FIELD, {})))
+            if rollup.get('name'):
+                names[product_id] = rollup['name']
+
+        return histograms, names
+
+    @classmethod
+    def _compute_from_orders(cls, start=None, end=None):
+        """Recompute rollups from raw orders, keyed by (hour, product)
+
+        The range covers whole hours, matching the rollup documents that
+        ``_hour_query`` selects for the same bounds.
+        """
+        orders = get_database().orders
+        query = {}
+        created_filter = {}
+        if start:
+            created_filter['$gte'] = cls.hour_bucket(start)
+        if end:
+            created_filter['$lt'] = cls.hour_bucket(end) + timedelta(hours=1)
+        if created_filter:
+            query['createdAt'] = created_filter
+
+        projection = {'createdAt': 1, 'total': 1, 'checkoutTime': 1, 'items': 1}
+        # Start from int 0 so counts stay ints; revenue and time sums are floats
+        totals = defaultdict(lambda: defaultdict(int))
+        names = {}
+
+        for order in orders.find(query, projection).batch_size(1000):
+            for key, (inc, fields) in cls._order_updates(order).items():
+                for field, value in inc.items():
+                    totals[key][field] += value
+                if fields.get('name'):
+                    names[key] = fields['name']
+
+        return totals, names
+
+    @classmethod
+    def rebuild(cls, start=None, end=None, batch_size=1000):
+        """Rebuild rollups from raw orders (backfill); returns documents written"""
+        collection = cls.get_collection()
+        totals, names = cls._compute_from_orders(start, end)
+
+        collection.delete_many(cls._hour_query(start, end))
+
+        now = datetime.utcnow()
+        documents = []
+        written = 0
+        for (hour, product_id), values in totals.items():
+            document = {'hour': hour, 'product': product_id, 'updatedAt': now, cls.HISTOGRAM_FIELD: {}}
+            for field, value in values.items():
+                if field.startswith(cls.HISTOGRAM_FIELD + '.'):
+                    document[cls.HISTOGRAM_FIELD][field.split('.', 1)[1]] = int(value)
+                else:
+                    document[field] = value
+            if (hour, product_id) in names:
+                document['name'] = names[(hour, product_id)]
+            documents.append(document)
+
+            if len(documents) >= batch_size:
+                collection.insert_many(documents, ordered=False)
+                written += len(documents)
+                documents = []
+
+        if documents:
+            collection.insert_many(documents, ordered=False)
+            written += len(documents)
+
+        return written
+
+    @classmethod
+    def check_consistency(cls, start=None, end=None, tolerance=0.01):
+        """Compare stored rollups with raw orders; returns a list of mismatches"""
+        collection = cls.get_collection()
+        expected, _ = cls._compute_from_orders(start, end)
+
+        stored = {}
+        for document in collection.find(cls._hour_query(start, end)):
+            stored[(document['hour'], document.get('product'))] = document
+
+        fields = ('orders', 'sales', 'checkoutTimeTotal', 'units', 'revenue', 'orderCount')
+        mismatches = []
+        for key in set(expected) | set(stored):
+            hour, product_id = key
+            expected_values = expected.get(key, {})
+            stored_document = stored.get(key, {})
+            for field in fields:
+                want = expected_values.get(field, 0)
+                have = stored_document.get(field, 0)
+                if abs(want - have) > tolerance:
+                    mismatches.append({
+                        'hour': hour,
+                        'product': product_id,
+                        'field': field,
+                        'expected': want,
+                        'actual': have
+                    })
+
+            prefix = cls.HISTOGRAM_FIELD + '.'
+            want_histogram = {
+                field[len(prefix):]: int(value)
+                for field, value in expected_values.items()
+                if field.startswith(prefix) and value
+            }
+            have_histogram = {
+                index: count
+                for index, count in stored_document.get(cls.HISTOGRAM_FIELD, {}).items()
+                if count
+            }
+            if want_histogram != have_histogram:
+                mismatches.append({
+                    'hour': hour,
+                    'product': product_id,
+                    'field': cls.HISTOGRAM_FIELD,
+                    'expected': want_histogram,
+                    'actual': have_histogram
+                })
+
+        return mismatches
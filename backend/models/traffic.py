@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+from bson import Binary
+from config.db import get_database, get_collection
+from utils.hyperloglog import HyperLogLog
+
+class TrafficWindow:
+    """Flushed traffic counters and visitor sketches per worker and window.
+
+    Each worker process writes its own document for a (granularity, window)
+    pair, replacing it on every flush. Readers merge the sketches of all
+    workers, so no read-modify-write is needed across processes.
+    """
+    collection = None
+
+    RETENTION = {
+        'minute': timedelta(days=2),
+        'hour': timedelta(days=90)
+    }
+
+    @classmethod
+    def get_collection(cls, operation=None):
+        if operation is not None:
+            return get_collection('traffic_windows', operation)
+        if cls.collection is None:
+            db = get_database()
+            cls.collection = db.traffic_windows
+        return cls.collection
+
+    @classmethod
+    def save(cls, granularity, window, worker, requests, endpoints, sketch, visitor_minutes=0):
+        """Store a worker's current state for a window"""
+        collection = cls.get_collection()
+        collection.replace_one(
+            {'granularity': granularity, 'window': window, 'worker': worker},
+            {
+                'granularity': granularity,
+                'window': window,
+                'worker': worker,
+                'requests': requests,
+                'endpoints': endpoints,
+                'visitorMinutes': visitor_minutes,
+                'sketch': Binary(sketch.to_bytes()),
+                'precision': sketch.precision,
+                'updatedAt': datetime.utcnow(),
+                'expiresAt': window + cls.RETENTION[granularity]
+            },
+            upsert=True
+        )
+
+    @classmethod
+    def find_windows(cls, granularity, start, end=None):
+        """Find all workers' documents for windows in [start, end]"""
+        collection = cls.get_collection('analytics')
+        window_filter = {'$gte': start}
+        if end:
+            window_filter['$lte'] = end
+        return list(collection.find({
+            'granularity': granularity,
+            'window': window_filter
+        }).sort('window', 1))
+
+    @staticmethod
+    def load_sketch(document):
+        """Restore the visitor sketch stored in a document"""
+        return HyperLogLog.from_bytes(document['sketch'], document.get('precision', 12))
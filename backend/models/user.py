@@ -1,13 +1,16 @@
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ReturnDocument
 import bcrypt
-from config.db import get_database
+from config.db import get_database, get_collection
 
 class User:
     collection = None
 
     @classmethod
-    def get_collection(cls):
+    def get_collection(cls, operation=None):
+        if operation is not None:
+            return get_collection('users', operation)
         if cls.collection is None:
             db = get_database()
             cls.collection = db.users
@@ -43,6 +46,7 @@ class User:
 
         result = collection.insert_one(user_data)
         user_data['_id'] = result.inserted_id
+        cls.next_leaderboard_version()
 
         return user_data
 
@@ -71,12 +75,14 @@ class User:
             {'_id': user_id},
             {'$set': update_data}
         )
+        if result.modified_count > 0:
+            cls.next_leaderboard_version()
         return result.modified_count > 0
 
     @classmethod
     def update_purchases(cls, user_id, amount, checkout_time=None):
         """Update user's total purchases and fastest checkout"""
-        collection = cls.get_collection()
+        collection = cls.get_collection('checkout')
         if isinstance(user_id, str):
             user_id = ObjectId(user_id)
 
@@ -91,6 +97,24 @@ class User:
                 update_data['$set'] = {'fastestCheckout': checkout_time}
 
         collection.update_one({'_id': user_id}, update_data)
+        cls.next_leaderboard_version()
+
+    @classmethod
+    def next_leaderboard_version(cls):
+        """Bump the leaderboard version; called after every write it reflects"""
+        counter = get_database().counters.find_one_and_update(
+            {'_id': 'leaderboard'},
+            {'$inc': {'version': 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return counter['version']
+
+    @classmethod
+    def leaderboard_version(cls, operation=None, session=None):
+        """Get the current leaderboard version"""
+        counter = get_collection('counters', operation).find_one({'_id': 'leaderboard'}, session=session)
+        return counter['version'] if counter else 0
 
     @classmethod
     def to_dict(cls, user):
@@ -4,6 +4,7 @@ This will clear all data and reseed the database
 """
 
 from config.db import db
+from config.indexes import index_manager
 from seed_data import seed_database
 
 def reset_database():
@@ -35,6 +36,12 @@ def reset_database():
     except Exception as e:
         print(f"  ⚠️  Error dropping collections: {e}")
 
+    print("\n🔨 Recreating indexes...")
+    try:
+        index_manager.ensure(database)
+    except Exception as e:
+        print(f"  ⚠️  Error creating indexes: {e}")
+
     print("\n🌱 Reseeding database...")
     try:
         seed_database()
@@ -1,12 +1,31 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime, timedelta
-from models.order import Order
 from models.product import Product
+from models.rollup import OrderRollup
+from models.order_snapshot import OrderSnapshot
+from models.traffic import TrafficWindow
+from middleware.traffic import traffic_tracker
+from utils.hyperloglog import HyperLogLog
+from middleware.cache import cached
 from collections import defaultdict
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+# 'rollups' reads hourly rollups; 'columnar' scans the NumPy order snapshot
+ANALYTICS_BACKEND = os.getenv('ANALYTICS_BACKEND', 'rollups')
 
 analytics_bp = Blueprint('analytics', __name__)
 
+def get_analytics_source():
+    """Get the configured source of hourly and per-product order totals"""
+    if ANALYTICS_BACKEND == 'columnar':
+        return OrderSnapshot.get()
+    return OrderRollup
+
 @analytics_bp.route('/sales', methods=['GET'])
+@cached(ttl=10, stale_ttl=60)
 def get_sales_analytics():
     """Get sales analytics (In production, add admin auth)"""
     try:
@@ -14,34 +33,30 @@ def get_sales_analytics():
         start_date_str = request.args.get('startDate')
         end_date_str = request.args.get('endDate')
 
-        # Build date filter
-        date_filter = {}
+        start_date = None
+        end_date = None
         if start_date_str:
             start_date = datetime.fromisoformat(start_date_str.replace('Z', '+00:00'))
-            date_filter['$gte'] = start_date
         if end_date_str:
             end_date = datetime.fromisoformat(end_date_str.replace('Z', '+00:00'))
-            date_filter['$lte'] = end_date
 
-        query = {}
-        if date_filter:
-            query['createdAt'] = date_filter
-
-        # Get all orders in range
-        orders = Order.find_all(query)
+        # Read hourly totals instead of scanning every order in range
+        source = get_analytics_source()
+        hourly_totals = source.find_hourly_totals(start_date, end_date)
 
         # Calculate analytics
-        total_sales = sum(order['total'] for order in orders)
-        total_orders = len(orders)
+        total_sales = sum(rollup.get('sales', 0) for rollup in hourly_totals)
+        total_orders = sum(rollup.get('orders', 0) for rollup in hourly_totals)
+        total_checkout_time = sum(rollup.get('checkoutTimeTotal', 0) for rollup in hourly_totals)
         average_order_value = total_sales / total_orders if total_orders > 0 else 0
-        average_checkout_time = sum(order['checkoutTime'] for order in orders) / total_orders if total_orders > 0 else 0
+        average_checkout_time = total_checkout_time / total_orders if total_orders > 0 else 0
 
         # Hourly breakdown
         hourly_data = defaultdict(lambda: {'orders': 0, 'sales': 0})
-        for order in orders:
-            hour = order['createdAt'].strftime('%H:00')
-            hourly_data[hour]['orders'] += 1
-            hourly_data[hour]['sales'] += order['total']
+        for rollup in hourly_totals:
+            hour = rollup['hour'].strftime('%H:00')
+            hourly_data[hour]['orders'] += rollup.get('orders', 0)
+            hourly_data[hour]['sales'] += rollup.get('sales', 0)
 
         hourly_breakdown = [
             {
@@ -56,28 +71,24 @@ def get_sales_analytics():
         peak_hour = max(hourly_data.items(), key=lambda x: x[1]['orders'])[0] if hourly_data else None
 
         # Top products
-        product_sales = defaultdict(lambda: {'units': 0, 'revenue': 0, 'name': '', 'category': ''})
-        for order in orders:
-            for item in order.get('items', []):
-                product_id = str(item['product'])
-                product = Product.find_by_id(item['product'])
-                if product:
-                    product_sales[product_id]['name'] = product['name']
-                    product_sales[product_id]['category'] = product['category']
-                product_sales[product_id]['units'] += item['quantity']
-                product_sales[product_id]['revenue'] += item['price'] * item['quantity']
-
-        top_products = [
-            {
+        product_totals = source.find_product_totals(start_date, end_date, limit=5)
+        product_ids = [totals['_id'] for totals in product_totals]
+        products = {
+            product['_id']: product
+            for product in Product.get_collection('analytics').find({'_id': {'$in': product_ids}}, {'name': 1, 'category': 1})
+        }
+
+        top_products = []
+        for totals in product_totals:
+            product = products.get(totals['_id'], {})
+            top_products.append({
                 'product': {
-                    'name': data['name'] or 'Unknown Product',
-                    'category': data['category'] or 'Unknown'
+                    'name': product.get('name') or totals.get('name') or 'Unknown Product',
+                    'category': product.get('category') or 'Unknown'
                 },
-                'unitsSold': data['units'],
-                'revenue': round(data['revenue'], 2)
-            }
-            for product_id, data in sorted(product_sales.items(), key=lambda x: x[1]['revenue'], reverse=True)[:5]
-        ]
+                'unitsSold': totals['units'],
+                'revenue': round(totals['revenue'], 2)
+            })
 
         return jsonify({
             'success': True,
@@ -86,6 +97,7 @@ def get_sales_analytics():
                 'totalOrders': total_orders,
                 'averageOrderValue': round(average_order_value, 2),
                 'averageCheckoutTime': round(average_checkout_time, 2),
+                'checkoutTimePercentiles': OrderRollup.merge_histograms(hourly_totals).percentiles(),
                 'peakHour': peak_hour,
                 'hourlyBreakdown': hourly_breakdown,
                 'topProducts': top_products
@@ -100,36 +112,48 @@ def get_sales_analytics():
         }), 500
 
 @analytics_bp.route('/products', methods=['GET'])
+@cached(ttl=10, stale_ttl=60)
 def get_product_performance():
     """Get product performance analytics (In production, add admin auth)"""
     try:
-        # Get all products
-        products = Product.find_all()
-
-        # Get all orders
-        orders = Order.find_all()
+        # Optional date range for revenue and order counts
+        start_date_str = request.args.get('startDate')
+        end_date_str = request.args.get('endDate')
+        start_date = datetime.fromisoformat(start_date_str.replace('Z', '+00:00')) if start_date_str else None
+        end_date = datetime.fromisoformat(end_date_str.replace('Z', '+00:00')) if end_date_str else None
 
-        # Calculate product performance
         product_stats = {}
-        for product in products:
-            product_id = str(product['_id'])
-            product_stats[product_id] = {
-                'product': {
-                    '_id': product_id,
-                    'name': product['name']
-                },
-                'sold': product.get('sold', 0),
-                'revenue': 0,
-                'orderCount': 0
+        if start_date or end_date:
+            # Ranged queries sum the hourly totals for each product
+            product_totals = {
+                str(totals['_id']): totals
+                for totals in get_analytics_source().find_product_totals(start_date, end_date)
             }
-
-        # Calculate revenue from orders
-        for order in orders:
-            for item in order.get('items', []):
-                product_id = str(item['product'])
-                if product_id in product_stats:
-                    product_stats[product_id]['revenue'] += item['price'] * item['quantity']
-                    product_stats[product_id]['orderCount'] += 1
+            for product in Product.find_all():
+                product_id = str(product['_id'])
+                totals = product_totals.get(product_id, {})
+                product_stats[product_id] = {
+                    'product': {
+                        '_id': product_id,
+                        'name': product['name']
+                    },
+                    'sold': product.get('sold', 0),
+                    'revenue': totals.get('revenue', 0),
+                    'orderCount': totals.get('orderCount', 0)
+                }
+        else:
+            # All-time figures come straight from the counters on each product
+            for product in Product.find_performance():
+                product_id = str(product['_id'])
+                product_stats[product_id] = {
+                    'product': {
+                        '_id': product_id,
+                        'name': product['name']
+                    },
+                    'sold': product.get('sold', 0),
+                    'revenue': product.get('revenue', 0),
+                    'orderCount': product.get('orderCount', 0)
+                }
 
         # Convert to list and add calculated fields
         performance_list = []
@@ -154,18 +178,161 @@ def get_product_performance():
             'message': str(e)
         }), 500
 
+@analytics_bp.route('/checkout-times', methods=['GET'])
+@cached(ttl=10, stale_ttl=60)
+def get_checkout_time_percentiles():
+    """Get checkout time percentiles per hour and per product (In production, add admin auth)"""
+    try:
+        start_date_str = request.args.get('startDate')
+        end_date_str = request.args.get('endDate')
+        start_date = datetime.fromisoformat(start_date_str.replace('Z', '+00:00')) if start_date_str else None
+        end_date = datetime.fromisoformat(end_date_str.replace('Z', '+00:00')) if end_date_str else None
+
+        # Merge histograms from hourly rollups; raw orders are never read
+        hourly_totals = OrderRollup.find_hourly_totals(start_date, end_date)
+        overall = OrderRollup.merge_histograms(hourly_totals)
+
+        hourly = [
+            dict(
+                {'hour': rollup['hour'].isoformat(), 'orders': rollup.get('orders', 0)},
+                **OrderRollup.merge_histograms([rollup]).percentiles()
+            )
+            for rollup in hourly_totals
+        ]
+
+        histograms, names = OrderRollup.find_product_histograms(start_date, end_date)
+        products = [
+            dict(
+                {
+                    'product': {'_id': str(product_id), 'name': names.get(product_id, 'Unknown Product')},
+                    'orders': histogram.total
+                },
+                **histogram.percentiles()
+            )
+            for product_id, histogram in sorted(histograms.items(), key=lambda x: x[1].total, reverse=True)
+        ]
+
+        return jsonify({
+            'success': True,
+            'checkoutTimes': {
+                'orders': overall.total,
+                'percentiles': overall.percentiles(),
+                'hourly': hourly,
+                'products': products
+            }
+        }), 200
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': 'Failed to fetch checkout time percentiles',
+            'message': str(e)
+        }), 500
+
+@analytics_bp.route('/insights', methods=['GET'])
+@cached(ttl=30, stale_ttl=120)
+def get_order_insights():
+    """Get category, discount and basket analytics from the order snapshot (In production, add admin auth)"""
+    try:
+        start_date_str = request.args.get('startDate')
+        end_date_str = request.args.get('endDate')
+        start_date = datetime.fromisoformat(start_date_str.replace('Z', '+00:00')) if start_date_str else None
+        end_date = datetime.fromisoformat(end_date_str.replace('Z', '+00:00')) if end_date_str else None
+
+        snapshot = OrderSnapshot.get()
+
+        return jsonify({
+            'success': True,
+            'insights': {
+                'revenueByCategory': snapshot.revenue_by_category(start_date, end_date),
+                'discountElasticity': snapshot.discount_elasticity(start_date, end_date),
+                'basketSizes': snapshot.basket_size_distribution(start_date, end_date)
+            }
+        }), 200
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': 'Failed to fetch order insights',
+            'message': str(e)
+        }), 500
+
 @analytics_bp.route('/traffic', methods=['GET'])
+@cached(ttl=10, stale_ttl=60)
 def get_traffic_analytics():
-    """Get traffic analytics (Mock data - In production, add admin auth)"""
+    """Get traffic analytics (In production, add admin auth)"""
     try:
-        # Mock traffic data
+        hours = max(1, min(int(request.args.get('hours', 24)), 24 * 90))
+
+        # Make this worker's open windows visible before reading
+        traffic_tracker.flush()
+
+        now = datetime.utcnow()
+        start_hour = now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=hours - 1)
+        start_minute = now.replace(second=0, microsecond=0) - timedelta(minutes=59)
+
+        # Merge every worker's hourly sketches
+        unique_sketch = HyperLogLog(traffic_tracker.precision)
+        hourly_data = defaultdict(lambda: {'requests': 0, 'sketch': HyperLogLog(traffic_tracker.precision)})
+        endpoint_requests = defaultdict(int)
+        total_requests = 0
+        visitor_minutes = 0
+
+        for window in TrafficWindow.find_windows('hour', start_hour):
+            sketch = TrafficWindow.load_sketch(window)
+            unique_sketch.merge(sketch)
+            hourly_data[window['window']]['requests'] += window.get('requests', 0)
+            hourly_data[window['window']]['sketch'].merge(sketch)
+            total_requests += window.get('requests', 0)
+            visitor_minutes += window.get('visitorMinutes', 0)
+            for endpoint, count in window.get('endpoints', {}).items():
+                endpoint_requests[endpoint] += count
+
+        # Merge every worker's minute sketches for the last hour
+        minute_data = defaultdict(lambda: {'requests': 0, 'sketch': HyperLogLog(traffic_tracker.precision)})
+        for window in TrafficWindow.find_windows('minute', start_minute):
+            minute_data[window['window']]['requests'] += window.get('requests', 0)
+            minute_data[window['window']]['sketch'].merge(TrafficWindow.load_sketch(window))
+
+        unique_visitors = unique_sketch.count()
+        hourly_visitors = [
+            {
+                'hour': hour.isoformat(),
+                'requests': data['requests'],
+                'uniqueVisitors': data['sketch'].count()
+            }
+            for hour, data in sorted(hourly_data.items())
+        ]
+        minute_visitors = [
+            {
+                'minute': minute.isoformat(),
+                'requests': data['requests'],
+                'uniqueVisitors': data['sketch'].count()
+            }
+            for minute, data in sorted(minute_data.items())
+        ]
+
+        # Peak hour of day by request volume
+        requests_by_hour = defaultdict(int)
+        for hour, data in hourly_data.items():
+            requests_by_hour[hour.strftime('%H:00')] += data['requests']
+        peak_traffic_time = max(requests_by_hour.items(), key=lambda x: x[1])[0] if requests_by_hour else None
+
+        # Time on site estimated from visitor-minutes per unique visitor
+        average_session_duration = visitor_minutes * 60 / unique_visitors if unique_visitors > 0 else 0
+
+        total_orders = sum(rollup.get('orders', 0) for rollup in OrderRollup.find_hourly_totals(start_hour))
+
         traffic = {
-            'totalVisitors': 1250,
-            'uniqueVisitors': 890,
-            'peakTrafficTime': '14:00',
-            'averageSessionDuration': 420,
-            'bounceRate': 0.23,
-            'conversionRate': 0.14
+            'totalRequests': total_requests,
+            'totalVisitors': sum(data['uniqueVisitors'] for data in hourly_visitors),
+            'uniqueVisitors': unique_visitors,
+            'peakTrafficTime': peak_traffic_time,
+            'averageSessionDuration': round(average_session_duration),
+            'conversionRate': round(min(total_orders / unique_visitors, 1), 2) if unique_visitors > 0 else 0,
+            'endpoints': dict(sorted(endpoint_requests.items(), key=lambda x: x[1], reverse=True)),
+            'hourlyVisitors': hourly_visitors,
+            'minuteVisitors': minute_visitors
         }
 
         return jsonify({
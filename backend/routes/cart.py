@@ -2,7 +2,7 @@ from flask import Blueprint, request, jsonify
 from models.cart import Cart
 from models.product import Product
 from middleware.auth import auth_required
-from config.socket import emit_stock_update
+from config.socket import emit_cart_update
 from bson import ObjectId
 
 cart_bp = Blueprint('cart', __name__)
@@ -77,15 +77,13 @@ def add_to_cart():
                 'error': f'Failed to add item: {str(e)}'
             }), 500
 
-        # Get updated product stock
-        product = Product.find_by_id(product_id)
-        if product:
-            emit_stock_update(product_id, product['stock'])
+        cart_dict = Cart.to_dict(cart)
+        emit_cart_update(user_id, cart_dict)
 
         return jsonify({
             'success': True,
             'message': 'Item added to cart',
-            'cart': Cart.to_dict(cart)
+            'cart': cart_dict
         }), 200
 
     except Exception as e:
@@ -160,15 +158,13 @@ def update_cart_item(product_id):
                 'error': str(e)
             }), 409
 
-        # Get updated product stock
-        product = Product.find_by_id(product_id)
-        if product:
-            emit_stock_update(product_id, product['stock'])
+        cart_dict = Cart.to_dict(cart)
+        emit_cart_update(user_id, cart_dict)
 
         return jsonify({
             'success': True,
             'message': 'Cart updated',
-            'cart': Cart.to_dict(cart)
+            'cart': cart_dict
         }), 200
 
     except Exception as e:
@@ -200,10 +196,13 @@ def remove_cart_item(product_id):
                 'error': str(e)
             }), 404
 
+        cart_dict = Cart.to_dict(cart)
+        emit_cart_update(user_id, cart_dict)
+
         return jsonify({
             'success': True,
             'message': 'Item removed from cart',
-            'cart': Cart.to_dict(cart)
+            'cart': cart_dict
         }), 200
 
     except Exception as e:
@@ -225,6 +224,7 @@ def clear_cart():
         print(f"DEBUG: Clearing cart for user: {user_id}")
 
         Cart.clear(user_id)
+        emit_cart_update(user_id, Cart.to_dict(None))
 
         return jsonify({
             'success': True,
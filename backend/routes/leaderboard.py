@@ -1,12 +1,32 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g
 from models.user import User
 from models.order import Order
 from middleware.auth import optional_auth
+from middleware.cache import cached, conditional
+from config.db import start_session
 
 leaderboard_bp = Blueprint('leaderboard', __name__)
 
+def leaderboard_etag():
+    """Tag from the leaderboard version, bumped by every purchase and signup
+
+    The version is read like the rankings, from a secondary, and in the
+    session the rankings are then read in. A lagging member therefore
+    cannot serve rankings older than the tag they are cached under.
+    """
+    g.leaderboard_session = start_session()
+    return f"leaderboard-{User.leaderboard_version('leaderboard', g.leaderboard_session)}"
+
+@leaderboard_bp.teardown_request
+def end_leaderboard_session(error=None):
+    session = g.pop('leaderboard_session', None)
+    if session is not None:
+        session.end_session()
+
 @leaderboard_bp.route('', methods=['GET'])
 @optional_auth
+@conditional(leaderboard_etag)
+@cached(ttl=5, stale_ttl=30)
 def get_leaderboard():
     """Get leaderboard rankings"""
     try:
@@ -14,23 +34,24 @@ def get_leaderboard():
         limit = int(request.args.get('limit', 10))
         sort_by = request.args.get('sortBy', 'totalPurchases')
 
-        # Get all users
-        db = User.get_collection()
+        # Get all users; rankings are read from secondaries
+        db = User.get_collection('leaderboard')
+        session = g.get('leaderboard_session')
 
         # Build sort criteria
         if sort_by == 'checkoutTime':
             # Sort by fastest checkout (ascending, nulls last)
             users = list(db.find({
                 'fastestCheckout': {'$ne': None}
-            }).sort('fastestCheckout', 1).limit(limit))
+            }, session=session).sort('fastestCheckout', 1).limit(limit))
         else:  # totalPurchases
-            users = list(db.find().sort('totalPurchases', -1).limit(limit))
+            users = list(db.find(session=session).sort('totalPurchases', -1).limit(limit))
 
         # Build leaderboard with additional stats
         leaderboard = []
         for rank, user in enumerate(users, 1):
             # Get user's order count
-            order_count = Order.get_total_count(user['_id'])
+            order_count = Order.get_total_count(user['_id'], operation='leaderboard', session=session)
 
             leaderboard.append({
                 'rank': rank,
@@ -3,8 +3,9 @@ from datetime import datetime
 from models.order import Order
 from models.cart import Cart
 from middleware.auth import auth_required
-from config.socket import emit_order_success, emit_stock_update, emit_leaderboard_update, emit_product_sold_out
+from config.socket import emit_order_success, emit_stock_update, emit_leaderboard_update, emit_product_sold_out, emit_cart_update
 from models.product import Product
+from middleware.cache import response_cache, conditional
 
 orders_bp = Blueprint('orders', __name__)
 
@@ -116,6 +117,7 @@ def create_order():
         # Clear cart
         print("DEBUG: Clearing cart...")
         Cart.clear(user_id)
+        emit_cart_update(user_id, Cart.to_dict(None))
 
         # Emit real-time events
         print("DEBUG: Emitting real-time events...")
@@ -125,14 +127,19 @@ def create_order():
             'checkoutTime': order['checkoutTime']
         })
 
-        # Emit stock updates and check for sold out products
+        # Emit stock updates from the levels the stock writes returned
         for item in order['items']:
-            product = Product.find_by_id(item['product'])
-            if product:
-                emit_stock_update(item['product'], product['stock'])
+            stock = order['stockLevels'].get(item['product'])
+            if stock is None:
+                continue
 
-                if product['stock'] == 0:
-                    emit_product_sold_out(item['product'], product['name'])
+            emit_stock_update(item['product'], stock, order['catalogVersion'])
+            if stock == 0:
+                emit_product_sold_out(item['product'], item['name'])
+
+        # Drop cached listings and leaderboard affected by this order
+        response_cache.invalidate('/api/products')
+        response_cache.invalidate('/api/leaderboard')
 
         # Emit leaderboard update
         emit_leaderboard_update()
@@ -191,8 +198,18 @@ def get_user_orders():
             'message': str(e)
         }), 500
 
+def order_etag(order_id):
+    """ETag from a projected lookup, so a 304 skips loading and populating
+    the order; None for missing or foreign orders lets the view answer 404
+    or 403"""
+    order = Order.find_version(order_id)
+    if not order or str(order['user']) != request.user_id:
+        return None
+    return Order.etag(order)
+
 @orders_bp.route('/<order_id>', methods=['GET'])
 @auth_required
+@conditional(order_etag)
 def get_order(order_id):
     """Get single order by order ID"""
     try:
@@ -218,10 +235,14 @@ def get_order(order_id):
                 'error': 'Unauthorized access to order'
             }), 403
 
-        return jsonify({
+        # The populated details are live, so clients revalidate; an
+        # unchanged order is a 304 from order_etag
+        response = jsonify({
             'success': True,
             'order': Order.to_dict(order)
-        }), 200
+        })
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response, 200
 
     except Exception as e:
         print(f"DEBUG: Exception in get_order: {str(e)}")
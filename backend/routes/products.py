@@ -1,38 +1,146 @@
-from flask import Blueprint, request, jsonify
-from models.product import Product
+import os
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from dotenv import load_dotenv
+from models.product import Product, catalog, CATALOG_CACHE, PRODUCTS_PAGE_MAX
 from middleware.auth import optional_auth
+from middleware.cache import cached, conditional, response_cache
+from config.socket import emit_stock_update, emit_stock_updates, emit_products_changed
+from utils.ndjson import read_rows, chunked, dumps_lines
 from bson import ObjectId
 
+load_dotenv()
+
+# Largest delta served for ?since=; clients further behind get a full snapshot
+CATALOG_DELTA_LIMIT = int(os.getenv('CATALOG_DELTA_LIMIT', 200))
+
+# Rows written per bulk_write in the bulk endpoints
+BULK_CHUNK_SIZE = int(os.getenv('BULK_CHUNK_SIZE', 1000))
+
 products_bp = Blueprint('products', __name__)
 
+def get_catalog_delta(since):
+    """Build the response for a client holding the catalog at version since"""
+    try:
+        since = int(since)
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'since must be a catalog version'
+        }), 400
+
+    # Versions are claimed before the product is written, so the client
+    # continues from a settled version and writes still in flight are
+    # re-sent next time; clients apply repeated products idempotently
+    version = Product.current_version()
+
+    full = since < 0 or since > version
+    products = [] if full else Product.find_changed_since(since, CATALOG_DELTA_LIMIT)
+    if full or len(products) > CATALOG_DELTA_LIMIT:
+        full = True
+        products = Product.find_all({'isActive': {'$ne': False}})
+
+    settled = Product.settled_version(version)
+    version = settled if full else max(since, settled)
+
+    products_list = [Product.to_dict(p) for p in products]
+
+    return jsonify({
+        'success': True,
+        'version': version,
+        'full': full,
+        'count': len(products_list),
+        'products': products_list
+    }), 200
+
+def listing_query():
+    """Filters and sort for the products list from the query args"""
+    category = request.args.get('category')
+    in_stock = request.args.get('inStock')
+    sort_by = request.args.get('sortBy')
+
+    # Build filters; ended sales are hidden
+    filters = {'isActive': {'$ne': False}}
+    if category:
+        filters['category'] = category
+    if in_stock == 'true':
+        filters['stock'] = {'$gt': 0}
+    return filters, sort_by
+
+def listing_page():
+    """Page size and cursor position for ?limit=&cursor=; raises ValueError"""
+    limit = request.args.get('limit')
+    if limit is None:
+        return None, None
+    if not limit.isdigit() or int(limit) < 1:
+        raise ValueError('limit must be a positive integer')
+
+    cursor = request.args.get('cursor')
+    after = Product.decode_cursor(cursor, request.args.get('sortBy')) if cursor else None
+    return min(int(limit), PRODUCTS_PAGE_MAX), after
+
+def listing_etag():
+    """Tag of the full catalog listing, read from the in-memory catalog"""
+    if not CATALOG_CACHE or 'since' in request.args or 'limit' in request.args:
+        return None
+    return catalog.list_etag(*listing_query())
+
+def product_etag(product_id):
+    if not CATALOG_CACHE or not ObjectId.is_valid(product_id):
+        return None
+    return catalog.product_etag(ObjectId(product_id))
+
 @products_bp.route('', methods=['GET'])
 @optional_auth
+@conditional(listing_etag)
+@cached(ttl=2, stale_ttl=10)
 def get_all_products():
-    """Get all products with optional filters"""
+    """Get all products with optional filters
+
+    With ?since=<version> only the products changed after that catalog
+    version are returned, or the full catalog when the client is too far
+    behind (full is true). Deltas include products whose sale ended, with
+    isActive false, so clients can drop them.
+
+    With ?limit=<n> one page is returned, along with a nextCursor to pass
+    as ?cursor= for the next page (null on the last page).
+    """
     try:
-        # Get query parameters
-        category = request.args.get('category')
-        in_stock = request.args.get('inStock')
-        sort_by = request.args.get('sortBy')
-
-        # Build filters
-        filters = {}
-        if category:
-            filters['category'] = category
-        if in_stock == 'true':
-            filters['stock'] = {'$gt': 0}
+        since = request.args.get('since')
+        if since is not None:
+            return get_catalog_delta(since)
+
+        filters, sort_by = listing_query()
+        try:
+            limit, after = listing_page()
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+
+        # Served as pre-rendered JSON from the in-memory catalog
+        if CATALOG_CACHE:
+            body = catalog.render_list(filters, sort_by, limit, after)
+            return Response(body, status=200, mimetype='application/json')
 
         # Get products
-        products = Product.find_all(filters, sort_by)
+        version = Product.settled_version(Product.current_version())
+        products = Product.query_all(filters, sort_by, limit + 1 if limit else None, after)
 
         # Convert to dict
-        products_list = [Product.to_dict(p) for p in products]
+        products_list = [Product.to_dict(p) for p in products[:limit]]
 
-        return jsonify({
+        response = {
             'success': True,
+            'version': version,
             'count': len(products_list),
             'products': products_list
-        }), 200
+        }
+        if limit:
+            more = len(products) > limit
+            response['nextCursor'] = Product.encode_cursor(products[limit - 1], sort_by) if more else None
+
+        return jsonify(response), 200
 
     except Exception as e:
         return jsonify({
@@ -41,8 +149,45 @@ def get_all_products():
             'message': str(e)
         }), 500
 
+@products_bp.route('/search', methods=['GET'])
+@optional_auth
+def search_products():
+    """Search active products by name, description and category
+
+    Words of ?q= with two or more characters also match as prefixes.
+    Results are ranked, can be narrowed with ?category=, and come with
+    per-category counts in facets. Served from the in-memory catalog's
+    search index.
+    """
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({
+                'success': False,
+                'error': 'Search query is required'
+            }), 400
+
+        limit = request.args.get('limit', '20')
+        if not limit.isdigit() or int(limit) < 1:
+            return jsonify({
+                'success': False,
+                'error': 'limit must be a positive integer'
+            }), 400
+
+        body = catalog.render_search(query, request.args.get('category'), min(int(limit), PRODUCTS_PAGE_MAX))
+        return Response(body, status=200, mimetype='application/json')
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': 'Failed to search products',
+            'message': str(e)
+        }), 500
+
 @products_bp.route('/<product_id>', methods=['GET'])
 @optional_auth
+@conditional(product_etag)
+@cached(ttl=2, stale_ttl=10)
 def get_product(product_id):
     """Get single product by ID"""
     try:
@@ -53,6 +198,11 @@ def get_product(product_id):
                 'error': 'Invalid product ID'
             }), 400
 
+        if CATALOG_CACHE:
+            body = catalog.render_product(ObjectId(product_id))
+            if body is not None:
+                return Response(body, status=200, mimetype='application/json')
+
         # Get product
         product = Product.find_by_id(product_id)
 
@@ -106,6 +256,10 @@ def update_product_stock(product_id):
         # Get updated product
         product = Product.find_by_id(product_id)
 
+        # Drop cached listings so the new stock is served immediately
+        response_cache.invalidate('/api/products')
+        emit_stock_update(product_id, product['stock'], product.get('catalogVersion'))
+
         return jsonify({
             'success': True,
             'message': 'Stock updated successfully',
@@ -121,3 +275,102 @@ def update_product_stock(product_id):
             'error': 'Failed to update stock',
             'message': str(e)
         }), 500
+
+def import_chunk(chunk):
+    """Validate and insert one chunk of product rows; returns per-row results"""
+    results = []
+    products = []
+    positions = []
+    for line, row, error in chunk:
+        if error is None:
+            try:
+                products.append(Product.build(row))
+                positions.append(len(results))
+                results.append(None)
+                continue
+            except ValueError as e:
+                error = str(e)
+        results.append({'line': line, 'success': False, 'error': error})
+
+    errors = Product.insert_many(products) if products else {}
+    for index, (position, product) in enumerate(zip(positions, products)):
+        line = chunk[position][0]
+        if index in errors:
+            results[position] = {'line': line, 'success': False, 'error': errors[index]}
+        else:
+            results[position] = {'line': line, 'success': True, 'id': str(product['_id'])}
+    emit_products_changed([Product.to_dict(product) for index, product in enumerate(products)
+                           if index not in errors and product['isActive']])
+    return results
+
+def stock_chunk(chunk):
+    """Validate and apply one chunk of stock rows; returns per-row results"""
+    results = []
+    stocks = {}
+    for line, row, error in chunk:
+        if error is None:
+            product_id = row.get('productId')
+            stock = row.get('stock')
+            if not isinstance(product_id, str) or not ObjectId.is_valid(product_id):
+                error = 'Invalid product ID'
+            elif not isinstance(stock, int) or isinstance(stock, bool) or stock < 0:
+                error = 'Valid stock value is required'
+            else:
+                stocks[ObjectId(product_id)] = stock
+        results.append(None if error is None else {'line': line, 'success': False, 'error': error})
+
+    existing, version = Product.set_stocks(stocks) if stocks else (set(), None)
+    for position, (line, row, _) in enumerate(chunk):
+        if results[position] is not None:
+            continue
+        product_id = ObjectId(row['productId'])
+        if product_id in existing:
+            results[position] = {'line': line, 'success': True, 'productId': row['productId'], 'stock': stocks[product_id]}
+        else:
+            results[position] = {'line': line, 'success': False, 'error': 'Product not found'}
+
+    # One coalesced stockUpdates frame per room for the whole chunk
+    if existing:
+        emit_stock_updates([(product_id, stocks[product_id], version) for product_id in existing])
+    return results
+
+def stream_bulk(apply_chunk):
+    """Apply NDJSON request rows chunk by chunk, streaming NDJSON results
+
+    Every row gets a result line in input order, and a final line holds
+    the totals.
+    """
+    def generate():
+        succeeded = failed = 0
+        try:
+            for chunk in chunked(read_rows(request.stream), BULK_CHUNK_SIZE):
+                results = apply_chunk(chunk)
+                ok = sum(1 for result in results if result['success'])
+                succeeded += ok
+                failed += len(results) - ok
+                response_cache.invalidate('/api/products')
+                yield dumps_lines(results)
+        except Exception as e:
+            yield dumps_lines([{'success': False, 'error': 'Bulk operation failed', 'message': str(e)}])
+        yield dumps_lines([{'summary': {'succeeded': succeeded, 'failed': failed}}])
+
+    return Response(stream_with_context(generate()), status=200, mimetype='application/x-ndjson')
+
+@products_bp.route('/bulk', methods=['POST'])
+def bulk_import_products():
+    """Create products from an NDJSON body, one product per line (Admin endpoint - in production, add admin auth)
+
+    Rows are validated and inserted BULK_CHUNK_SIZE at a time. The
+    response streams one NDJSON result per row ({line, success, id or
+    error}) and ends with a {summary} line.
+    """
+    return stream_bulk(import_chunk)
+
+@products_bp.route('/bulk/stock', methods=['POST'])
+def bulk_update_stock():
+    """Set stock from NDJSON {productId, stock} rows (Admin endpoint - in production, add admin auth)
+
+    Each chunk is one bulk write and one stockUpdates broadcast. The
+    response streams per-row results like bulk_import_products.
+    """
+    return stream_bulk(stock_chunk)
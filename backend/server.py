@@ -1,17 +1,31 @@
-from flask import Flask, jsonify
-from flask_cors import CORS
 from dotenv import load_dotenv
+import time
 import os
 
+# Startup is timed from here to the last route registration
+boot_started = time.perf_counter()
+
 # Load environment variables
 load_dotenv()
 
+# A Socket.IO message queue listener needs cooperative sockets under eventlet
+if os.getenv('SOCKETIO_MESSAGE_QUEUE'):
+    import eventlet
+    eventlet.monkey_patch()
+
+from flask import Flask, jsonify
+from flask_cors import CORS
+
 # Import configuration
-from config.db import db
+from config.db import db, STORAGE_ENGINE
+from config.indexes import index_manager
 from config.socket import init_socketio
+from config.scheduler import sale_scheduler
+from config.metrics import metrics
 
 # Import middleware
 from middleware.error_handler import register_error_handlers
+from middleware.traffic import register_traffic_tracking, traffic_tracker
 
 # Import routes
 from routes.auth import auth_bp
@@ -45,12 +59,26 @@ except Exception as e:
     print(f"Failed to connect to database: {e}")
     exit(1)
 
+# The in-memory store starts empty; load the sample data into it
+if STORAGE_ENGINE == 'memory' and os.getenv('MEMORY_SEED', 'true').lower() == 'true':
+    from seed_data import seed_database
+    seed_database()
+
 # Initialize Socket.IO
 socketio = init_socketio(app)
 
+# Build missing indexes without holding up startup (MONGO_INDEX_BUILD)
+index_manager.start(db.get_db())
+
+# Start the sale lifecycle scheduler
+sale_scheduler.start()
+
 # Register error handlers
 register_error_handlers(app)
 
+# Register traffic tracking
+register_traffic_tracking(app)
+
 # Register blueprints
 app.register_blueprint(auth_bp, url_prefix='/api/auth')
 app.register_blueprint(products_bp, url_prefix='/api/products')
@@ -74,9 +102,15 @@ def index():
 def health():
     return jsonify({
         'status': 'healthy',
-        'database': 'connected'
+        'database': 'connected',
+        'indexes': index_manager.status
     }), 200
 
+# Metrics endpoint
+@app.route('/metrics')
+def get_metrics():
+    return jsonify(metrics.snapshot()), 200
+
 # API info endpoint
 @app.route('/api')
 def api_info():
@@ -100,12 +134,18 @@ import sys
 
 def signal_handler(sig, frame):
     print('\n🛑 Shutting down server...')
+    traffic_tracker.flush()
+    sale_scheduler.stop()
     db.close()
     sys.exit(0)
 
 signal.signal(signal.SIGINT, signal_handler)
 signal.signal(signal.SIGTERM, signal_handler)
 
+startup_seconds = time.perf_counter() - boot_started
+metrics.set_gauge('startup_seconds', round(startup_seconds, 3))
+print(f"⏱️  Started in {startup_seconds * 1000:.0f} ms (indexes: {index_manager.status})")
+
 # Run server
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))
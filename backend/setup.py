@@ -13,6 +13,7 @@ def create_directory_structure():
         'models',
         'routes',
         'middleware',
+        'utils',
         'logs',
         'uploads',
     ]
@@ -0,0 +1,195 @@
+"""
+Tests for the response cache (middleware/cache.py)
+Covers the cached and conditional decorators on both cache backends:
+hits and misses, stale-while-revalidate, expiry, invalidation and the
+ETag as part of the cache key. The Redis backend runs against the server
+at CACHE_REDIS_URL and is skipped when none answers; run with pytest.
+"""
+
+import threading
+import uuid
+import pytest
+from flask import Flask, jsonify
+from middleware.cache import CACHE_REDIS_URL, MemoryCacheBackend, RedisCacheBackend, redis, response_cache, cached, conditional
+
+@pytest.fixture(params=['memory', 'redis'])
+def backend(request, monkeypatch):
+    if request.param == 'memory':
+        backend = MemoryCacheBackend()
+    else:
+        if redis is None:
+            pytest.skip('redis package is not installed')
+        backend = RedisCacheBackend(namespace=f"flash_sale:test_cache:{uuid.uuid4().hex}:")
+        try:
+            backend.client.ping()
+        except redis.ConnectionError:
+            pytest.skip(f"no Redis server at {CACHE_REDIS_URL}")
+    monkeypatch.setattr(response_cache, 'backend', backend)
+    yield backend
+    if request.param == 'redis':
+        backend.delete_prefix('')
+
+class Catalog:
+    """A versioned resource behind the test routes, counting view calls"""
+
+    def __init__(self):
+        self.version = 1
+        self.calls = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def render(self):
+        self.calls += 1
+        self.release.wait(5)
+        return jsonify(version=self.version, calls=self.calls)
+
+@pytest.fixture
+def catalog():
+    return Catalog()
+
+def make_app(catalog, ttl=60, stale_ttl=60, etag=True):
+    app = Flask(__name__)
+
+    @app.route('/products')
+    @conditional(lambda: f"v{catalog.version}" if etag else None)
+    @cached(ttl=ttl, stale_ttl=stale_ttl)
+    def products():
+        return catalog.render()
+
+    @app.route('/plain', methods=['GET', 'POST'])
+    @cached(ttl=ttl, stale_ttl=stale_ttl)
+    def plain():
+        return catalog.render()
+
+    return app
+
+# cached
+
+def test_miss_then_hit(backend, catalog):
+    client = make_app(catalog).test_client()
+    first = client.get('/plain')
+    second = client.get('/plain')
+    assert first.headers['X-Cache'] == 'MISS'
+    assert second.headers['X-Cache'] == 'HIT'
+    assert second.get_json() == first.get_json()
+    assert second.content_type == 'application/json'
+    assert catalog.calls == 1
+
+def test_query_args_are_part_of_the_key(backend, catalog):
+    client = make_app(catalog).test_client()
+    client.get('/plain?page=1&sort=price')
+    assert client.get('/plain?sort=price&page=1').headers['X-Cache'] == 'HIT'
+    assert client.get('/plain?page=2&sort=price').headers['X-Cache'] == 'MISS'
+    assert catalog.calls == 2
+
+def test_non_get_is_not_cached(backend, catalog):
+    client = make_app(catalog).test_client()
+    client.get('/plain')
+    response = client.post('/plain')
+    assert 'X-Cache' not in response.headers
+    assert response.get_json()['calls'] == 2
+    assert client.get('/plain').get_json()['calls'] == 1
+
+def test_stale_entry_is_served_while_one_request_revalidates(backend, catalog):
+    app = make_app(catalog, ttl=0)
+    client = app.test_client()
+    assert client.get('/plain').get_json()['calls'] == 1
+
+    # The revalidating request holds the key's lock until released
+    catalog.version = 2
+    catalog.release.clear()
+    revalidated = {}
+    revalidating = threading.Thread(target=lambda: revalidated.update(response=app.test_client().get('/plain')))
+    revalidating.start()
+    while catalog.calls < 2:
+        threading.Event().wait(0.01)
+
+    stale = client.get('/plain')
+    assert stale.headers['X-Cache'] == 'STALE'
+    assert stale.get_json() == {'version': 1, 'calls': 1}
+
+    catalog.release.set()
+    revalidating.join(5)
+    assert revalidated['response'].headers['X-Cache'] == 'MISS'
+    assert revalidated['response'].get_json() == {'version': 2, 'calls': 2}
+    assert catalog.calls == 2
+
+def test_stale_entry_is_recomputed_when_nobody_else_is(backend, catalog):
+    client = make_app(catalog, ttl=0).test_client()
+    client.get('/plain')
+    again = client.get('/plain')
+    assert again.headers['X-Cache'] == 'MISS'
+    assert again.get_json()['calls'] == 2
+
+def test_entry_past_the_stale_window_is_gone(backend, catalog):
+    make_app(catalog, ttl=0, stale_ttl=0).test_client().get('/plain')
+    assert backend.get('/plain?') is None
+
+def test_concurrent_misses_compute_once(backend, catalog):
+    catalog.release.clear()
+    app = make_app(catalog)
+    responses = []
+    threads = [threading.Thread(target=lambda: responses.append(app.test_client().get('/plain'))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    while catalog.calls < 1:
+        threading.Event().wait(0.01)
+    catalog.release.set()
+    for thread in threads:
+        thread.join(5)
+    assert catalog.calls == 1
+    assert sorted(response.headers['X-Cache'] for response in responses) == ['HIT', 'HIT', 'HIT', 'MISS']
+
+def test_invalidate_drops_keys_by_prefix(backend, catalog):
+    client = make_app(catalog).test_client()
+    client.get('/plain?page=1')
+    client.get('/products')
+    response_cache.invalidate('/plain')
+    assert client.get('/plain?page=1').headers['X-Cache'] == 'MISS'
+    assert client.get('/products').headers['X-Cache'] == 'HIT'
+
+# conditional
+
+def test_etag_is_set_and_answers_if_none_match(backend, catalog):
+    client = make_app(catalog).test_client()
+    response = client.get('/products')
+    assert response.headers['ETag'] == '"v1"'
+
+    not_modified = client.get('/products', headers={'If-None-Match': '"v1"'})
+    assert not_modified.status_code == 304
+    assert not_modified.headers['ETag'] == '"v1"'
+    assert catalog.calls == 1
+
+def test_etag_is_part_of_the_cache_key(backend, catalog):
+    client = make_app(catalog).test_client()
+    assert client.get('/products').get_json()['version'] == 1
+
+    # A new tag must not be served the body cached under the old one
+    catalog.version = 2
+    response = client.get('/products')
+    assert response.headers['X-Cache'] == 'MISS'
+    assert response.headers['ETag'] == '"v2"'
+    assert response.get_json()['version'] == 2
+
+    again = client.get('/products')
+    assert again.headers['X-Cache'] == 'HIT'
+    assert again.headers['ETag'] == '"v2"'
+    assert client.get('/products', headers={'If-None-Match': '"v1"'}).status_code == 200
+
+def test_changed_tag_with_stale_entry_is_not_served_stale(backend, catalog):
+    client = make_app(catalog, ttl=0).test_client()
+    client.get('/products')
+    catalog.version = 2
+    response = client.get('/products')
+    assert response.headers['X-Cache'] == 'MISS'
+    assert response.get_json()['version'] == 2
+
+def test_body_hash_etag_without_etag_func(backend, catalog):
+    client = make_app(catalog, etag=False).test_client()
+    response = client.get('/products')
+    etag = response.headers['ETag']
+    assert etag
+
+    cached_response = client.get('/products', headers={'If-None-Match': etag})
+    assert cached_response.status_code == 304
+    assert catalog.calls == 1
@@ -0,0 +1,227 @@
+"""
+Tests for the in-memory storage engine (STORAGE_ENGINE=memory)
+Covers the query and update operators, sorting and cursors, unique
+indexes, bulk writes and the atomic conditional stock update the models
+rely on. Needs no database; run with pytest.
+"""
+
+import threading
+from datetime import datetime, timedelta
+import pytest
+from pymongo import ASCENDING, DESCENDING, DeleteMany, DeleteOne, IndexModel, InsertOne, ReplaceOne, ReturnDocument, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from utils.memory_store import MemoryDatabase
+
+@pytest.fixture
+def products():
+    collection = MemoryDatabase('test').products
+    collection.insert_many([
+        {'_id': 1, 'name': 'Mouse', 'category': 'Electronics', 'price': 20, 'stock': 5, 'tags': ['usb', 'wireless']},
+        {'_id': 2, 'name': 'Keyboard', 'category': 'Electronics', 'price': 80, 'stock': 0, 'tags': ['usb']},
+        {'_id': 3, 'name': 'Lamp', 'category': 'Home', 'price': 35, 'stock': 12, 'meta': {'color': 'red'}},
+        {'_id': 4, 'name': 'Mug', 'category': 'Home', 'price': 8, 'stock': 40}
+    ])
+    return collection
+
+def ids(documents):
+    return [document['_id'] for document in documents]
+
+# Queries
+
+@pytest.mark.parametrize('query, expected', [
+    ({'category': 'Home'}, [3, 4]),
+    ({'price': {'$gt': 20}}, [2, 3]),
+    ({'price': {'$gte': 20, '$lt': 80}}, [1, 3]),
+    ({'price': {'$lte': 8}}, [4]),
+    ({'category': {'$ne': 'Home'}}, [1, 2]),
+    ({'_id': {'$in': [2, 4, 9]}}, [2, 4]),
+    ({'_id': {'$nin': [1, 2]}}, [3, 4]),
+    ({'meta': {'$exists': True}}, [3]),
+    ({'meta.color': 'red'}, [3]),
+    ({'tags': 'wireless'}, [1]),
+    ({'tags': {'$in': ['usb']}}, [1, 2]),
+    ({'missing': None}, [1, 2, 3, 4]),
+    ({'$or': [{'stock': 0}, {'price': {'$lt': 10}}]}, [2, 4]),
+    ({'$and': [{'category': 'Electronics'}, {'stock': {'$gt': 0}}]}, [1]),
+    ({'$nor': [{'category': 'Home'}, {'stock': 0}]}, [1])
+])
+def test_query_operators(products, query, expected):
+    assert sorted(ids(products.find(query))) == expected
+    assert products.count_documents(query) == len(expected)
+
+def test_comparisons_do_not_cross_types(products):
+    products.insert_one({'_id': 5, 'price': '100'})
+    assert sorted(ids(products.find({'price': {'$gt': 50}}))) == [2]
+
+def test_projection(products):
+    assert products.find_one({'_id': 3}, {'name': 1}) == {'_id': 3, 'name': 'Lamp'}
+    assert products.find_one({'_id': 3}, {'name': 1, '_id': 0}) == {'name': 'Lamp'}
+    assert 'tags' not in products.find_one({'_id': 1}, {'tags': 0})
+
+def test_results_are_copies(products):
+    document = products.find_one({'_id': 1})
+    document['tags'].append('changed')
+    assert products.find_one({'_id': 1})['tags'] == ['usb', 'wireless']
+
+# Updates
+
+def test_update_operators(products):
+    result = products.update_one({'_id': 1}, {
+        '$set': {'name': 'Mouse Pro', 'meta.color': 'black'},
+        '$inc': {'stock': -2, 'sold': 2},
+        '$unset': {'tags': ''},
+        '$max': {'price': 25},
+        '$min': {'floor': 3}
+    })
+    assert (result.matched_count, result.modified_count) == (1, 1)
+    document = products.find_one({'_id': 1})
+    assert document['name'] == 'Mouse Pro'
+    assert document['meta'] == {'color': 'black'}
+    assert (document['stock'], document['sold']) == (3, 2)
+    assert 'tags' not in document
+    assert (document['price'], document['floor']) == (25, 3)
+
+def test_max_keeps_the_larger_value(products):
+    products.update_one({'_id': 2}, {'$max': {'price': 10}})
+    assert products.find_one({'_id': 2})['price'] == 80
+
+def test_push_each(products):
+    products.update_one({'_id': 2}, {'$push': {'tags': {'$each': ['mechanical', 'rgb']}}})
+    products.update_one({'_id': 4}, {'$push': {'tags': 'ceramic'}})
+    assert products.find_one({'_id': 2})['tags'] == ['usb', 'mechanical', 'rgb']
+    assert products.find_one({'_id': 4})['tags'] == ['ceramic']
+
+def test_unchanged_update_is_not_modified(products):
+    result = products.update_one({'_id': 3}, {'$set': {'category': 'Home'}})
+    assert (result.matched_count, result.modified_count) == (1, 0)
+
+def test_update_many_and_upsert(products):
+    assert products.update_many({'category': 'Home'}, {'$inc': {'stock': 1}}).modified_count == 2
+    result = products.update_one({'name': 'Chair'}, {'$set': {'price': 60}, '$setOnInsert': {'stock': 7}}, upsert=True)
+    assert result.upserted_id is not None
+    assert products.find_one({'name': 'Chair'}, {'_id': 0}) == {'name': 'Chair', 'price': 60, 'stock': 7}
+
+def test_find_one_and_update_returns_before_or_after(products):
+    before = products.find_one_and_update({'_id': 4}, {'$inc': {'stock': -1}})
+    after = products.find_one_and_update({'_id': 4}, {'$inc': {'stock': -1}}, return_document=ReturnDocument.AFTER)
+    assert (before['stock'], after['stock']) == (40, 38)
+    assert products.find_one_and_update({'_id': 99}, {'$inc': {'stock': 1}}) is None
+
+# Sorting and cursors
+
+def test_sort_skip_limit(products):
+    assert ids(products.find().sort('price', DESCENDING)) == [2, 3, 1, 4]
+    assert ids(products.find().sort([('category', ASCENDING), ('price', DESCENDING)])) == [2, 1, 3, 4]
+    assert ids(products.find().sort('price', ASCENDING).skip(1).limit(2)) == [1, 3]
+
+def test_sort_orders_missing_values_first(products):
+    assert ids(products.find().sort('meta.color', ASCENDING))[-1] == 3
+
+def test_cursor_is_lazy(products):
+    cursor = products.find({'category': 'Home'}).sort('price', ASCENDING)
+    products.insert_one({'_id': 5, 'category': 'Home', 'price': 1})
+    assert ids(cursor) == [5, 4, 3]
+
+def test_cursor_is_consumed_once(products):
+    cursor = products.find({'category': 'Home'})
+    assert len(list(cursor)) == 2
+    assert list(cursor) == []
+
+# Indexes
+
+def test_unique_index(products):
+    products.create_index([('name', ASCENDING)], unique=True)
+    with pytest.raises(DuplicateKeyError):
+        products.insert_one({'name': 'Mouse'})
+    with pytest.raises(DuplicateKeyError):
+        products.update_one({'_id': 2}, {'$set': {'name': 'Mouse'}})
+    assert products.find_one({'_id': 2})['name'] == 'Keyboard'
+
+def test_unique_index_rejects_existing_duplicates(products):
+    with pytest.raises(DuplicateKeyError):
+        products.create_index([('category', ASCENDING)], unique=True)
+
+def test_create_indexes_from_models(products):
+    products.create_indexes([IndexModel([('category', ASCENDING), ('price', DESCENDING)])])
+    names = [index['name'] for index in products.list_indexes()]
+    assert 'category_1_price_-1' in names
+    assert sorted(ids(products.find({'category': 'Home', 'price': {'$gt': 10}}))) == [3]
+
+def test_ttl_index_expires_documents():
+    sessions = MemoryDatabase('test').sessions
+    sessions.create_index([('expiresAt', ASCENDING)], expireAfterSeconds=0)
+    sessions.insert_many([
+        {'_id': 'old', 'expiresAt': datetime.utcnow() - timedelta(minutes=1)},
+        {'_id': 'new', 'expiresAt': datetime.utcnow() + timedelta(minutes=1)}
+    ])
+    sessions._sweep()
+    assert ids(sessions.find()) == ['new']
+
+# Bulk writes
+
+def test_bulk_write(products):
+    result = products.bulk_write([
+        InsertOne({'_id': 5, 'name': 'Desk', 'stock': 2}),
+        UpdateOne({'_id': 1}, {'$inc': {'stock': -1}}),
+        UpdateMany({'category': 'Home'}, {'$set': {'featured': True}}),
+        UpdateOne({'_id': 6}, {'$set': {'name': 'Shelf'}}, upsert=True),
+        ReplaceOne({'_id': 2}, {'name': 'Keyboard v2', 'stock': 9}),
+        DeleteOne({'category': 'Home'}),
+        DeleteMany({'stock': {'$gt': 100}})
+    ])
+    assert result.inserted_count == 1
+    assert result.matched_count == 4
+    assert result.upserted_ids == {3: 6}
+    assert result.deleted_count == 1
+    assert products.find_one({'_id': 1})['stock'] == 4
+    assert products.find_one({'_id': 2}) == {'_id': 2, 'name': 'Keyboard v2', 'stock': 9}
+    assert products.count_documents({'featured': True}) == 1
+
+def test_bulk_insert_assigns_ids(products):
+    document = {'name': 'Stool'}
+    products.bulk_write([InsertOne(document)])
+    assert products.find_one({'_id': document['_id']})['name'] == 'Stool'
+
+def test_bulk_write_errors(products):
+    products.create_index([('name', ASCENDING)], unique=True)
+    requests = [InsertOne({'name': 'Mouse'}), InsertOne({'name': 'Desk'})]
+    with pytest.raises(BulkWriteError) as ordered:
+        products.bulk_write(requests)
+    assert ordered.value.details['nInserted'] == 0
+    assert ordered.value.details['writeErrors'][0]['index'] == 0
+
+    with pytest.raises(BulkWriteError) as unordered:
+        products.bulk_write([InsertOne({'name': 'Mouse'}), InsertOne({'name': 'Chair'})], ordered=False)
+    assert unordered.value.details['nInserted'] == 1
+    assert products.count_documents({'name': 'Chair'}) == 1
+
+def test_bulk_write_rejects_other_requests(products):
+    with pytest.raises(TypeError):
+        products.bulk_write([{'insertOne': {'document': {}}}])
+
+# Atomic conditional stock update
+
+def test_conditional_stock_update_never_oversells(products):
+    """Many buyers racing for the last units, as Product.update_stock does"""
+    products.update_one({'_id': 1}, {'$set': {'stock': 10, 'sold': 0}})
+    sold = []
+
+    def buy():
+        for _ in range(5):
+            updated = products.find_one_and_update(
+                {'_id': 1, 'stock': {'$gte': 1}},
+                {'$inc': {'stock': -1, 'sold': 1}},
+                return_document=ReturnDocument.AFTER
+            )
+            if updated:
+                sold.append(updated['stock'])
+
+    buyers = [threading.Thread(target=buy) for _ in range(8)]
+    for buyer in buyers:
+        buyer.start()
+    for buyer in buyers:
+        buyer.join()
+
+    product = products.find_one({'_id': 1})
+    assert (product['stock'], product['sold']) == (0, 10)
+    assert sorted(sold) == list(range(10))
@@ -0,0 +1,132 @@
+"""
+Multi-worker Socket.IO test
+Starts two server processes sharing a message queue, connects a Socket.IO
+client to the second one and checks out through the first one. The client
+must receive its orderSuccess event through the queue.
+
+Requires MongoDB (seeded) and Redis running locally, plus:
+    pip install redis "python-socketio[client]" requests
+"""
+
+import os
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+import requests
+import socketio
+
+MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE', 'redis://localhost:6379/0')
+PORT_A = 5101
+PORT_B = 5102
+
+def start_server(port):
+    """Start a server process on the given port"""
+    env = dict(os.environ, PORT=str(port), SOCKETIO_MESSAGE_QUEUE=MESSAGE_QUEUE, NODE_ENV='production')
+    return subprocess.Popen(
+        [sys.executable, 'server.py'],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.STDOUT
+    )
+
+def wait_for_health(port, timeout=20):
+    """Wait until a server answers /health"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"http://localhost:{port}/health", timeout=1).ok:
+                return True
+        except requests.exceptions.ConnectionError:
+            pass
+        time.sleep(0.5)
+    return False
+
+def test_checkout_reaches_other_worker():
+    print("\n" + "=" * 70)
+    print("MULTI-WORKER SOCKET.IO TEST")
+    print("=" * 70)
+
+    servers = [start_server(PORT_A), start_server(PORT_B)]
+    client = socketio.Client()
+    try:
+        for port in (PORT_A, PORT_B):
+            if not wait_for_health(port):
+                print(f"❌ Server on port {port} did not start")
+                return False
+        print(f"✅ Servers running on ports {PORT_A} and {PORT_B}")
+
+        # Log in through worker A
+        base_a = f"http://localhost:{PORT_A}"
+        login = requests.post(f"{base_a}/api/auth/login", json={
+            "email": "john@example.com",
+            "password": "password123"
+        })
+        if not login.ok:
+            print(f"❌ Login failed: {login.status_code}")
+            return False
+        token = login.json()['token']
+        user_id = login.json()['user']['id']
+        headers = {"Authorization": f"Bearer {token}"}
+
+        # Connect to worker B and join the user's room
+        received = threading.Event()
+        order_events = []
+
+        @client.on('orderSuccess')
+        def on_order_success(data):
+            order_events.append(data)
+            received.set()
+
+        client.connect(f"http://localhost:{PORT_B}", transports=['websocket'])
+        client.emit('join', {'token': token})
+        time.sleep(0.5)
+        print(f"✅ Client connected to worker B and joined user_{user_id}")
+
+        # Check out through worker A
+        products = requests.get(f"{base_a}/api/products").json().get('products', [])
+        product = next((p for p in products if p['stock'] > 0), None)
+        if not product:
+            print("❌ No products in stock")
+            return False
+
+        requests.post(f"{base_a}/api/cart/add", json={"productId": product['_id'], "quantity": 1}, headers=headers)
+        checkout = requests.post(f"{base_a}/api/orders", json={
+            "paymentMethod": "card",
+            "checkoutStartTime": datetime.utcnow().isoformat() + 'Z'
+        }, headers=headers)
+        if checkout.status_code != 201:
+            print(f"❌ Checkout failed: {checkout.status_code} {checkout.text}")
+            return False
+        order_id = checkout.json()['order']['orderId']
+        print(f"✅ Order {order_id} placed through worker A")
+
+        if not received.wait(timeout=10):
+            print("❌ orderSuccess was not delivered to the client on worker B")
+            return False
+
+        if order_events[0].get('orderId') != order_id:
+            print(f"❌ Unexpected orderSuccess payload: {order_events[0]}")
+            return False
+
+        print(f"✅ orderSuccess for {order_id} delivered through worker B")
+        return True
+    finally:
+        if client.connected:
+            client.disconnect()
+        for server in servers:
+            server.terminate()
+            server.wait(timeout=10)
+
+if __name__ == '__main__':
+    try:
+        passed = test_checkout_reaches_other_worker()
+        print("\nTEST PASSED" if passed else "\nTEST FAILED")
+        sys.exit(0 if passed else 1)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,93 @@
+"""
+Query plan check for the product listing
+Runs explain() on every product listing query shape (category, inStock,
+sortBy, with and without a cursor) and on the sale scheduler queries, and
+fails when any of them is planned as a collection scan.
+
+Requires MongoDB running locally (MONGODB_URI); the database may be empty.
+"""
+
+import sys
+from datetime import datetime
+from bson import ObjectId
+from config.db import get_database
+from config.indexes import index_manager
+from models.product import Product
+
+CATEGORIES = [None, 'Electronics']
+SORTS = [None, 'price', 'sold', 'stock']
+
+def plan_stages(plan):
+    """All stage names in an explain plan tree"""
+    stages = []
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            stages.append(plan['stage'])
+        for value in plan.values():
+            stages.extend(plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(plan_stages(item))
+    return stages
+
+def cursor_position(sort_by):
+    """A listing position to page from"""
+    if sort_by is None:
+        return datetime.utcnow(), ObjectId()
+    return 0, ObjectId()
+
+def listing_queries():
+    """Every query shape the products list route can send to Mongo"""
+    for category in CATEGORIES:
+        for in_stock in (False, True):
+            for sort_by in SORTS:
+                for paged in (False, True):
+                    filters = {'isActive': {'$ne': False}}
+                    if category:
+                        filters['category'] = category
+                    if in_stock:
+                        filters['stock'] = {'$gt': 0}
+                    after = cursor_position(sort_by) if paged else None
+                    query, sort = Product.listing_query(filters, sort_by, after)
+                    name = f"category={category} inStock={in_stock} sortBy={sort_by} cursor={paged}"
+                    yield name, query, sort
+
+def scheduler_queries():
+    now = datetime.utcnow()
+    yield 'sale starting', {'isActive': False, 'deactivatedBy': 'schedule', 'saleStartTime': {'$lte': now}, 'saleEndTime': {'$gt': now}}, None
+    yield 'sale ending', {'isActive': {'$ne': False}, 'saleEndTime': {'$lte': now}}, None
+
+def count_collection_scans():
+    """Explain every query shape; returns how many scan the whole collection"""
+    # The server builds indexes in the background; build them here first
+    index_manager.ensure(get_database())
+    collection = get_database().products
+    failures = 0
+
+    for name, query, sort in list(listing_queries()) + list(scheduler_queries()):
+        cursor = collection.find(query)
+        if sort:
+            cursor = cursor.sort(sort).limit(21)
+        explain = cursor.explain()
+        stages = plan_stages(explain['queryPlanner']['winningPlan'])
+
+        if 'COLLSCAN' in stages:
+            failures += 1
+            print(f"❌ {name}: COLLSCAN")
+        elif 'SORT' in stages:
+            print(f"⚠️  {name}: in-memory SORT ({' > '.join(stages)})")
+        else:
+            print(f"✅ {name}: {' > '.join(stages)}")
+
+    if failures:
+        print(f"\n❌ {failures} queries scan the whole collection")
+    else:
+        print("\n✅ No listing query scans the whole collection")
+    return failures
+
+def test_query_plans():
+    failures = count_collection_scans()
+    assert not failures, f"{failures} queries scan the whole collection"
+
+if __name__ == '__main__':
+    sys.exit(1 if count_collection_scans() else 0)
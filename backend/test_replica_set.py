@@ -0,0 +1,193 @@
+"""
+Replica set routing test for the operation policies
+Starts a throwaway three-node replica set on local ports, points the app at
+it and records every command the models send. Checks that each operation
+class reaches the right member with the right options: checkout writes go
+to the primary with w:majority, cart writes with w:1, and analytics and
+leaderboard reads to a secondary with the configured max staleness.
+
+Requires the mongod binary on PATH (or MONGOD); nothing else may use the
+ports. Usage: python test_replica_set.py [--port 27117] [--keep]
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pymongo import MongoClient, monitoring
+
+REPLICA_SET = 'rs_policy_test'
+DATABASE = 'flash_sale_policy_test'
+
+class CommandRecorder(monitoring.CommandListener):
+    """Keeps (command name, server address, command document) of every command sent"""
+
+    def __init__(self):
+        self.commands = []
+
+    def started(self, event):
+        self.commands.append((event.command_name, event.connection_id, event.command))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def find(self, name, collection):
+        return [(address, command) for command_name, address, command in self.commands
+                if command_name == name and command.get(name) == collection]
+
+def start_replica_set(mongod, base_port, directory, processes):
+    """Start three mongod members, appending them to processes, and initiate one replica set"""
+    ports = [base_port + i for i in range(3)]
+    for port in ports:
+        path = os.path.join(directory, str(port))
+        os.makedirs(path)
+        processes.append(subprocess.Popen(
+            [mongod, '--replSet', REPLICA_SET, '--port', str(port), '--dbpath', path,
+             '--bind_ip', '127.0.0.1', '--oplogSize', '50', '--logpath', os.path.join(path, 'mongod.log')],
+            stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT
+        ))
+
+    admin = MongoClient('127.0.0.1', ports[0], directConnection=True, serverSelectionTimeoutMS=30000)
+    admin.admin.command('ping')
+    admin.admin.command('replSetInitiate', {
+        '_id': REPLICA_SET,
+        'members': [
+            # The first member always wins the election, so the test knows the primary
+            {'_id': i, 'host': f"127.0.0.1:{port}", 'priority': 2 if i == 0 else 1}
+            for i, port in enumerate(ports)
+        ]
+    })
+
+    # Wait for a primary and two secondaries
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        states = sorted(member['stateStr'] for member in admin.admin.command('replSetGetStatus')['members'])
+        if states == ['PRIMARY', 'SECONDARY', 'SECONDARY']:
+            break
+        time.sleep(0.5)
+    else:
+        raise RuntimeError('Replica set did not come up')
+    admin.close()
+    return ports
+
+def check(results, name, passed, detail=''):
+    results.append(passed)
+    print(f"{'✅' if passed else '❌'} {name}{f' ({detail})' if detail else ''}")
+
+def run_checks(ports, recorder):
+    # Import after MONGODB_URI points at the replica set
+    from config.db import get_database, start_session
+    from models.user import User
+    from models.product import Product
+    from models.cart import Cart
+    from models.rollup import OrderRollup
+    from models.order import Order
+    from datetime import datetime, timedelta
+
+    primary = ('127.0.0.1', ports[0])
+    get_database().client.drop_database(DATABASE)
+
+    user = User.create('Policy Tester', 'policy@example.com', 'password123')
+    product = Product.create({
+        'name': 'Policy Widget', 'description': 'Replica set test product', 'price': 10,
+        'originalPrice': 20, 'category': 'Test', 'image': 'https://via.placeholder.com/300', 'stock': 10,
+        'saleStartTime': datetime.utcnow() - timedelta(hours=1),
+        'saleEndTime': datetime.utcnow() + timedelta(hours=1)
+    })
+    recorder.commands.clear()
+
+    results = []
+
+    # Checkout: the order insert and stock decrement
+    Order.create(user['_id'], [{'product': product['_id'], 'quantity': 1, 'price': 10}], {}, datetime.utcnow())
+    for name, collection in [('insert', 'orders'), ('findAndModify', 'products'), ('update', 'users')]:
+        sent = recorder.find(name, collection)
+        check(results, f"checkout {name} on {collection} goes to the primary with w:majority",
+              bool(sent) and all(address == primary and command.get('writeConcern', {}).get('w') == 'majority'
+                                 for address, command in sent),
+              f"{len(sent)} sent")
+
+    # Cart: a w:1 write
+    recorder.commands.clear()
+    Cart.add_item(user['_id'], product['_id'], 1)
+    sent = recorder.find('update', 'carts') + recorder.find('insert', 'carts')
+    check(results, 'cart writes go to the primary with w:1',
+          bool(sent) and all(address == primary and command.get('writeConcern', {}).get('w') == 1
+                             for address, command in sent),
+          f"{len(sent)} sent")
+
+    # Analytics and leaderboard reads: a secondary, with max staleness
+    recorder.commands.clear()
+    OrderRollup.find_hourly_totals()
+    list(User.get_collection('leaderboard').find().sort('totalPurchases', -1).limit(10))
+    for name, collection in [('find', 'order_rollups'), ('find', 'users')]:
+        sent = recorder.find(name, collection)
+        check(results, f"{name} on {collection} goes to a secondary with maxStalenessSeconds",
+              bool(sent) and all(address != primary
+                                 and command.get('$readPreference', {}).get('mode') == 'secondaryPreferred'
+                                 and command['$readPreference'].get('maxStalenessSeconds') == 90
+                                 for address, command in sent),
+              f"{len(sent)} sent")
+
+    # Leaderboard: the rankings are read no older than the version in the tag
+    recorder.commands.clear()
+    session = start_session()
+    User.leaderboard_version('leaderboard', session)
+    list(User.get_collection('leaderboard').find(session=session).sort('totalPurchases', -1).limit(10))
+    session.end_session()
+    sent = recorder.find('find', 'users')
+    check(results, 'leaderboard rankings are read after the version\'s cluster time',
+          bool(sent) and all('afterClusterTime' in command.get('readConcern', {}) for _, command in sent))
+
+    # Everything else keeps the client defaults: primary reads, no explicit concern
+    recorder.commands.clear()
+    Cart.find_by_user(user['_id'])
+    sent = recorder.find('find', 'carts')
+    check(results, 'unclassified reads go to the primary',
+          bool(sent) and all(address == primary for address, _ in sent))
+
+    get_database().client.drop_database(DATABASE)
+    return all(results)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--port', type=int, default=27117, help='first of three consecutive ports')
+    parser.add_argument('--keep', action='store_true', help='keep the data directory')
+    args = parser.parse_args()
+
+    mongod = os.getenv('MONGOD') or shutil.which('mongod')
+    if not mongod:
+        raise SystemExit('❌ mongod not found; install MongoDB or set MONGOD')
+
+    directory = tempfile.mkdtemp(prefix='rs_policy_')
+    processes = []
+    try:
+        print(f"🚀 Starting a three-node replica set in {directory}")
+        ports = start_replica_set(mongod, args.port, directory, processes)
+
+        hosts = ','.join(f"127.0.0.1:{port}" for port in ports)
+        os.environ['MONGODB_URI'] = f"mongodb://{hosts}/{DATABASE}?replicaSet={REPLICA_SET}"
+        recorder = CommandRecorder()
+        monitoring.register(recorder)
+
+        passed = run_checks(ports, recorder)
+        print(f"\n{'✨ All routing checks passed' if passed else '❌ Routing checks failed'}")
+        return 0 if passed else 1
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+        if args.keep:
+            print(f"📁 Data kept in {directory}")
+        else:
+            shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == '__main__':
+    sys.exit(main())
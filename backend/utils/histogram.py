@@ -0,0 +1,77 @@
+from collections import defaultdict
+import math
+
+class LatencyHistogram:
+    """Mergeable streaming histogram with relative-error buckets.
+
+    Values fall into logarithmic buckets whose width grows with the value,
+    so any quantile is reported within ``relative_accuracy`` of the true
+    value (1% by default) using a few hundred buckets at most. Histograms
+    merge by adding bucket counts, which is what lets them be kept as
+    ``$inc`` counters in Mongo and summed across hours, products and
+    processes.
+    """
+
+    MIN_VALUE = 0.01
+
+    def __init__(self, relative_accuracy=0.01, counts=None):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.counts = defaultdict(int)
+        if counts:
+            for index, count in counts.items():
+                self.counts[int(index)] += count
+
+    def bucket_index(self, value):
+        """Get the bucket a value falls into"""
+        return math.ceil(math.log(max(value, self.MIN_VALUE)) / self.log_gamma)
+
+    def bucket_value(self, index):
+        """Get the representative value of a bucket"""
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def add(self, value, count=1):
+        """Record a value"""
+        self.counts[self.bucket_index(value)] += count
+
+    def merge(self, other):
+        """Add another histogram's counts into this one"""
+        for index, count in other.counts.items():
+            self.counts[index] += count
+        return self
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def quantile(self, q):
+        """Estimate the value at quantile q (0..1)"""
+        total = self.total
+        if total == 0:
+            return None
+
+        rank = q * (total - 1)
+        cumulative = 0
+        for index in sorted(self.counts):
+            cumulative += self.counts[index]
+            if cumulative > rank:
+                return self.bucket_value(index)
+        return self.bucket_value(max(self.counts))
+
+    def percentiles(self, quantiles=(0.5, 0.9, 0.99)):
+        """Get rounded percentiles keyed as p50, p90, ..."""
+        result = {}
+        for q in quantiles:
+            value = self.quantile(q)
+            result[f"p{round(q * 100):g}"] = round(value, 2) if value is not None else None
+        return result
+
+    def to_dict(self):
+        """Serialize bucket counts with string keys for storage"""
+        return {str(index): count for index, count in self.counts.items() if count}
+
+    @classmethod
+    def from_dict(cls, counts, relative_accuracy=0.01):
+        """Restore a histogram from stored bucket counts"""
+        return cls(relative_accuracy, counts)
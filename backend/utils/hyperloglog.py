@@ -0,0 +1,76 @@
+import hashlib
+import math
+
+class HyperLogLog:
+    """HyperLogLog cardinality sketch.
+
+    Uses 2**precision one-byte registers (4 KB at the default precision of
+    12, ~1.6% standard error) no matter how many values are added. Sketches
+    with the same precision merge by taking the register-wise maximum, so
+    counts from several processes or time windows can be combined.
+    """
+
+    def __init__(self, precision=12, registers=None):
+        if not 4 <= precision <= 16:
+            raise ValueError('Precision must be between 4 and 16')
+        self.precision = precision
+        self.size = 1 << precision
+        if registers is None:
+            self.registers = bytearray(self.size)
+        else:
+            if len(registers) != self.size:
+                raise ValueError('Register count does not match precision')
+            self.registers = bytearray(registers)
+
+    @staticmethod
+    def _hash(value):
+        if not isinstance(value, bytes):
+            value = str(value).encode('utf-8')
+        return int.from_bytes(hashlib.blake2b(value, digest_size=8).digest(), 'big')
+
+    def add(self, value):
+        """Add a value to the sketch"""
+        hashed = self._hash(value)
+        index = hashed >> (64 - self.precision)
+        remaining_bits = 64 - self.precision
+        remainder = hashed & ((1 << remaining_bits) - 1)
+        rank = remaining_bits - remainder.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        """Estimate the number of distinct values added"""
+        size = self.size
+        if size >= 128:
+            alpha = 0.7213 / (1 + 1.079 / size)
+        elif size == 64:
+            alpha = 0.709
+        elif size == 32:
+            alpha = 0.697
+        else:
+            alpha = 0.673
+
+        estimate = alpha * size * size / sum(2.0 ** -register for register in self.registers)
+
+        # Small range correction (linear counting)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * size and zeros:
+            estimate = size * math.log(size / zeros)
+
+        return int(round(estimate))
+
+    def merge(self, other):
+        """Merge another sketch into this one"""
+        if other.precision != self.precision:
+            raise ValueError('Cannot merge sketches with different precision')
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+        return self
+
+    def to_bytes(self):
+        """Serialize registers for storage"""
+        return bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data, precision=12):
+        """Restore a sketch from serialized registers"""
+        return cls(precision, data)
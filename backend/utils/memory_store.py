@@ -0,0 +1,1010 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from itertools import product as cartesian
+import heapq
+import threading
+import time
+from bson import ObjectId
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from pymongo.results import (
+    BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+)
+
+COMPARISONS = {
+    '$gt': lambda a, b: a > b,
+    '$gte': lambda a, b: a >= b,
+    '$lt': lambda a, b: a < b,
+    '$lte': lambda a, b: a <= b
+}
+
+EXPRESSIONS = {
+    '$add': lambda values: sum(values),
+    '$subtract': lambda values: values[0] - values[1],
+    '$multiply': lambda values: _product(values),
+    '$divide': lambda values: values[0] / values[1]
+}
+
+# How often TTL indexes are swept, like mongod's TTL monitor (but finer)
+TTL_SWEEP_SECONDS = 1
+
+MISSING = object()
+
+def _product(values):
+    result = 1
+    for value in values:
+        result *= value
+    return result
+
+def naive(value):
+    """Naive UTC datetime, as pymongo returns them"""
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def clone(value):
+    """Copy of a document: nested dicts and lists are copied, datetimes made naive"""
+    if isinstance(value, dict):
+        return {key: clone(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [clone(item) for item in value]
+    return naive(value)
+
+def sort_value(value):
+    """Key that orders values across types the way MongoDB does"""
+    if value is None:
+        return (1, 0)
+    if isinstance(value, bool):
+        return (8, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, str):
+        return (3, value)
+    if isinstance(value, dict):
+        return (4, tuple((key, sort_value(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return (5, tuple(sort_value(item) for item in value))
+    if isinstance(value, bytes):
+        return (6, value)
+    if isinstance(value, ObjectId):
+        return (7, value.binary)
+    if isinstance(value, datetime):
+        return (9, naive(value))
+    return (10, str(value))
+
+def freeze(value):
+    """Hashable form of a value for index keys and group ids"""
+    if isinstance(value, bool):
+        return ('bool', value)
+    if isinstance(value, dict):
+        return ('doc', tuple((key, freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return ('array', tuple(freeze(item) for item in value))
+    return naive(value)
+
+def equal(a, b):
+    """Equality that keeps booleans apart from numbers"""
+    return a == b and isinstance(a, bool) == isinstance(b, bool)
+
+def resolve(document, path):
+    """Values at a dotted path, descending into arrays; empty when missing"""
+    if '.' not in path:
+        return [document[path]] if path in document else []
+    values = [document]
+    for key in path.split('.'):
+        found = []
+        for value in values:
+            if isinstance(value, dict):
+                if key in value:
+                    found.append(value[key])
+            elif isinstance(value, list):
+                if key.isdigit():
+                    if int(key) < len(value):
+                        found.append(value[int(key)])
+                else:
+                    found.extend(item[key] for item in value if isinstance(item, dict) and key in item)
+        values = found
+    return values
+
+def candidates(values):
+    """Values a condition is tested against: each value and the elements of arrays"""
+    expanded = []
+    for value in values:
+        expanded.append(value)
+        if isinstance(value, list):
+            expanded.extend(value)
+    return expanded
+
+def is_operator_dict(condition):
+    return isinstance(condition, dict) and condition and all(key.startswith('$') for key in condition)
+
+def compile_query(query):
+    """Compile a filter document into a predicate over documents"""
+    if not query:
+        return lambda document: True
+    if not isinstance(query, dict):
+        query = {'_id': query}
+
+    tests = []
+    for key, condition in query.items():
+        if key in ('$or', '$and', '$nor'):
+            branches = [compile_query(branch) for branch in condition]
+            if key == '$or':
+                tests.append(lambda document, branches=branches: any(test(document) for test in branches))
+            elif key == '$and':
+                tests.append(lambda document, branches=branches: all(test(document) for test in branches))
+            else:
+                tests.append(lambda document, branches=branches: not any(test(document) for test in branches))
+        elif key.startswith('$'):
+            raise OperationFailure(f"Unsupported query operator: {key}")
+        else:
+            tests.append(compile_field(key, condition))
+
+    if len(tests) == 1:
+        return tests[0]
+    return lambda document: all(test(document) for test in tests)
+
+def compile_field(path, condition):
+    """Predicate for one field condition: a value, or operators such as $gt and $in"""
+    if not is_operator_dict(condition):
+        condition = {'$eq': condition}
+
+    tests = []
+    for operator, operand in condition.items():
+        if operator in ('$eq', '$ne'):
+            operand = clone(operand)
+        elif operator in ('$in', '$nin'):
+            operand = [clone(item) for item in operand]
+        if operator == '$eq':
+            tests.append(lambda values, operand=operand: matches_value(values, operand))
+        elif operator == '$ne':
+            tests.append(lambda values, operand=operand: not matches_value(values, operand))
+        elif operator == '$in':
+            tests.append(lambda values, operands=operand: any(matches_value(values, item) for item in operands))
+        elif operator == '$nin':
+            tests.append(lambda values, operands=operand: not any(matches_value(values, item) for item in operands))
+        elif operator in COMPARISONS:
+            compare = COMPARISONS[operator]
+            key = sort_value(operand)
+            tests.append(lambda values, compare=compare, key=key: any(
+                sort_value(value)[0] == key[0] and compare(sort_value(value), key)
+                for value in candidates(values)
+            ))
+        elif operator == '$exists':
+            tests.append(lambda values, operand=operand: bool(values) == bool(operand))
+        else:
+            raise OperationFailure(f"Unsupported query operator: {operator}")
+
+    def test(document):
+        values = resolve(document, path)
+        return all(check(values) for check in tests)
+
+    if '.' not in path and len(condition) == 1:
+        operator, operand = next(iter(condition.items()))
+        return compile_scalar(path, operator, operand, test) or test
+    return test
+
+def compile_scalar(path, operator, operand, general):
+    """Fast predicate for $eq or a comparison against a top-level scalar, or None
+
+    Documents holding an array there take the general predicate.
+    """
+    if operand is None or isinstance(operand, (bool, list, dict)):
+        return None
+    operand = naive(operand)
+
+    if operator == '$eq':
+        def test(document):
+            value = document.get(path)
+            if isinstance(value, list):
+                return general(document)
+            return value == operand and type(value) is not bool
+    elif operator in COMPARISONS:
+        compare = COMPARISONS[operator]
+        rank, key = sort_value(operand)
+
+        def test(document):
+            value = document.get(path)
+            if isinstance(value, list):
+                return general(document)
+            if value is None:
+                return False
+            value_rank, value_key = sort_value(value)
+            return value_rank == rank and compare(value_key, key)
+    else:
+        return None
+    return test
+
+def matches_value(values, operand):
+    """Equality as a query sees it: missing fields equal None, arrays match their elements"""
+    if not values:
+        return operand is None
+    return any(equal(value, operand) for value in candidates(values))
+
+def set_path(document, path, value):
+    """Set a dotted path, creating embedded documents on the way"""
+    keys = path.split('.')
+    for key in keys[:-1]:
+        if key == '$':
+            raise OperationFailure('Positional updates are not supported')
+        document = document.setdefault(key, {})
+    document[keys[-1]] = value
+
+def unset_path(document, path):
+    keys = path.split('.')
+    for key in keys[:-1]:
+        document = document.get(key)
+        if not isinstance(document, dict):
+            return
+    document.pop(keys[-1], None)
+
+def get_path(document, path, default=None):
+    """Value at a dotted path through embedded documents, or default"""
+    for key in path.split('.'):
+        if not isinstance(document, dict) or key not in document:
+            return default
+        document = document[key]
+    return document
+
+def first_value(document, path):
+    """First value at a path, or None; what sorts and expressions see"""
+    values = resolve(document, path)
+    return values[0] if values else None
+
+def apply_update(document, update, inserting=False):
+    """Apply update operators to a document in place; returns whether it changed"""
+    if not is_operator_dict(update):
+        raise OperationFailure('Update document requires $ operators')
+
+    changed = False
+    for operator, fields in update.items():
+        if operator == '$setOnInsert' and not inserting:
+            continue
+        for path, value in fields.items():
+            current = get_path(document, path, MISSING)
+            if operator in ('$set', '$setOnInsert'):
+                value = clone(value)
+                if current is not MISSING and equal(current, value):
+                    continue
+                set_path(document, path, value)
+            elif operator == '$unset':
+                if current is MISSING:
+                    continue
+                unset_path(document, path)
+            elif operator == '$inc':
+                if current is not MISSING and not value:
+                    continue
+                set_path(document, path, (0 if current is MISSING else current) + value)
+            elif operator in ('$max', '$min'):
+                value = naive(value)
+                if current is not MISSING:
+                    if operator == '$max' and sort_value(value) <= sort_value(current):
+                        continue
+                    if operator == '$min' and sort_value(value) >= sort_value(current):
+                        continue
+                set_path(document, path, value)
+            elif operator == '$push':
+                items = value['$each'] if isinstance(value, dict) and '$each' in value else [value]
+                if current is MISSING:
+                    current = []
+                    set_path(document, path, current)
+                current.extend(clone(items))
+            else:
+                raise OperationFailure(f"Unsupported update operator: {operator}")
+            changed = True
+    return changed
+
+def upsert_document(query, update, replacement=False):
+    """New document for an upsert: the filter's equality fields plus the update"""
+    document = {}
+    if isinstance(query, dict):
+        for key, condition in query.items():
+            if not key.startswith('$') and not is_operator_dict(condition):
+                set_path(document, key, clone(condition))
+            elif isinstance(condition, dict) and '$eq' in condition:
+                set_path(document, key, clone(condition['$eq']))
+    elif query is not None:
+        document['_id'] = query
+
+    if replacement:
+        document = dict({'_id': document['_id']} if '_id' in document else {}, **clone(update))
+    else:
+        apply_update(document, update, inserting=True)
+    document.setdefault('_id', ObjectId())
+    return document
+
+def project(document, projection):
+    """Copy of a document with a find projection applied"""
+    if not projection:
+        return clone(document)
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+
+    include_id = projection.get('_id', 1)
+    fields = {field.split('.')[0]: flag for field, flag in projection.items() if field != '_id'}
+    if any(fields.values()):
+        result = {key: clone(document[key]) for key in fields if key in document}
+    else:
+        result = {key: clone(value) for key, value in document.items() if key not in fields}
+    if include_id and '_id' in document:
+        result = dict({'_id': document['_id']}, **result)
+    else:
+        result.pop('_id', None)
+    return result
+
+class Reversed:
+    """Sort key wrapper that inverts the order, for descending fields"""
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+def sort_documents(documents, sort, limit=0):
+    """Documents ordered by [(field, direction), ...]; only the first limit when given"""
+    if len(sort) == 1:
+        field, direction = sort[0]
+        if direction > 0:
+            key = lambda document: sort_value(first_value(document, field))
+        else:
+            key = lambda document: Reversed(sort_value(first_value(document, field)))
+    else:
+        def key(document):
+            return tuple(
+                sort_value(first_value(document, field)) if direction > 0 else Reversed(sort_value(first_value(document, field)))
+                for field, direction in sort
+            )
+    if limit:
+        return heapq.nsmallest(limit, documents, key=key)
+    return sorted(documents, key=key)
+
+def evaluate(expression, document):
+    """Value of an aggregation expression: '$field', an operator, or a literal"""
+    if isinstance(expression, str) and expression.startswith('$'):
+        return first_value(document, expression[1:])
+    if isinstance(expression, dict):
+        if len(expression) == 1:
+            operator, operands = next(iter(expression.items()))
+            if operator.startswith('$'):
+                if operator not in EXPRESSIONS:
+                    raise OperationFailure(f"Unsupported expression operator: {operator}")
+                values = [evaluate(operand, document) for operand in (operands if isinstance(operands, list) else [operands])]
+                return None if any(value is None for value in values) else EXPRESSIONS[operator](values)
+        return {key: evaluate(value, document) for key, value in expression.items()}
+    if isinstance(expression, list):
+        return [evaluate(item, document) for item in expression]
+    return expression
+
+def accumulate(operator, values):
+    """Result of a $group accumulator over the values of one group"""
+    if operator in ('$sum', '$avg'):
+        numbers = [value for value in values if isinstance(value, (int, float)) and not isinstance(value, bool)]
+        if operator == '$sum':
+            return sum(numbers)
+        return sum(numbers) / len(numbers) if numbers else None
+    if operator in ('$min', '$max'):
+        present = [value for value in values if value is not None]
+        if not present:
+            return None
+        return (min if operator == '$min' else max)(present, key=sort_value)
+    if operator == '$first':
+        return values[0] if values else None
+    if operator == '$last':
+        return values[-1] if values else None
+    if operator == '$push':
+        return values
+    if operator == '$addToSet':
+        return list({freeze(value): value for value in values}.values())
+    raise OperationFailure(f"Unsupported accumulator: {operator}")
+
+def unwind(documents, spec):
+    path = spec if isinstance(spec, str) else spec['path']
+    keep_empty = isinstance(spec, dict) and spec.get('preserveNullAndEmptyArrays', False)
+    field = path[1:]
+    for document in documents:
+        value = get_path(document, field, MISSING)
+        if isinstance(value, list) and value:
+            for item in value:
+                unwound = clone(document) if '.' in field else dict(document)
+                set_path(unwound, field, item)
+                yield unwound
+        elif value is MISSING or value is None or value == []:
+            if keep_empty:
+                yield document
+        else:
+            yield document
+
+def group(documents, spec):
+    accumulators = {field: next(iter(accumulator.items())) for field, accumulator in spec.items() if field != '_id'}
+    groups = {}
+    for document in documents:
+        key = evaluate(spec['_id'], document)
+        entry = groups.get(freeze(key))
+        if entry is None:
+            entry = groups[freeze(key)] = (key, {field: [] for field in accumulators})
+        for field, (_, expression) in accumulators.items():
+            entry[1][field].append(evaluate(expression, document))
+    return [
+        dict({'_id': key}, **{field: accumulate(accumulators[field][0], values[field]) for field in accumulators})
+        for key, values in groups.values()
+    ]
+
+def project_stage(documents, spec):
+    if all(value in (0, False) for value in spec.values()):
+        return [project(document, spec) for document in documents]
+    results = []
+    for document in documents:
+        result = {'_id': document.get('_id')} if spec.get('_id', 1) not in (0, False) else {}
+        for field, value in spec.items():
+            if field == '_id' and value in (0, 1, True, False):
+                continue
+            if value in (1, True):
+                if field in document:
+                    result[field] = document[field]
+            else:
+                result[field] = evaluate(value, document)
+        results.append(result)
+    return results
+
+def run_pipeline(documents, pipeline):
+    """Run aggregation stages over documents already copied out of the store"""
+    for stage in pipeline:
+        (name, spec), = stage.items()
+        if name == '$match':
+            test = compile_query(spec)
+            documents = [document for document in documents if test(document)]
+        elif name == '$unwind':
+            documents = list(unwind(documents, spec))
+        elif name == '$group':
+            documents = group(documents, spec)
+        elif name == '$sort':
+            documents = sort_documents(documents, list(spec.items()))
+        elif name == '$skip':
+            documents = documents[spec:]
+        elif name == '$limit':
+            documents = documents[:spec]
+        elif name == '$project':
+            documents = project_stage(documents, spec)
+        elif name == '$count':
+            documents = [{spec: len(documents)}]
+        else:
+            raise OperationFailure(f"Unsupported pipeline stage: {name}")
+    return documents
+
+def normalize_sort(key_or_list, direction=None):
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction or 1)]
+    if isinstance(key_or_list, dict):
+        return list(key_or_list.items())
+    return [(key, value) for key, value in key_or_list]
+
+class MemoryIndex:
+    """Secondary index: every key prefix maps to the set of document ids.
+
+    Array values index each element (a multikey index). Lookups serve
+    equality and $in conditions on a leading run of the indexed fields;
+    unique indexes reject a second document with the same full key.
+    """
+
+    def __init__(self, name, keys, unique=False, expire_after=None):
+        self.name = name
+        self.keys = keys
+        self.fields = [field for field, _ in keys]
+        self.unique = unique
+        self.expire_after = expire_after
+        self.prefixes = [defaultdict(set) for _ in self.fields]
+
+    def document_keys(self, document):
+        """Full index keys of a document; several when a field holds an array"""
+        per_field = []
+        for field in self.fields:
+            values = resolve(document, field)
+            if not values:
+                per_field.append([None])
+                continue
+            expanded = []
+            for value in values:
+                if isinstance(value, list) and value:
+                    expanded.extend(freeze(item) for item in value)
+                else:
+                    expanded.append(freeze(value))
+            per_field.append(expanded)
+        return set(cartesian(*per_field))
+
+    def add(self, doc_id, keys):
+        for key in keys:
+            for length, entries in enumerate(self.prefixes, 1):
+                entries[key[:length]].add(doc_id)
+
+    def remove(self, doc_id, keys):
+        for key in keys:
+            for length, entries in enumerate(self.prefixes, 1):
+                ids = entries.get(key[:length])
+                if ids is not None:
+                    ids.discard(doc_id)
+                    if not ids:
+                        del entries[key[:length]]
+
+    def conflict(self, doc_id, keys):
+        """Full key already held by another document, if any"""
+        if not self.unique:
+            return None
+        entries = self.prefixes[-1]
+        for key in keys:
+            if entries.get(key, set()) - {doc_id}:
+                return key
+        return None
+
+    def lookup(self, query):
+        """Ids that may match a query, or None when the index cannot narrow it"""
+        choices = []
+        for field in self.fields:
+            condition = query.get(field)
+            if field not in query or isinstance(condition, (list, dict)) and not is_operator_dict(condition):
+                break
+            if not is_operator_dict(condition):
+                choices.append([freeze(condition)])
+            elif set(condition) == {'$eq'} and not isinstance(condition['$eq'], (list, dict)):
+                choices.append([freeze(condition['$eq'])])
+            elif set(condition) == {'$in'} and not any(isinstance(item, (list, dict)) for item in condition['$in']):
+                choices.append([freeze(item) for item in condition['$in']])
+            else:
+                break
+        if not choices:
+            return None
+
+        entries = self.prefixes[len(choices) - 1]
+        ids = set()
+        for key in cartesian(*choices):
+            ids |= entries.get(key, set())
+        return ids
+
+    def describe(self):
+        """The index the way list_indexes reports it"""
+        spec = {'v': 2, 'key': dict(self.keys), 'name': self.name}
+        if self.unique:
+            spec['unique'] = True
+        if self.expire_after is not None:
+            spec['expireAfterSeconds'] = self.expire_after
+        return spec
+
+class MemoryCursor:
+    """Lazy find() result supporting sort, skip, limit and batch_size"""
+
+    def __init__(self, collection, query, projection):
+        self._collection = collection
+        self._query = query
+        self._projection = projection
+        self._sort = None
+        self._skip = 0
+        self._limit = 0
+        self._results = None
+
+    def sort(self, key_or_list, direction=None):
+        self._sort = normalize_sort(key_or_list, direction)
+        return self
+
+    def skip(self, count):
+        self._skip = count
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._results is None:
+            self._results = iter(self._collection._select(
+                self._query, self._projection, self._sort, self._skip, self._limit
+            ))
+        return next(self._results)
+
+def bulk_operation(request):
+    """A pymongo write model (InsertOne, UpdateOne, ...) as an operation for MemoryCollection._bulk
+
+    Dispatches on the public model classes. pymongo has no public
+    accessors for a model's arguments, so they are read from the
+    attributes its constructors keep them in (the ones the models' __eq__
+    compares), not through pymongo's bulk-building internals.
+    """
+    if isinstance(request, InsertOne):
+        document = request._doc
+        document.setdefault('_id', ObjectId())
+        return ('insert', document)
+    if isinstance(request, (UpdateOne, UpdateMany)):
+        return ('update', request._filter, request._doc, isinstance(request, UpdateMany), bool(request._upsert))
+    if isinstance(request, ReplaceOne):
+        return ('replace', request._filter, request._doc, bool(request._upsert))
+    if isinstance(request, (DeleteOne, DeleteMany)):
+        return ('delete', request._filter, 1 if isinstance(request, DeleteOne) else 0)
+    raise TypeError(f"{request!r} is not a valid request")
+
+class MemoryCollection:
+    """In-memory collection with the pymongo Collection methods the models use.
+
+    Documents live in a dict keyed by _id and are copied in and out, so
+    callers never share state with the store. Filters use the _id, then
+    the narrowest secondary index lookup, and only then scan. Every
+    operation holds the collection lock, which makes conditional updates
+    such as find_one_and_update on {'stock': {'$gte': n}} atomic.
+    """
+
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+        self.full_name = f"{database.name}.{name}"
+        self._lock = threading.RLock()
+        self._documents = {}
+        self._keys = {}
+        self._indexes = {}
+        self._swept_at = 0
+
+    def with_options(self, **options):
+        """Read preferences and write concerns mean nothing in one process"""
+        return self
+
+    # Indexes
+
+    def create_index(self, keys, unique=False, expireAfterSeconds=None, name=None, **kwargs):
+        keys = normalize_sort(keys)
+        name = name or '_'.join(f"{field}_{direction}" for field, direction in keys)
+        with self._lock:
+            if name in self._indexes:
+                return name
+            index = MemoryIndex(name, keys, unique=unique, expire_after=expireAfterSeconds)
+            keys_by_id = {}
+            for doc_id, document in self._documents.items():
+                keys_by_id[doc_id] = index.document_keys(document)
+                if index.conflict(doc_id, keys_by_id[doc_id]):
+                    raise DuplicateKeyError(f"E11000 duplicate key error building index {name}", 11000)
+                index.add(doc_id, keys_by_id[doc_id])
+            self._indexes[name] = index
+            for doc_id, index_keys in keys_by_id.items():
+                self._keys[doc_id][name] = index_keys
+            return name
+
+    def create_indexes(self, indexes):
+        """Create each IndexModel; returns their names"""
+        return [
+            self.create_index(
+                list(index.document['key'].items()),
+                unique=index.document.get('unique', False),
+                expireAfterSeconds=index.document.get('expireAfterSeconds'),
+                name=index.document['name']
+            )
+            for index in indexes
+        ]
+
+    def list_indexes(self):
+        with self._lock:
+            specs = [{'v': 2, 'key': {'_id': 1}, 'name': '_id_'}]
+            return iter(specs + [index.describe() for index in self._indexes.values()])
+
+    def drop_index(self, name):
+        with self._lock:
+            if self._indexes.pop(name, None) is None:
+                raise OperationFailure(f"index not found with name [{name}]")
+            for keys in self._keys.values():
+                keys.pop(name, None)
+
+    # Storage primitives, called with the lock held
+
+    def _index_keys(self, document):
+        return {name: index.document_keys(document) for name, index in self._indexes.items()}
+
+    def _check_unique(self, doc_id, keys):
+        for name, index in self._indexes.items():
+            key = index.conflict(doc_id, keys[name])
+            if key is not None:
+                raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.full_name} index: {name} dup key: {key}", 11000)
+
+    def _store(self, document):
+        doc_id = document['_id']
+        old_keys = self._keys.get(doc_id)
+        keys = self._index_keys(document)
+        self._check_unique(doc_id, keys)
+        if old_keys is not None:
+            for name, index in self._indexes.items():
+                index.remove(doc_id, old_keys[name])
+        for name, index in self._indexes.items():
+            index.add(doc_id, keys[name])
+        self._documents[doc_id] = document
+        self._keys[doc_id] = keys
+
+    def _insert(self, document):
+        document.setdefault('_id', ObjectId())
+        doc_id = document['_id']
+        if doc_id in self._documents:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.full_name} index: _id_ dup key: {doc_id}", 11000)
+        self._store(clone(document))
+        return doc_id
+
+    def _delete(self, doc_id):
+        keys = self._keys.pop(doc_id)
+        for name, index in self._indexes.items():
+            index.remove(doc_id, keys[name])
+        del self._documents[doc_id]
+
+    def _sweep(self):
+        """Delete documents past a TTL index's expiry, at most once a second"""
+        now = time.monotonic()
+        if now - self._swept_at < TTL_SWEEP_SECONDS:
+            return
+        self._swept_at = now
+        for index in self._indexes.values():
+            if index.expire_after is None:
+                continue
+            cutoff = datetime.utcnow() - timedelta(seconds=index.expire_after)
+            expired = [
+                doc_id for doc_id, document in self._documents.items()
+                if isinstance(get_path(document, index.fields[0]), datetime) and get_path(document, index.fields[0]) <= cutoff
+            ]
+            for doc_id in expired:
+                self._delete(doc_id)
+
+    def _candidate_ids(self, query):
+        """Ids worth testing: from the _id, the narrowest index lookup, or all"""
+        if not query:
+            return self._documents.keys()
+        if not isinstance(query, dict):
+            return [query] if query in self._documents else []
+
+        condition = query.get('_id')
+        if '_id' in query and not isinstance(condition, (list, dict)):
+            return [condition] if condition in self._documents else []
+        if is_operator_dict(condition) and set(condition) == {'$in'}:
+            return [doc_id for doc_id in dict.fromkeys(condition['$in']) if doc_id in self._documents]
+
+        best = None
+        for index in self._indexes.values():
+            ids = index.lookup(query)
+            if ids is not None and (best is None or len(ids) < len(best)):
+                best = ids
+        return self._documents.keys() if best is None else best
+
+    def _matching(self, query, limit=0):
+        """Stored documents matching a filter, stopping after limit
+
+        Scans run in insertion order; index lookups in no particular order,
+        as with MongoDB, so callers that need an order sort.
+        """
+        self._sweep()
+        test = compile_query(query)
+        ids = self._candidate_ids(query)
+
+        documents = self._documents
+        matched = []
+        for doc_id in ids:
+            document = documents[doc_id]
+            if test(document):
+                matched.append(document)
+                if len(matched) == limit:
+                    break
+        return matched
+
+    def _select(self, query, projection=None, sort=None, skip=0, limit=0):
+        with self._lock:
+            end = skip + limit if limit else 0
+            if sort:
+                documents = sort_documents(self._matching(query), sort, end)
+            else:
+                documents = self._matching(query, end)
+            return [project(document, projection) for document in documents[skip:]]
+
+    # Reads
+
+    def find(self, filter=None, projection=None, sort=None, skip=0, limit=0, **kwargs):
+        cursor = MemoryCursor(self, filter, projection)
+        if sort:
+            cursor.sort(sort)
+        return cursor.skip(skip).limit(limit)
+
+    def find_one(self, filter=None, projection=None, sort=None, **kwargs):
+        results = self._select(filter, projection, normalize_sort(sort) if sort else None, limit=1)
+        return results[0] if results else None
+
+    def count_documents(self, filter, **kwargs):
+        with self._lock:
+            return len(self._matching(filter))
+
+    def estimated_document_count(self, **kwargs):
+        with self._lock:
+            return len(self._documents)
+
+    def distinct(self, key, filter=None):
+        with self._lock:
+            values = {}
+            for document in self._matching(filter):
+                for value in candidates(resolve(document, key)):
+                    if not isinstance(value, list):
+                        values.setdefault(freeze(value), value)
+            return [clone(value) for value in values.values()]
+
+    def aggregate(self, pipeline, **kwargs):
+        # A leading $match is served like a find, through the indexes
+        query = {}
+        if pipeline and '$match' in pipeline[0]:
+            query, pipeline = pipeline[0]['$match'], pipeline[1:]
+        with self._lock:
+            documents = [clone(document) for document in self._matching(query)]
+        return iter(run_pipeline(documents, pipeline))
+
+    # Writes
+
+    def insert_one(self, document, **kwargs):
+        with self._lock:
+            return InsertOneResult(self._insert(document), True)
+
+    def insert_many(self, documents, ordered=True, **kwargs):
+        operations = [bulk_operation(InsertOne(document)) for document in documents]
+        self._bulk(operations, ordered)
+        return InsertManyResult([operation[1]['_id'] for operation in operations], True)
+
+    def _update(self, query, update, multi=False, upsert=False, replacement=False):
+        """Returns (matched, modified, upserted id)"""
+        matched = self._matching(query, 0 if multi else 1)
+
+        modified = 0
+        for document in matched:
+            if replacement:
+                updated = dict(clone(update), _id=document['_id'])
+                changed = updated != document
+            else:
+                updated = clone(document)
+                changed = apply_update(updated, update)
+            if changed:
+                self._store(updated)
+                modified += 1
+
+        if not matched and upsert:
+            document = upsert_document(query, update, replacement)
+            self._insert(document)
+            return 0, 0, document['_id']
+        return len(matched), modified, None
+
+    def update_one(self, filter, update, upsert=False, **kwargs):
+        with self._lock:
+            matched, modified, upserted = self._update(filter, update, upsert=upsert)
+        return UpdateResult(self._raw_update(matched, modified, upserted), True)
+
+    def update_many(self, filter, update, upsert=False, **kwargs):
+        with self._lock:
+            matched, modified, upserted = self._update(filter, update, multi=True, upsert=upsert)
+        return UpdateResult(self._raw_update(matched, modified, upserted), True)
+
+    def replace_one(self, filter, replacement, upsert=False, **kwargs):
+        with self._lock:
+            matched, modified, upserted = self._update(filter, replacement, upsert=upsert, replacement=True)
+        return UpdateResult(self._raw_update(matched, modified, upserted), True)
+
+    @staticmethod
+    def _raw_update(matched, modified, upserted):
+        raw = {'n': matched + (1 if upserted is not None else 0), 'nModified': modified, 'ok': 1.0}
+        if upserted is not None:
+            raw['upserted'] = upserted
+        return raw
+
+    def find_one_and_update(self, filter, update, projection=None, sort=None, upsert=False, return_document=False, **kwargs):
+        with self._lock:
+            if sort:
+                matched = sort_documents(self._matching(filter), normalize_sort(sort), 1)
+            else:
+                matched = self._matching(filter, 1)
+            if not matched:
+                if not upsert:
+                    return None
+                document = upsert_document(filter, update)
+                self._insert(document)
+                return project(self._documents[document['_id']], projection) if return_document else None
+
+            before = matched[0]
+            updated = clone(before)
+            if apply_update(updated, update):
+                self._store(updated)
+            return project(updated if return_document else before, projection)
+
+    def delete_one(self, filter, **kwargs):
+        with self._lock:
+            matched = self._matching(filter, 1)
+            for document in matched:
+                self._delete(document['_id'])
+        return DeleteResult({'n': len(matched), 'ok': 1.0}, True)
+
+    def delete_many(self, filter, **kwargs):
+        with self._lock:
+            matched = self._matching(filter)
+            for document in matched:
+                self._delete(document['_id'])
+        return DeleteResult({'n': len(matched), 'ok': 1.0}, True)
+
+    def bulk_write(self, requests, ordered=True, **kwargs):
+        operations = [bulk_operation(request) for request in requests]
+        return BulkWriteResult(self._bulk(operations, ordered), True)
+
+    def _bulk(self, operations, ordered):
+        """Run collected operations; raises BulkWriteError like pymongo on failures"""
+        result = {'nInserted': 0, 'nMatched': 0, 'nModified': 0, 'nUpserted': 0, 'nRemoved': 0,
+                  'upserted': [], 'writeErrors': [], 'writeConcernErrors': []}
+        with self._lock:
+            for position, operation in enumerate(operations):
+                kind = operation[0]
+                try:
+                    if kind == 'insert':
+                        self._insert(operation[1])
+                        result['nInserted'] += 1
+                    elif kind == 'delete':
+                        for document in self._matching(operation[1], operation[2]):
+                            self._delete(document['_id'])
+                            result['nRemoved'] += 1
+                    else:
+                        if kind == 'update':
+                            _, query, update, multi, upsert = operation
+                            matched, modified, upserted = self._update(query, update, multi=multi, upsert=upsert)
+                        else:
+                            _, query, update, upsert = operation
+                            matched, modified, upserted = self._update(query, update, upsert=upsert, replacement=True)
+                        result['nMatched'] += matched
+                        result['nModified'] += modified
+                        if upserted is not None:
+                            result['nUpserted'] += 1
+                            result['upserted'].append({'index': position, '_id': upserted})
+                except (DuplicateKeyError, OperationFailure) as e:
+                    result['writeErrors'].append({'index': position, 'code': e.code or 2, 'errmsg': str(e), 'op': operation[1]})
+                    if ordered:
+                        break
+        if result['writeErrors']:
+            raise BulkWriteError(result)
+        return result
+
+    def drop(self):
+        with self._lock:
+            self._documents.clear()
+            self._keys.clear()
+            self._indexes.clear()
+
+class MemoryDatabase:
+    """A database of MemoryCollections, created on first use like MongoDB's"""
+
+    def __init__(self, name='flash_sale'):
+        self.name = name
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name):
+        collection = self._collections.get(name)
+        if collection is None:
+            with self._lock:
+                collection = self._collections.setdefault(name, MemoryCollection(self, name))
+        return collection
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
+
+    def get_collection(self, name, **options):
+        return self[name]
+
+    def list_collection_names(self):
+        return [name for name, collection in self._collections.items() if collection._documents or collection._indexes]
+
+    def drop_collection(self, name):
+        collection = self._collections.pop(name, None)
+        if collection is not None:
+            collection.drop()
+
+    def command(self, command, *args, **kwargs):
+        if command in ('ping', {'ping': 1}):
+            return {'ok': 1.0}
+        raise OperationFailure(f"Unsupported command: {command}")
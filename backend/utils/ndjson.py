@@ -0,0 +1,37 @@
+from itertools import islice
+import json
+
+def read_rows(stream):
+    """Parse an NDJSON stream line by line.
+
+    Yields (line number, row, error) for every non-blank line; row is None
+    when the line is not a JSON object, and error says why.
+    """
+    for number, line in enumerate(stream, 1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield number, None, 'Each line must be a JSON object'
+            continue
+        yield number, row, None
+
+def chunked(iterable, size):
+    """Split an iterable into lists of at most size items"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def dumps_lines(rows):
+    """Encode rows as NDJSON text"""
+    return ''.join(json.dumps(row, separators=(',', ':')) + '\n' for row in rows)
@@ -0,0 +1,363 @@
+from array import array
+from collections import OrderedDict
+from functools import reduce
+from itertools import islice
+from operator import and_
+import bisect
+import sys
+import threading
+import re
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+# Postings of more documents than this are kept as bitmaps instead of
+# arrays of document numbers
+DENSE_POSTINGS = 256
+
+# New terms wait in a short sorted list until this many, then merge into
+# the main one
+PENDING_TERMS = 256
+
+def tokenize(text):
+    """Lowercase word tokens of a text"""
+    if not text:
+        return []
+    return TOKEN_PATTERN.findall(str(text).lower())
+
+# Sparse postings unions up to this many documents are built bit by bit;
+# larger ones through one bytearray
+SHIFTED_POSTINGS = 32
+
+class Bitmap(bytearray):
+    """bytearray bitmap of document numbers that counts them and keeps its
+    int form until it next changes"""
+
+    def __init__(self, numbers=()):
+        super().__init__()
+        self.size = 0
+        self._bits = None
+        for number in numbers:
+            self.add(number)
+
+    def add(self, number):
+        index = number >> 3
+        if index >= len(self):
+            self.extend(bytes(index + 1 - len(self)))
+        bit = 1 << (number & 7)
+        if not self[index] & bit:
+            self[index] |= bit
+            self.size += 1
+            self._bits = None
+
+    def discard(self, number):
+        index = number >> 3
+        bit = 1 << (number & 7)
+        if index < len(self) and self[index] & bit:
+            self[index] ^= bit
+            self.size -= 1
+            self._bits = None
+
+    def bits(self):
+        """The bitmap as an int"""
+        if self._bits is None:
+            self._bits = int.from_bytes(self, 'little')
+        return self._bits
+
+def iter_bits(bits):
+    """Set bit positions of an int bitmap, lowest first"""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+def intersect(bitmaps):
+    """Intersection of int bitmaps"""
+    return reduce(and_, bitmaps) if bitmaps else 0
+
+class SearchIndex:
+    """In-memory inverted index with prefix matching and facet counts.
+
+    Documents get small integer numbers, and each field keeps its own
+    postings: term -> document numbers, as an array while there are at
+    most DENSE_POSTINGS of them and as a Bitmap after that. The
+    facet (category) is searchable too, through one bitmap per facet
+    value; those bitmaps also give the facet counts. Queries turn postings
+    into int bitmaps, so unions, intersections and counts are C-level
+    bitwise operations however many documents match.
+
+    Terms are kept sorted, so a query token of min_prefix characters or
+    more also matches, by bisect, up to max_expansions words it prefixes.
+    New terms are merged into the sorted list PENDING_TERMS at a time;
+    terms left without postings are skipped, and dropped at a merge once
+    they are a quarter of the list.
+    A document matches when every token matches one of its fields.
+    Results are ranked in tiers: every token a whole word of the name,
+    then a prefix of the name, then the name or facet, then anywhere.
+    Adding a document again replaces it, which keeps updates incremental.
+    The last cache_size results are kept until the index next changes.
+    """
+
+    def __init__(self, fields, facet_field, min_prefix=2, max_expansions=64, cache_size=1024):
+        self.fields = fields
+        self.facet_field = facet_field
+        self.min_prefix = min_prefix
+        self.max_expansions = max_expansions
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self.clear()
+
+    def __len__(self):
+        return len(self._numbers)
+
+    def clear(self):
+        self._results = OrderedDict()
+        self._postings = {field: {} for field in self.fields}
+        self._terms = []
+        self._pending_terms = []
+        self._dead_terms = 0
+        self._facets = {}
+        self._facet_terms = {}
+        self._numbers = {}
+        self._ids = []
+        self._free = []
+        self._docs = {}
+
+    def add(self, doc_id, document):
+        """Index or re-index a document from its fields"""
+        # Interned, so every document holding a word shares one string
+        terms = tuple(
+            tuple(sys.intern(term) for term in dict.fromkeys(tokenize(document.get(field))))
+            for field in self.fields
+        )
+        facet = document.get(self.facet_field)
+
+        with self._lock:
+            self._results.clear()
+            number = self._numbers.get(doc_id)
+            if number is None:
+                number = self._free.pop() if self._free else len(self._ids)
+                if number == len(self._ids):
+                    self._ids.append(doc_id)
+                else:
+                    self._ids[number] = doc_id
+                self._numbers[doc_id] = number
+            else:
+                self._unindex(number)
+
+            for field, field_terms in zip(self.fields, terms):
+                postings = self._postings[field]
+                for term in field_terms:
+                    docs = postings.get(term)
+                    if docs is None:
+                        docs = postings[term] = array('I')
+                        self._add_term(term)
+                    if isinstance(docs, array):
+                        docs.append(number)
+                        if len(docs) > DENSE_POSTINGS:
+                            postings[term] = Bitmap(docs)
+                    else:
+                        docs.add(number)
+
+            docs = self._facets.get(facet)
+            if docs is None:
+                docs = self._facets[facet] = Bitmap()
+                for term in tokenize(facet):
+                    self._facet_terms.setdefault(term, set()).add(facet)
+            docs.add(number)
+            self._docs[number] = (terms, facet)
+
+    def remove(self, doc_id):
+        """Drop a document if indexed"""
+        with self._lock:
+            number = self._numbers.pop(doc_id, None)
+            if number is not None:
+                self._results.clear()
+                self._unindex(number)
+                self._ids[number] = None
+                self._free.append(number)
+
+    def _unindex(self, number):
+        terms, facet = self._docs.pop(number)
+        for field, field_terms in zip(self.fields, terms):
+            postings = self._postings[field]
+            for term in field_terms:
+                docs = postings[term]
+                if isinstance(docs, array):
+                    docs.remove(number)
+                    empty = not docs
+                else:
+                    docs.discard(number)
+                    empty = not docs.size
+                if empty:
+                    del postings[term]
+                    if not self._indexed(term):
+                        self._dead_terms += 1
+
+        docs = self._facets[facet]
+        docs.discard(number)
+        if not docs.size:
+            del self._facets[facet]
+            for term in tokenize(facet):
+                self._facet_terms[term].discard(facet)
+                if not self._facet_terms[term]:
+                    del self._facet_terms[term]
+
+    def _indexed(self, term):
+        return any(term in postings for postings in self._postings.values())
+
+    def _add_term(self, term):
+        for terms in (self._terms, self._pending_terms):
+            position = bisect.bisect_left(terms, term)
+            if position < len(terms) and terms[position] == term:
+                return
+        bisect.insort(self._pending_terms, term)
+        if len(self._pending_terms) > PENDING_TERMS:
+            terms = self._terms
+            if self._dead_terms > len(terms) // 4:
+                terms = [term for term in terms if self._indexed(term)]
+                self._dead_terms = 0
+            # Two sorted runs: the sort merges them in linear time
+            terms.extend(self._pending_terms)
+            terms.sort()
+            self._terms = terms
+            self._pending_terms = []
+
+    def _prefixed(self, terms, token):
+        """Indexed words of a sorted list that token prefixes, up to max_expansions"""
+        position = bisect.bisect_left(terms, token)
+        expanded = []
+        while position < len(terms) and len(expanded) < self.max_expansions and terms[position].startswith(token):
+            if self._indexed(terms[position]):
+                expanded.append(terms[position])
+            position += 1
+        return expanded
+
+    def _expand(self, token):
+        """Indexed words token matches: itself, and up to max_expansions words it prefixes"""
+        if len(token) < self.min_prefix:
+            return [token]
+        expanded = self._prefixed(self._terms, token)
+        pending = self._prefixed(self._pending_terms, token)
+        if pending:
+            expanded = sorted(expanded + pending)[:self.max_expansions]
+        return expanded
+
+    def _bits(self, postings):
+        """Union of postings (arrays, Bitmaps or None) as an int bitmap"""
+        bits = 0
+        sparse = []
+        for docs in postings:
+            if docs is None:
+                continue
+            if isinstance(docs, array):
+                sparse.append(docs)
+            else:
+                bits |= docs.bits()
+        if sum(len(docs) for docs in sparse) <= SHIFTED_POSTINGS:
+            for docs in sparse:
+                for number in docs:
+                    bits |= 1 << number
+        else:
+            bitmap = bytearray((len(self._ids) >> 3) + 1)
+            for docs in sparse:
+                for number in docs:
+                    bitmap[number >> 3] |= 1 << (number & 7)
+            bits |= int.from_bytes(bitmap, 'little')
+        return bits
+
+    def _token_matches(self, token):
+        """Bitmaps for one token: (name word, name prefix, name or facet, anywhere)"""
+        name_field = self.fields[0]
+        expanded = self._expand(token)
+        by_field = {
+            field: self._bits(postings.get(term) for term in expanded)
+            for field, postings in self._postings.items()
+        }
+        if len(token) < self.min_prefix:
+            facets = self._facet_terms.get(token, ())
+        else:
+            facets = {facet for term, values in self._facet_terms.items() if term.startswith(token) for facet in values}
+        facet_docs = self._bits(self._facets[facet] for facet in facets)
+
+        name_or_facet = by_field[name_field] | facet_docs
+        anywhere = name_or_facet
+        for field, docs in by_field.items():
+            if field != name_field:
+                anywhere |= docs
+        return (
+            self._bits([self._postings[name_field].get(token)]),
+            by_field[name_field],
+            name_or_facet,
+            anywhere
+        )
+
+    def _count_facets(self, matches):
+        """Matches per facet value, one popcount per facet"""
+        counts = {}
+        for facet, docs in self._facets.items():
+            count = (matches & docs.bits()).bit_count()
+            if count:
+                counts[facet] = count
+        return counts
+
+    def search(self, query, limit=20, facet=None):
+        """Search documents; returns (doc ids best first, facet counts, total).
+
+        Facet counts cover every match; facet narrows the results and the
+        total to one facet value.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return [], {}, 0
+
+        key = (tuple(tokens), facet, limit)
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None:
+                self._results.move_to_end(key)
+                return cached
+
+            result = self._search(tokens, limit, facet)
+            self._results[key] = result
+            if len(self._results) > self.cache_size:
+                self._results.popitem(last=False)
+            return result
+
+    def _search(self, tokens, limit, facet):
+        """Uncached search over token bitmaps"""
+        per_token = [self._token_matches(token) for token in tokens]
+        matches = intersect([token_matches[-1] for token_matches in per_token])
+        if not matches:
+            return [], {}, 0
+        facets = self._count_facets(matches)
+
+        if facet is not None:
+            facet_docs = self._facets.get(facet)
+            matches &= facet_docs.bits() if facet_docs is not None else 0
+
+        # Narrower tiers are only intersected while results are short
+        results = []
+        seen = 0
+        for tier in range(4):
+            docs = matches if tier == 3 else intersect([token_matches[tier] for token_matches in per_token]) & matches
+            for number in islice(iter_bits(docs & ~seen), limit - len(results)):
+                seen |= 1 << number
+                results.append(self._ids[number])
+            if len(results) >= limit:
+                break
+        return results, facets, matches.bit_count()
+
+    def stats(self):
+        """Document and term counts plus the approximate memory footprint in bytes"""
+        with self._lock:
+            terms = [term for term in self._terms + self._pending_terms if self._indexed(term)]
+            size = sys.getsizeof(self._terms) + sys.getsizeof(self._pending_terms)
+            size += sys.getsizeof(self._ids) + sys.getsizeof(self._numbers)
+            size += sum(sys.getsizeof(term) for term in terms)
+            for postings in self._postings.values():
+                size += sys.getsizeof(postings) + sum(sys.getsizeof(docs) for docs in postings.values())
+            size += sum(sys.getsizeof(docs) for docs in self._facets.values())
+            size += sys.getsizeof(self._docs)
+            for fields, _ in self._docs.values():
+                size += sys.getsizeof(fields) + sum(sys.getsizeof(field_terms) for field_terms in fields)
+            return {'documents': len(self._numbers), 'terms': len(terms), 'bytes': size}
@@ -0,0 +1,47 @@
+import math
+
+class TimerWheel:
+    """Hashed timing wheel with O(1) schedule and cancel.
+
+    Time is cut into ticks of ``tick`` seconds hashed onto a fixed ring of
+    slots. A timer lives in the slot of its deadline tick; timers more than
+    one turn away share the slot and are skipped until their tick comes up.
+    Timers never fire early: a deadline is rounded up to the next tick.
+    """
+
+    def __init__(self, tick=1.0, slots=3600, now=0):
+        self.tick = tick
+        self.slots = [{} for _ in range(slots)]
+        self.current = int(now // tick)
+        self._timers = {}
+
+    def __len__(self):
+        return len(self._timers)
+
+    def schedule(self, key, when, value=None):
+        """Fire key at epoch seconds when, replacing any timer it had"""
+        self.cancel(key)
+        deadline = max(math.ceil(when / self.tick), self.current + 1)
+        slot = deadline % len(self.slots)
+        self.slots[slot][key] = (deadline, value)
+        self._timers[key] = slot
+
+    def cancel(self, key):
+        """Drop a pending timer"""
+        slot = self._timers.pop(key, None)
+        if slot is not None:
+            self.slots[slot].pop(key, None)
+
+    def advance(self, now):
+        """Move to epoch seconds now and return the (key, value) pairs that fired"""
+        target = int(now // self.tick)
+        fired = []
+        while self.current < target:
+            self.current += 1
+            bucket = self.slots[self.current % len(self.slots)]
+            due = [key for key, (deadline, _) in bucket.items() if deadline <= self.current]
+            for key in due:
+                _, value = bucket.pop(key)
+                del self._timers[key]
+                fired.append((key, value))
+        return fired
@@ -1,8 +1,12 @@
-import React, { useState, useEffect, createContext, useContext } from 'react';
+import React, { useState, useEffect, useRef, createContext, useContext } from 'react';
 import { ShoppingCart as CartIcon, LogIn, UserPlus, TrendingUp, Clock, Package, CreditCard, Users, BarChart3, Bell, MessageSquare, X, ChevronRight, Trophy, Zap, CheckCircle, AlertCircle, Menu } from 'lucide-react';
 
 // API Base URL - Update this to your backend URL
 const API_BASE_URL = 'http://localhost:5000/api';
+// Catalog changes are pushed over the socket; this poll only catches up
+const CATALOG_SYNC_INTERVAL = 60000;
+const SOCKET_URL = API_BASE_URL.replace(/^http/, 'ws').replace(/\/api$/, '/socket.io/?EIO=4&transport=websocket');
+const SOCKET_RECONNECT_DELAY = 2000;
 
 // Auth Context
 const AuthContext = createContext(null);
@@ -424,8 +428,9 @@ const ShoppingCart = ({ isOpen, onClose }) => {
         },
         body: JSON.stringify({ quantity })
       });
+      const data = await res.json();
       if (res.ok) {
-        fetchCart();
+        setCart(data.cart);
         addNotification('Cart updated', 'success');
       }
     } catch (err) {
@@ -439,8 +444,9 @@ const ShoppingCart = ({ isOpen, onClose }) => {
         method: 'DELETE',
         headers: { Authorization: `Bearer ${token}` }
       });
+      const data = await res.json();
       if (res.ok) {
-        fetchCart();
+        setCart(data.cart);
         addNotification('Item removed from cart', 'success');
       }
     } catch (err) {
@@ -941,6 +947,64 @@ const AIChatbot = ({ isOpen, onClose }) => {
   );
 };
 
+// Apply a catalog delta: replace changed products unless we already hold a
+// newer version, put new ones first and drop products whose sale has ended
+const mergeProducts = (current, changed) => {
+  const changedById = new Map(changed.map(p => [p._id, p]));
+  const knownIds = new Set(current.map(p => p._id));
+  const added = changed.filter(p => !knownIds.has(p._id));
+  const merged = current.map(p => {
+    const update = changedById.get(p._id);
+    return update && (update.version ?? 0) >= (p.version ?? 0) ? update : p;
+  });
+  return [...added, ...merged].filter(p => p.isActive !== false);
+};
+
+// Apply a stockUpdates frame ({productId, stock, version}) to the catalog
+const applyStockUpdates = (current, updates) => {
+  const updatesById = new Map(updates.map(u => [u.productId, u]));
+  return current.map(p => {
+    const update = updatesById.get(p._id);
+    if (!update || (update.version ?? 0) < (p.version ?? 0)) return p;
+    return { ...p, stock: update.stock, version: update.version ?? p.version };
+  });
+};
+
+// Minimal Socket.IO client over a WebSocket (Engine.IO v4): connects the
+// default namespace, answers pings, hands events to their handlers and
+// reconnects after a drop. onConnect runs after every (re)connect.
+const connectSocket = ({ onConnect, events }) => {
+  let ws = null;
+  let closed = false;
+  let retry = null;
+  const send = (event, data) => {
+    if (ws && ws.readyState === WebSocket.OPEN) ws.send('42' + JSON.stringify([event, data]));
+  };
+  const open = () => {
+    ws = new WebSocket(SOCKET_URL);
+    ws.onmessage = ({ data }) => {
+      if (typeof data !== 'string') return;
+      if (data[0] === '0') ws.send('40');
+      else if (data === '2') ws.send('3');
+      else if (data.startsWith('40')) onConnect(send);
+      else if (data.startsWith('41')) ws.close();
+      else if (data.startsWith('42')) {
+        const [event, payload] = JSON.parse(data.slice(2));
+        events[event]?.(payload);
+      }
+    };
+    ws.onclose = () => {
+      if (!closed) retry = setTimeout(open, SOCKET_RECONNECT_DELAY);
+    };
+  };
+  open();
+  return () => {
+    closed = true;
+    clearTimeout(retry);
+    ws.close();
+  };
+};
+
 // Main App Component
 const App = () => {
   const [currentPage, setCurrentPage] = useState('products');
@@ -951,22 +1015,48 @@ const App = () => {
   const [products, setProducts] = useState([]);
   const [saleEndTime] = useState(new Date(Date.now() + 8 * 60 * 60 * 1000));
   const [menuOpen, setMenuOpen] = useState(false);
+  const catalogVersion = useRef(null);
 
   const { user, logout, token } = useAuth();
   const { addNotification } = useNotification();
 
   useEffect(() => {
     fetchProducts();
-    const interval = setInterval(fetchProducts, 10000);
-    return () => clearInterval(interval);
+    const interval = setInterval(fetchProducts, CATALOG_SYNC_INTERVAL);
+    const disconnect = connectSocket({
+      onConnect: send => {
+        send('subscribe', { all: true });
+        // Catch up on what changed while we were disconnected
+        if (catalogVersion.current !== null) fetchProducts();
+      },
+      events: {
+        stockUpdates: ({ updates }) => setProducts(current => applyStockUpdates(current, updates)),
+        productsChanged: ({ products }) => setProducts(current => mergeProducts(current, products)),
+        saleStarted: ({ products }) => products && setProducts(current => mergeProducts(current, products)),
+        saleEnded: ({ productIds }) => setProducts(current => current.filter(p => !productIds.includes(p._id))),
+        resync: () => fetchProducts()
+      }
+    });
+    return () => {
+      clearInterval(interval);
+      disconnect();
+    };
   }, []);
 
+  // Full catalog on first load, then only what changed since our version
   const fetchProducts = async () => {
     try {
-      const res = await fetch(`${API_BASE_URL}/products`);
+      const since = catalogVersion.current;
+      const url = since === null ? `${API_BASE_URL}/products` : `${API_BASE_URL}/products?since=${since}`;
+      const res = await fetch(url);
       const data = await res.json();
       if (res.ok) {
-        setProducts(data.products || []);
+        catalogVersion.current = data.version;
+        if (since === null || data.full) {
+          setProducts(data.products || []);
+        } else if (data.products.length > 0) {
+          setProducts(current => mergeProducts(current, data.products));
+        }
       }
     } catch (err) {
       console.error('Failed to fetch products:', err);